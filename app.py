@@ -1,8 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from jwt_auth_middleware import JWTConfig, set_jwt_config, token_required, admin_required
-from utils.jwt_utils import revoke_token
+from utils.jwt_utils import revoke_token, revoke_tokens, get_blacklist_statistics, get_jwks_document, cached_auth
+from utils.jwt_utils import verify_access_token_locally
+from utils.jwt_utils import set_jwt_config as set_utils_jwt_config
+from utils.jwt_config import JWTConfig as UtilsJWTConfig
+from utils.claims import expand_claims
 from routes.auth_routes import auth_bp
 from database.api_manager import api_manager
+import functools
 import json
 from datetime import datetime
 from flask_cors import CORS
@@ -43,6 +48,9 @@ def initialize_jwt_system():
     # 設定全域配置
     set_jwt_config(config)
     
+    # utils 模組（簽發、金鑰集合、黑名單）使用同一份配置檔案
+    set_utils_jwt_config(UtilsJWTConfig(secret_key=secret_key, config_file="config.yaml"))
+    
     print(f"JWT 系統已初始化")
     print(f"演算法: {config.algorithm}")
     print(f"Access Token 過期時間: {config.access_token_expires} 分鐘")
@@ -60,9 +68,29 @@ except Exception as e:
     print(f"❌ JWT 系統初始化時發生未知錯誤: {e}")
     exit(1)
 
+def local_admin_required(f):
+    """
+    管理員端點的認證裝飾器
+    
+    與 /protected 相同，token 以 utils 的金鑰集合在本地驗證（支援 kid 輪替、ES256/EdDSA
+    與 jti 鍵的黑名單）並使用已驗證 token 快取；管理員角色在已驗證的 payload 上檢查。
+    中介層的 admin_required 只用於回應缺少 token 的請求。
+    """
+    @cached_auth(admin_required, verifier=verify_access_token_locally)
+    @functools.wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        # compact token 還原為標準欄位後再檢查角色
+        current_user = expand_claims(current_user)
+        if 'admin' not in current_user.get('roles', []):
+            return {"error": "Admin access required"}, 403
+        return f(current_user, *args, **kwargs)
+    return decorated
+
 @app.route('/protected')
-@token_required
+@cached_auth(token_required, verifier=verify_access_token_locally)
 def protected(current_user):
+    # compact token 還原為標準欄位
+    current_user = expand_claims(current_user)
     return {
         "message": f"Hello {current_user['sub']}, you have access!",
         "user_info": {
@@ -72,6 +100,18 @@ def protected(current_user):
         }
     }
 
+@app.route('/.well-known/jwks.json')
+def jwks():
+    """公開的驗證金鑰集合（JWK Set），供下游服務以 kid 離線驗證 token"""
+    body, etag, max_age = get_jwks_document()
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}",
+        "ETag": etag
+    }
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype="application/json", headers=headers)
+
 @app.route('/health')
 def health():
     """健康檢查端點"""
@@ -104,7 +144,7 @@ def health():
         }), 500
 
 @app.route('/admin/stats')
-@admin_required
+@local_admin_required
 def admin_stats(current_user):
     """管理員統計資訊端點"""
     # 檢查是否為管理員
@@ -129,7 +169,7 @@ def admin_stats(current_user):
 
 # 新增 JWT 相關的管理端點
 @app.route('/admin/jwt/blacklist', methods=['GET'])
-@admin_required
+@local_admin_required
 def get_blacklist(current_user):
     """獲取黑名單統計"""
     if 'admin' not in current_user.get('roles', []):
@@ -137,22 +177,35 @@ def get_blacklist(current_user):
     
     try:
         return jsonify({
-            "message": "Blacklist stats not available in current version",
-            "note": "JWT tokens are validated by signature and expiration time",
+            "stats": get_blacklist_statistics(),
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/admin/jwt/blacklist', methods=['POST'])
-@admin_required
+@local_admin_required
 def add_to_blacklist(current_user):
     """手動添加 token 到黑名單"""
     if 'admin' not in current_user.get('roles', []):
         return {"error": "Admin access required"}, 403
     
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
+        
+        # 批次撤銷：{"tokens": [...], "reason": "..."}
+        tokens = data.get('tokens')
+        if tokens is not None:
+            if not isinstance(tokens, list) or not tokens:
+                return jsonify({"error": "tokens must be a non-empty list"}), 400
+            
+            results = revoke_tokens(tokens, data.get('reason', 'admin_revoked'))
+            revoked = sum(1 for item in results if item["success"])
+            return jsonify({
+                "message": f"Revoked {revoked} of {len(tokens)} tokens",
+                "results": results
+            })
+        
         token = data.get('token')
         if not token:
             return jsonify({"error": "Token is required"}), 400
@@ -163,7 +216,7 @@ def add_to_blacklist(current_user):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/admin/jwt/cleanup', methods=['POST'])
-@admin_required
+@local_admin_required
 def cleanup_expired_tokens(current_user):
     """清理過期的 token"""
     if 'admin' not in current_user.get('roles', []):
@@ -5,6 +5,10 @@ Contains API manager and models for database operations
 
 # 匯出 API 管理器
 from .api_manager import api_manager, APIManager
+from .async_api_manager import AsyncAPIManager
+from .resilience import ResilienceSettings
+from .transport import HTTPTransport, InProcessTransport, Transport
+from .document_store import EmbeddedDocumentStore
 
 # 匯出模型
 from .user_model import UserModel
@@ -16,6 +20,14 @@ __all__ = [
     # API 管理器
     'api_manager',
     'APIManager',
+    'AsyncAPIManager',
+    'ResilienceSettings',
+    
+    # 傳輸層
+    'Transport',
+    'HTTPTransport',
+    'InProcessTransport',
+    'EmbeddedDocumentStore',
     
     # 模型
     'UserModel',
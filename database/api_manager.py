@@ -1,270 +1,260 @@
 import requests
 import logging
-from typing import Dict, List, Optional, Any
-from database.config import API_BASE_URL, API_KEY
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from typing import Dict, List, Optional, Any, Tuple
+from database.config import (
+    API_BASE_URL, API_KEY, API_RESILIENCE_CONFIG, API_TRACE_SAMPLE_RATE, API_TRACE_MAX_BODY_CHARS, API_TRANSPORT
+)
+from database.operations import OPERATIONS, Operation, infer_operation
+from database.request_trace import RequestMetrics, finish_timing, should_trace, start_timing, summarize
+from database.resilience import (
+    CircuitBreaker, LatencyTracker, ResilienceSettings, ResilienceStats, is_backend_failure
+)
+from database.transport import HTTPTransport, InProcessTransport, Transport
 
 logger = logging.getLogger(__name__)
 
-class APIManager:
-    """API 管理器，用於與 MongoDB Operation API 通信"""
-    
-    def __init__(self):
-        self.base_url = API_BASE_URL
-        self.api_key = API_KEY
+class BaseAPIManager:
+    """
+    API 管理器的共用部分：操作描述、回應轉換、請求統計與所有資料操作方法
+    
+    資料操作方法只負責組出 self._call(...)；同步版直接返回結果字典，
+    非同步版（AsyncAPIManager）的 _call 為協程，同一組方法返回可 await 的物件。
+    """
+    
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 resilience: Optional[ResilienceSettings] = None):
+        self.base_url = base_url or API_BASE_URL
+        self.api_key = api_key or API_KEY
         
-        # API 端點配置
-        self.endpoints = {
-            "users": "/add/document/users",
-            "roles": "/add/document/roles", 
-            "user_role_mapping": "/add/document/user_role_mapping",
-            "blacklist": "/add/document/blacklist"
-        }
+        # API 操作描述（方法、路徑模板、回應格式、冪等性、超時），見 database/operations.py
+        self.operations = OPERATIONS
         
-        # 查詢端點配置
-        self.search_endpoints = {
-            "users": "/search/documents/users",
-            "roles": "/search/documents/roles",
-            "user_role_mapping": "/search/documents/user_role_mapping", 
-            "blacklist": "/search/documents/blacklist"
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}" if self.api_key else ""
         }
         
-        # 更新端點配置
-        self.update_endpoints = {
-            "users": "/update/document/users",
-            "roles": "/update/document/roles",
-            "user_role_mapping": "/update/document/user_role_mapping",
-            "blacklist": "/update/document/blacklist"
-        }
+        # 請求計時統計與目前執行緒 / asyncio task 最近一次請求的計時
+        self.metrics = RequestMetrics()
+        self._last_timing = contextvars.ContextVar(f"api_last_timing_{id(self)}", default=None)
         
-        # 刪除端點配置
-        self.delete_endpoints = {
-            "users": "/delete/document/users",
-            "roles": "/delete/document/roles",
-            "user_role_mapping": "/delete/document/user_role_mapping",
-            "blacklist": "/delete/document/blacklist"
+        # 容錯策略：讀取 hedging、重試退避與斷路器（見 database/resilience.py）
+        self.resilience = resilience or ResilienceSettings.from_config(API_RESILIENCE_CONFIG)
+        self.breaker = CircuitBreaker(self.resilience.breaker_failure_threshold,
+                                      self.resilience.breaker_reset_timeout,
+                                      on_transition=self._on_breaker_transition)
+        self.latencies = LatencyTracker()
+        self.resilience_stats = ResilienceStats()
+        # 子類別可在傳輸層不經過網路時關閉 hedged 讀取
+        self._hedging = self.resilience.hedge_enabled
+    
+    @property
+    def last_timing(self) -> Optional[Dict[str, float]]:
+        """目前執行緒（或 asyncio task）最近一次請求的計時（connect_ms、ttfb_ms、total_ms）"""
+        return self._last_timing.get()
+    
+    def get_request_stats(self) -> Dict[str, Dict[str, Any]]:
+        """獲取各操作的請求次數、錯誤數與平均/最大耗時"""
+        return self.metrics.snapshot()
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """獲取斷路器狀態、各狀態轉換次數與重試 / hedge / 快速失敗計數"""
+        stats: Dict[str, Any] = {
+            "breaker_state": self.breaker.state,
+            "transitions": dict(self.breaker.transitions)
         }
-        
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}" if self.api_key else ""
+        stats.update(self.resilience_stats.snapshot())
+        return stats
+    
+    @staticmethod
+    def _on_breaker_transition(old_state: str, new_state: str) -> None:
+        """斷路器狀態轉換時記錄警告"""
+        logger.warning(f"API 斷路器狀態變更: {old_state} -> {new_state}")
+    
+    def _admit(self) -> bool:
+        """斷路器是否放行請求（不放行時累計快速失敗次數）"""
+        if self.breaker.allow():
+            return True
+        self.resilience_stats.increment("short_circuited")
+        return False
+    
+    @staticmethod
+    def _circuit_open_result() -> Dict:
+        """斷路器開啟時的快速失敗結果"""
+        return {
+            "success": False,
+            "message": "服務暫時無法使用",
+            "details": "MongoDB Operation API 連續失敗，斷路器開啟中，暫停送出請求"
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
     
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict:
-        """發送 HTTP 請求到 API"""
-        url = f"{self.base_url}{endpoint}"
+    @staticmethod
+    def _request_headers(operation: Operation) -> Optional[Dict[str, str]]:
+        """非冪等操作帶上 Idempotency-Key，同一次呼叫的重試沿用同一個鍵"""
+        if operation.idempotent:
+            return None
+        return {"Idempotency-Key": uuid.uuid4().hex}
+    
+    @staticmethod
+    def _may_retry(operation: Operation, headers: Optional[Dict[str, str]]) -> bool:
+        """是否可以重試：冪等操作，或帶有 Idempotency-Key 的非冪等操作（重複送出由 API 去重）"""
+        return operation.idempotent or bool(headers and headers.get("Idempotency-Key"))
+    
+    def _should_hedge(self, operation: Operation) -> bool:
+        """是否對此操作送出 hedged 請求（只限冪等讀取；宣告了自身超時的長時間查詢不 hedge）"""
+        return (self._hedging and operation.idempotent and operation.method == "GET"
+                and operation.timeout is None)
+    
+    def _hedge_delay(self, metric: str) -> float:
+        """送出 hedged 請求前的等待秒數：該操作最近延遲的百分位數，限制在設定的上下限內"""
+        settings = self.resilience
+        observed = self.latencies.percentile(metric, settings.hedge_percentile, settings.hedge_min_samples)
+        if observed is None:
+            return settings.hedge_max_delay
+        return min(settings.hedge_max_delay, max(settings.hedge_min_delay, observed))
+    
+    def _settle(self, operation: Operation, metric: str, result: Dict, timing: Dict[str, float]) -> bool:
+        """
+        依單次嘗試的結果更新斷路器與延遲樣本
         
-        # 記錄請求資訊
-        logger.info(f"發送 {method.upper()} 請求到: {url}")
-        if data:
-            logger.info(f"請求資料: {data}")
-        if params:
-            logger.info(f"請求參數: {params}")
+        Returns:
+            是否為可重試的後端暫時性失敗
+        """
+        if is_backend_failure(result):
+            self.breaker.record_failure()
+            return True
+        # 4xx 等回應代表後端可用，同樣重置連續失敗次數
+        self.breaker.record_success()
+        if result.get("success") and operation.method == "GET":
+            self.latencies.record(metric, timing["total_ms"] / 1000)
+        return False
+    
+    @staticmethod
+    def _metric_name(name: str, path_args: Dict[str, str]) -> str:
+        """統計用的操作名稱：操作名稱加上集合"""
+        collection = path_args.get("collection")
+        return f"{name}:{collection}" if collection else name
+    
+    def _record(self, operation: Operation, url: str, metric: str, timing: Dict[str, float],
+                result: Dict, status: Any, trace: bool, data: Optional[Dict], params: Optional[Dict]) -> None:
+        """記錄計時統計，並在追蹤啟用時輸出一行遮蔽後的請求紀錄"""
+        self._last_timing.set(timing)
+        self.metrics.record(metric, timing, result.get("success", False))
         
-        try:
-            if method.upper() == "GET":
-                response = self.session.get(url, params=params, timeout=30)
-            elif method.upper() == "POST":
-                response = self.session.post(url, json=data, timeout=30)
-            elif method.upper() == "PUT":
-                response = self.session.put(url, json=data, timeout=30)
-            elif method.upper() == "DELETE":
-                response = self.session.delete(url, params=params, timeout=30)
-            else:
-                raise ValueError(f"不支援的 HTTP 方法: {method}")
-            
-            # 記錄回應狀態
-            logger.info(f"回應狀態碼: {response.status_code}")
-            
-            # 檢查 HTTP 狀態碼
-            if response.status_code >= 400:
-                error_text = response.text
-                logger.error(f"HTTP 錯誤 {response.status_code}: {error_text}")
-                # 嘗試解析 JSON 錯誤回應
-                try:
-                    error_json = response.json()
-                    return {
-                        "success": False,
-                        "message": f"HTTP {response.status_code} 錯誤",
-                        "details": error_json.get("message", error_text),
-                        "status_code": response.status_code
-                    }
-                except:
-                    return {
-                        "success": False,
-                        "message": f"HTTP {response.status_code} 錯誤",
-                        "details": error_text,
-                        "status_code": response.status_code
-                    }
-            
-            # 嘗試解析 JSON 回應
+        if trace:
+            logger.debug(
+                "API %s %s status=%s connect=%.1fms ttfb=%.1fms total=%.1fms data=%s params=%s response=%s",
+                operation.method, url, status,
+                timing["connect_ms"], timing["ttfb_ms"], timing["total_ms"],
+                summarize(data, API_TRACE_MAX_BODY_CHARS) if data else "-",
+                summarize(params, API_TRACE_MAX_BODY_CHARS) if params else "-",
+                summarize(result.get("data", result.get("details")), API_TRACE_MAX_BODY_CHARS)
+            )
+    
+    def _parse_response(self, operation: Operation, response: Any) -> Dict:
+        """將 API 回應（requests 或 httpx 的 Response）轉換為統一的結果格式"""
+        # 檢查 HTTP 狀態碼
+        if response.status_code >= 400:
+            error_text = response.text
+            logger.error(f"HTTP 錯誤 {response.status_code}: {error_text[:API_TRACE_MAX_BODY_CHARS]}")
+            # 嘗試解析 JSON 錯誤回應
             try:
-                result = response.json()
-                logger.info(f"API 回應: {result}")
-                
-                # 轉換 API 回應格式為我們期望的格式
-                if response.status_code == 200:
-                    # 健康檢查端點
-                    if endpoint == "/health_check":
-                        return {
-                            "success": True,
-                            "message": "健康檢查通過",
-                            "data": result
-                        }
-                    
-                    # 創建文件端點（POST 請求）
-                    elif method.upper() == "POST" and "/add/document/" in endpoint:
-                        if "inserted_id" in result:
-                            return {
-                                "success": True,
-                                "message": "創建成功",
-                                "data": {"id": result["inserted_id"]}
-                            }
-                        else:
-                            return {
-                                "success": True,
-                                "message": "操作成功",
-                                "data": result
-                            }
-                    
-                    # 搜尋端點（GET 請求）
-                    elif method.upper() == "GET" and "/search/" in endpoint:
-                        if "data" in result:
-                            return {
-                                "success": True,
-                                "message": "搜尋成功",
-                                "data": result["data"]
-                            }
-                        else:
-                            return {
-                                "success": True,
-                                "message": "搜尋成功",
-                                "data": result
-                            }
-                    
-                    # 更新端點（PUT 請求）
-                    elif method.upper() == "PUT" and "/update/" in endpoint:
-                        return {
-                            "success": True,
-                            "message": "更新成功",
-                            "data": result
-                        }
-                    
-                    # 刪除端點（DELETE 請求）
-                    elif method.upper() == "DELETE" and "/delete/" in endpoint:
-                        return {
-                            "success": True,
-                            "message": "刪除成功",
-                            "data": result
-                        }
-                    
-                    # 其他端點
-                    else:
-                        return {
-                            "success": True,
-                            "message": "操作成功",
-                            "data": result
-                        }
-                else:
-                    return {
-                        "success": False,
-                        "message": "操作失敗",
-                        "details": result
-                    }
-                
-            except Exception as json_error:
-                logger.error(f"JSON 解析失敗: {json_error}")
-                logger.error(f"原始回應: {response.text}")
+                error_json = response.json()
                 return {
                     "success": False,
-                    "message": "回應格式錯誤",
-                    "details": f"無法解析 JSON: {response.text[:200]}",
+                    "message": f"HTTP {response.status_code} 錯誤",
+                    "details": error_json.get("message", error_text),
                     "status_code": response.status_code
                 }
-            
-        except requests.exceptions.Timeout as e:
-            logger.error(f"API 請求超時: {e}")
-            return {
-                "success": False,
-                "message": "請求超時",
-                "details": str(e)
-            }
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"API 連接失敗: {e}")
-            return {
-                "success": False,
-                "message": "連接失敗",
-                "details": f"無法連接到 {self.base_url}: {str(e)}"
-            }
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API 請求失敗: {e}")
-            return {
-                "success": False,
-                "message": "請求失敗",
-                "details": str(e)
-            }
-        except Exception as e:
-            logger.error(f"未知錯誤: {e}")
+            except:
+                return {
+                    "success": False,
+                    "message": f"HTTP {response.status_code} 錯誤",
+                    "details": error_text,
+                    "status_code": response.status_code
+                }
+        
+        # 嘗試解析 JSON 回應
+        try:
+            result = response.json()
+        except Exception as json_error:
+            logger.error(f"JSON 解析失敗: {json_error}")
+            logger.error(f"原始回應: {response.text[:API_TRACE_MAX_BODY_CHARS]}")
             return {
                 "success": False,
-                "message": "未知錯誤",
-                "details": str(e)
+                "message": "回應格式錯誤",
+                "details": f"無法解析 JSON: {response.text[:200]}",
+                "status_code": response.status_code
             }
+        
+        # 依操作宣告的回應格式轉換
+        if response.status_code == 200:
+            return operation.normalize(result)
+        return {
+            "success": False,
+            "message": "操作失敗",
+            "details": result
+        }
     
     # User 相關操作
     def create_user(self, user_data: Dict) -> Dict:
         """創建新用戶"""
-        return self._make_request("POST", self.endpoints["users"], data={"data": user_data})
+        return self._call("create_document", collection="users", data={"data": user_data})
     
     def get_user_by_id(self, user_id: str) -> Dict:
         """根據 ID 獲取用戶"""
-        return self._make_request("GET", f"/search/document/users/{user_id}")
+        return self._call("get_document", collection="users", document_id=user_id)
     
     def get_user_by_username(self, username: str) -> Dict:
         """根據用戶名獲取用戶"""
-        return self._make_request("GET", self.search_endpoints["users"], params={"username": username})
+        return self._call("search_documents", collection="users", params={"username": username})
     
     def get_user_by_email(self, email: str) -> Dict:
         """根據 email 獲取用戶"""
-        return self._make_request("GET", self.search_endpoints["users"], params={"email": email})
+        return self._call("search_documents", collection="users", params={"email": email})
     
     def update_user(self, user_id: str, user_data: Dict) -> Dict:
         """更新用戶資訊"""
-        return self._make_request("PUT", f"{self.update_endpoints['users']}/{user_id}", data={"update": user_data})
+        return self._call("update_document", collection="users", document_id=user_id, data={"update": user_data})
     
     def delete_user(self, user_id: str) -> Dict:
         """刪除用戶"""
-        return self._make_request("DELETE", f"{self.delete_endpoints['users']}/{user_id}")
+        return self._call("delete_document", collection="users", document_id=user_id)
     
     def get_all_users(self, skip: int = 0, limit: int = 100) -> Dict:
         """獲取所有用戶"""
-        return self._make_request("GET", self.search_endpoints["users"], params={"skip": skip, "limit": limit})
+        return self._call("search_documents", collection="users", params={"skip": skip, "limit": limit})
     
     # Role 相關操作
     def create_role(self, role_data: Dict) -> Dict:
         """創建新角色"""
-        return self._make_request("POST", self.endpoints["roles"], data={"data": role_data})
+        return self._call("create_document", collection="roles", data={"data": role_data})
     
     def get_role_by_id(self, role_id: str) -> Dict:
         """根據 ID 獲取角色"""
-        return self._make_request("GET", f"/search/document/roles/{role_id}")
+        return self._call("get_document", collection="roles", document_id=role_id)
     
     def get_role_by_name(self, role_name: str) -> Dict:
         """根據角色名獲取角色"""
-        return self._make_request("GET", self.search_endpoints["roles"], params={"role_name": role_name})
+        return self._call("search_documents", collection="roles", params={"role_name": role_name})
     
     def update_role(self, role_id: str, role_data: Dict) -> Dict:
         """更新角色資訊"""
-        return self._make_request("PUT", f"{self.update_endpoints['roles']}/{role_id}", data={"update": role_data})
+        return self._call("update_document", collection="roles", document_id=role_id, data={"update": role_data})
     
     def delete_role(self, role_id: str) -> Dict:
         """刪除角色"""
-        return self._make_request("DELETE", f"{self.delete_endpoints['roles']}/{role_id}")
+        return self._call("delete_document", collection="roles", document_id=role_id)
     
     def get_all_roles(self, skip: int = 0, limit: int = 100) -> Dict:
         """獲取所有角色"""
-        return self._make_request("GET", self.search_endpoints["roles"], params={"skip": skip, "limit": limit})
+        return self._call("search_documents", collection="roles", params={"skip": skip, "limit": limit})
     
     # User-Role 映射相關操作
     def assign_role_to_user(self, user_id: str, role_id: str) -> Dict:
@@ -274,22 +264,22 @@ class APIManager:
             "role_id": role_id,
             "created_at": "2024-01-01T00:00:00Z"  # 使用當前時間
         }
-        return self._make_request("POST", self.endpoints["user_role_mapping"], data={"data": mapping_data})
+        return self._call("create_document", collection="user_role_mapping", data={"data": mapping_data})
     
     def remove_role_from_user(self, user_id: str, role_id: str) -> Dict:
         """移除用戶的角色"""
-        return self._make_request("DELETE", self.delete_endpoints["user_role_mapping"], params={
+        return self._call("delete_matching", collection="user_role_mapping", params={
             "user_id": user_id,
             "role_id": role_id
         })
     
     def get_user_role_mapping(self, user_id: str) -> Dict:
         """獲取用戶的所有角色"""
-        return self._make_request("GET", self.search_endpoints["user_role_mapping"], params={"user_id": user_id})
+        return self._call("search_documents", collection="user_role_mapping", params={"user_id": user_id})
     
     def get_role_users(self, role_id: str) -> Dict:
         """獲取角色的所有用戶"""
-        return self._make_request("GET", self.search_endpoints["user_role_mapping"], params={"role_id": role_id})
+        return self._call("search_documents", collection="user_role_mapping", params={"role_id": role_id})
     
     # Blacklist 相關操作
     def add_to_blacklist(self, token: str, expires_at: str) -> Dict:
@@ -299,85 +289,273 @@ class APIManager:
             "expires_at": expires_at,
             "created_at": "2024-01-01T00:00:00Z"  # 使用當前時間
         }
-        return self._make_request("POST", self.endpoints["blacklist"], data={"data": blacklist_data})
+        return self._call("create_document", collection="blacklist", data={"data": blacklist_data})
     
     def is_token_blacklisted(self, token: str) -> Dict:
         """檢查 token 是否在黑名單中"""
-        return self._make_request("GET", self.search_endpoints["blacklist"], params={"token": token})
+        return self._call("search_documents", collection="blacklist", params={"token": token})
     
     def remove_from_blacklist(self, token: str) -> Dict:
         """從黑名單中移除 token"""
-        return self._make_request("DELETE", self.delete_endpoints["blacklist"], params={"token": token})
+        return self._call("delete_matching", collection="blacklist", params={"token": token})
     
     def cleanup_expired_tokens(self) -> Dict:
         """清理過期的 token"""
         # 使用批量刪除功能，刪除過期的 token
         current_time = "2024-01-01T00:00:00Z"  # 使用當前時間
-        return self._make_request("DELETE", self.delete_endpoints["blacklist"], params={
+        return self._call("delete_matching", collection="blacklist", params={
             "expires_at": {"$lt": current_time}
         })
     
     def get_blacklist_stats(self) -> Dict:
         """獲取黑名單統計資訊"""
-        return self._make_request("GET", f"{self.search_endpoints['blacklist']}/count")
+        return self._call("count_documents", collection="blacklist")
     
     # 通用操作方法
     def health_check(self) -> Dict:
         """檢查 API 服務狀態"""
-        return self._make_request("GET", "/health_check")
+        return self._call("health_check")
     
     def get_collections(self) -> Dict:
         """獲取所有集合清單"""
-        return self._make_request("GET", "/collections")
+        return self._call("get_collections")
     
     def count_documents(self, collection: str, query: Optional[Dict] = None) -> Dict:
-        """計算指定集合中的文件數量"""
+        """計算指定集合中的文件數量（query 可包含運算子條件）"""
         params = query or {}
-        return self._make_request("GET", f"/search/documents/{collection}/count", params=params)
+        return self._call("count_documents", collection=collection, params=params)
     
     def get_distinct_values(self, collection: str, field: str, query: Optional[Dict] = None) -> Dict:
         """獲取指定欄位的唯一值列表"""
         params = query or {}
-        return self._make_request("GET", f"/search/documents/{collection}/distinct/{field}", params=params)
+        return self._call("distinct_values", collection=collection, field=field, params=params)
     
     def get_collection_stats(self, collection: str, group_by: Optional[str] = None, query: Optional[Dict] = None) -> Dict:
         """獲取集合統計資訊"""
         params = query or {}
         if group_by:
             params["group_by"] = group_by
-        return self._make_request("GET", f"/search/documents/{collection}/stats", params=params)
+        return self._call("collection_stats", collection=collection, params=params)
     
     def clone_document(self, collection: str, document_id: str) -> Dict:
         """複製文件"""
-        return self._make_request("POST", f"/add/document/{collection}/{document_id}/clone")
+        return self._call("clone_document", collection=collection, document_id=document_id)
     
     def export_document(self, collection: str, document_id: str) -> Dict:
         """導出單筆文件"""
-        return self._make_request("GET", f"/search/document/{collection}/{document_id}/export")
+        return self._call("export_document", collection=collection, document_id=document_id)
     
     def export_collection(self, collection: str, query: Optional[Dict] = None) -> Dict:
         """導出整個集合"""
         params = query or {}
-        return self._make_request("GET", f"/search/documents/{collection}/export", params=params)
+        return self._call("export_collection", collection=collection, params=params)
     
     def drop_collection(self, collection: str) -> Dict:
         """刪除整個集合（危險操作）"""
-        return self._make_request("DELETE", f"/delete/collection/{collection}/drop")
+        return self._call("drop_collection", collection=collection)
     
     def batch_create_documents(self, collection: str, documents: List[Dict]) -> Dict:
         """批量創建文件"""
-        return self._make_request("POST", f"/add/documents/{collection}/batch", data={"data": documents})
+        return self._call("batch_create", collection=collection, data={"data": documents})
     
     def batch_update_documents(self, collection: str, query: Dict, update: Dict) -> Dict:
         """批量更新文件"""
-        return self._make_request("PUT", f"/update/documents/{collection}/batch", data={
+        return self._call("batch_update", collection=collection, data={
             "query": query,
             "update": update
         })
     
     def batch_delete_documents(self, collection: str, query: Dict) -> Dict:
-        """批量刪除文件"""
-        return self._make_request("DELETE", f"/delete/documents/{collection}", params=query)
+        """批量刪除文件（query 可包含 $lt、$gte 等運算子條件，以 JSON 字串作為查詢參數值傳送）"""
+        return self._call("batch_delete", collection=collection, params=query)
+
+
+class APIManager(BaseAPIManager):
+    """API 管理器，用於與 MongoDB Operation API 通信"""
+    
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 resilience: Optional[ResilienceSettings] = None,
+                 transport: Optional[Transport] = None):
+        """
+        初始化 API 管理器
+        
+        Args:
+            base_url: API 基礎網址（預設使用傳輸層或 database.config 的 API_BASE_URL）
+            api_key: API 金鑰（預設使用 database.config 的 API_KEY）
+            resilience: 容錯策略設定（預設讀取 config.yaml 的 api.resilience）
+            transport: 傳輸層（預設為 HTTPTransport；InProcessTransport 在程序內處理請求）
+        """
+        super().__init__(base_url or (transport.base_url if transport is not None else None), api_key, resilience)
+        self.transport = transport if transport is not None else HTTPTransport(self.headers)
+        
+        # hedged 讀取在執行緒池中送出；名額用完時改在呼叫端執行緒直接送出，不排隊等待
+        self._hedging = self._hedging and self.transport.remote
+        self._hedge_pool = None
+        self._hedge_slots = None
+        if self._hedging:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=self.resilience.hedge_pool_size,
+                                                  thread_name_prefix="api-hedge")
+            self._hedge_slots = threading.BoundedSemaphore(self.resilience.hedge_pool_size)
+    
+    def _call(self,
+              name: str,
+              data: Optional[Dict] = None,
+              params: Optional[Dict] = None,
+              **path_args: str) -> Dict:
+        """
+        執行已宣告的 API 操作
+        
+        Args:
+            name: 操作名稱（OPERATIONS 的鍵）
+            data: JSON 請求內容
+            params: 查詢參數
+            **path_args: 路徑模板參數（collection、document_id、field）
+            
+        Returns:
+            統一格式的結果字典
+        """
+        operation = self.operations[name]
+        return self._execute(operation, operation.endpoint(**path_args), self._metric_name(name, path_args),
+                             data, params)
+    
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict:
+        """發送 HTTP 請求到自定義端點（回應格式依端點推斷）"""
+        operation = infer_operation(method.upper(), endpoint)
+        return self._execute(operation, endpoint, operation.name, data, params)
+    
+    def _execute(self,
+                 operation: Operation,
+                 endpoint: str,
+                 metric: str,
+                 data: Optional[Dict],
+                 params: Optional[Dict]) -> Dict:
+        """依操作的容錯策略發送請求（斷路器、hedged 讀取、退避重試），並記錄計時"""
+        url = f"{self.base_url}{endpoint}"
+        
+        # 只在 DEBUG 啟用（且抽中）時才格式化請求內容
+        trace = should_trace(logger, API_TRACE_SAMPLE_RATE)
+        started = time.perf_counter()
+        
+        if not self._admit():
+            result, status = self._circuit_open_result(), "-"
+            timing = {"connect_ms": 0.0, "ttfb_ms": 0.0, "total_ms": 0.0}
+        else:
+            headers = self._request_headers(operation)
+            timeout = self.resilience.timeout_for(operation)
+            hedge = self._should_hedge(operation)
+            attempt = 0
+            while True:
+                if hedge:
+                    result, status, timing = self._send_hedged(operation, url, metric, data, params, headers, timeout)
+                else:
+                    result, status, timing = self._send(operation, url, data, params, headers, timeout)
+                retryable = self._settle(operation, metric, result, timing)
+                if not retryable or not self._may_retry(operation, headers) or attempt >= self.resilience.max_retries:
+                    break
+                attempt += 1
+                time.sleep(self.resilience.backoff_delay(attempt))
+                # 重試期間斷路器已開啟時，直接返回最後一次的失敗結果
+                if not self._admit():
+                    break
+                self.resilience_stats.increment("retries")
+            # 呼叫端看到的總耗時包含重試與退避
+            timing["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        
+        self._record(operation, url, metric, timing, result, status, trace, data, params)
+        return result
+    
+    def _send_hedged(self,
+                     operation: Operation,
+                     url: str,
+                     metric: str,
+                     data: Optional[Dict],
+                     params: Optional[Dict],
+                     headers: Optional[Dict[str, str]],
+                     timeout: float) -> Tuple[Dict, Any, Dict[str, float]]:
+        """送出讀取請求，超過 hedge 延遲仍未回應時再送出一個，採用先成功的結果並取消另一個"""
+        if not self._hedge_slots.acquire(blocking=False):
+            return self._send(operation, url, data, params, headers, timeout)
+        
+        started = time.perf_counter()
+        primary = self._submit_hedge(operation, url, data, params, headers, timeout)
+        try:
+            outcome = primary.result(timeout=self._hedge_delay(metric))
+        except FuturesTimeoutError:
+            if not self._hedge_slots.acquire(blocking=False):
+                outcome = primary.result()
+            else:
+                self.resilience_stats.increment("hedges")
+                backup = self._submit_hedge(operation, url, data, params, headers, timeout)
+                for future in as_completed((primary, backup)):
+                    outcome = future.result()
+                    if not is_backend_failure(outcome[0]):
+                        if future is backup:
+                            self.resilience_stats.increment("hedge_wins")
+                        break
+                # 尚未開始的請求直接取消；已送出的請求無法中斷，其結果會被捨棄
+                for future in (primary, backup):
+                    future.cancel()
+        
+        # 延遲樣本使用呼叫端實際等待的時間，避免只記錄較快的一方而讓 p95 持續下降
+        outcome[2]["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return outcome
+    
+    def _submit_hedge(self, *args: Any):
+        """在執行緒池中送出請求（呼叫前已取得名額，完成後釋放）"""
+        future = self._hedge_pool.submit(self._send, *args)
+        future.add_done_callback(lambda _: self._hedge_slots.release())
+        return future
+    
+    def _send(self,
+              operation: Operation,
+              url: str,
+              data: Optional[Dict],
+              params: Optional[Dict],
+              headers: Optional[Dict[str, str]],
+              timeout: float) -> Tuple[Dict, Any, Dict[str, float]]:
+        """送出單次 HTTP 請求並轉換回應"""
+        started = start_timing()
+        response = None
+        
+        try:
+            if operation.method not in ("GET", "POST", "PUT", "DELETE"):
+                raise ValueError(f"不支援的 HTTP 方法: {operation.method}")
+            response = self.transport.request(operation.method, url, params=params, json=data,
+                                              headers=headers, timeout=timeout)
+            result = self._parse_response(operation, response)
+            
+        except requests.exceptions.Timeout as e:
+            logger.error(f"API 請求超時: {e}")
+            result = {
+                "success": False,
+                "message": "請求超時",
+                "details": str(e)
+            }
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"API 連接失敗: {e}")
+            result = {
+                "success": False,
+                "message": "連接失敗",
+                "details": f"無法連接到 {self.base_url}: {str(e)}"
+            }
+        except requests.exceptions.RequestException as e:
+            logger.error(f"API 請求失敗: {e}")
+            result = {
+                "success": False,
+                "message": "請求失敗",
+                "details": str(e)
+            }
+        except Exception as e:
+            logger.error(f"未知錯誤: {e}")
+            result = {
+                "success": False,
+                "message": "未知錯誤",
+                "details": str(e)
+            }
+        
+        return result, response.status_code if response is not None else "-", finish_timing(started, response)
 
-# 全域 API 管理器實例
-api_manager = APIManager() 
\ No newline at end of file
+# 全域 API 管理器實例（api.transport 為 embedded 時使用程序內文件儲存）
+api_manager = APIManager(transport=InProcessTransport() if API_TRANSPORT == "embedded" else None)
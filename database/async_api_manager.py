@@ -0,0 +1,267 @@
+"""
+Async API Manager
+
+以 httpx.AsyncClient 實作的非同步 API 管理器，方法與 APIManager 相同
+（create_user、get_user_by_email、get_user_role_mapping 等），但每個方法返回可 await 的物件：
+
+    async with AsyncAPIManager() as api:
+        user = await api.get_user_by_email(email)
+        mapping, roles = await api.gather_many(
+            api.get_user_role_mapping(user_id),
+            api.get_all_roles()
+        )
+
+- 單一 AsyncClient 重用連線；安裝 h2 套件時對 HTTPS 端點使用 HTTP/2 多工
+- gather_many 讓互不相依的查詢並行送出
+- 與 APIManager 共用斷路器、重試與 hedged 讀取策略；hedge 輸掉的請求會被取消
+- 同一個實例只能在建立連線的事件迴圈中使用
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:  # 未安裝時在建立實例時提示
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+from database.api_manager import BaseAPIManager
+from database.config import API_TRACE_SAMPLE_RATE
+from database.operations import Operation, infer_operation
+from database.request_trace import AsyncRequestTimer, should_trace
+from database.resilience import ResilienceSettings, is_backend_failure
+from database.transport import Transport, encode_params
+
+logger = logging.getLogger("database.api_manager")
+
+
+class AsyncAPIManager(BaseAPIManager):
+    """非同步 API 管理器，用於與 MongoDB Operation API 通信"""
+
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 max_connections: int = 20,
+                 http2: Optional[bool] = None,
+                 resilience: Optional[ResilienceSettings] = None,
+                 transport: Optional[Transport] = None):
+        """
+        初始化非同步 API 管理器
+
+        Args:
+            base_url: API 基礎網址（預設使用 database.config 的 API_BASE_URL）
+            api_key: API 金鑰（預設使用 database.config 的 API_KEY）
+            max_connections: 連線池的最大連線數（HTTP/2 時多個請求共用同一條連線）
+            http2: 是否啟用 HTTP/2（預設在安裝 h2 套件時啟用）
+            resilience: 容錯策略設定（預設讀取 config.yaml 的 api.resilience）
+            transport: 傳輸層（預設以 HTTP 連線；InProcessTransport 在程序內處理請求）
+        """
+        if httpx is None:
+            raise ImportError("AsyncAPIManager 需要安裝 httpx 套件：pip install 'httpx[http2]'")
+        super().__init__(base_url or (transport.base_url if transport is not None else None), api_key, resilience)
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+        client_options: Dict[str, Any] = {}
+        if transport is not None and not transport.remote:
+            client_options["transport"] = transport.async_transport()
+            self.http2 = False
+            self._hedging = False
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            **client_options
+        )
+
+    async def __aenter__(self) -> "AsyncAPIManager":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """關閉連線池"""
+        await self.client.aclose()
+
+    async def gather_many(self, *calls: Awaitable[Dict]) -> List[Dict]:
+        """
+        並行執行多個互不相依的 API 呼叫
+
+        Args:
+            *calls: 本實例方法返回的可 await 物件，例如 api.get_user_by_id(user_id)
+
+        Returns:
+            與 calls 順序一致的結果字典列表（個別失敗以 {"success": False} 表示）
+        """
+        return list(await asyncio.gather(*calls))
+
+    async def _call(self,
+                    name: str,
+                    data: Optional[Dict] = None,
+                    params: Optional[Dict] = None,
+                    **path_args: str) -> Dict:
+        """
+        執行已宣告的 API 操作
+
+        Args:
+            name: 操作名稱（OPERATIONS 的鍵）
+            data: JSON 請求內容
+            params: 查詢參數
+            **path_args: 路徑模板參數（collection、document_id、field）
+
+        Returns:
+            統一格式的結果字典
+        """
+        operation = self.operations[name]
+        return await self._execute(operation, operation.endpoint(**path_args), self._metric_name(name, path_args),
+                                   data, params)
+
+    async def _make_request(self,
+                            method: str,
+                            endpoint: str,
+                            data: Optional[Dict] = None,
+                            params: Optional[Dict] = None) -> Dict:
+        """發送 HTTP 請求到自定義端點（回應格式依端點推斷）"""
+        operation = infer_operation(method.upper(), endpoint)
+        return await self._execute(operation, endpoint, operation.name, data, params)
+
+    async def _execute(self,
+                       operation: Operation,
+                       endpoint: str,
+                       metric: str,
+                       data: Optional[Dict],
+                       params: Optional[Dict]) -> Dict:
+        """依操作的容錯策略發送請求（斷路器、hedged 讀取、退避重試），並記錄計時"""
+        url = f"{self.base_url}{endpoint}"
+
+        # 只在 DEBUG 啟用（且抽中）時才格式化請求內容
+        trace = should_trace(logger, API_TRACE_SAMPLE_RATE)
+        started = time.perf_counter()
+
+        if not self._admit():
+            result, status = self._circuit_open_result(), "-"
+            timing = {"connect_ms": 0.0, "ttfb_ms": 0.0, "total_ms": 0.0}
+        else:
+            headers = self._request_headers(operation)
+            timeout = self.resilience.timeout_for(operation)
+            hedge = self._should_hedge(operation)
+            attempt = 0
+            while True:
+                if hedge:
+                    result, status, timing = await self._send_hedged(operation, url, metric, data, params,
+                                                                     headers, timeout)
+                else:
+                    result, status, timing = await self._send(operation, url, data, params, headers, timeout)
+                retryable = self._settle(operation, metric, result, timing)
+                if not retryable or not self._may_retry(operation, headers) or attempt >= self.resilience.max_retries:
+                    break
+                attempt += 1
+                await asyncio.sleep(self.resilience.backoff_delay(attempt))
+                # 重試期間斷路器已開啟時，直接返回最後一次的失敗結果
+                if not self._admit():
+                    break
+                self.resilience_stats.increment("retries")
+            # 呼叫端看到的總耗時包含重試與退避
+            timing["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+        self._record(operation, url, metric, timing, result, status, trace, data, params)
+        return result
+
+    async def _send_hedged(self,
+                           operation: Operation,
+                           url: str,
+                           metric: str,
+                           data: Optional[Dict],
+                           params: Optional[Dict],
+                           headers: Optional[Dict[str, str]],
+                           timeout: float) -> Tuple[Dict, Any, Dict[str, float]]:
+        """送出讀取請求，超過 hedge 延遲仍未回應時再送出一個，採用先成功的結果並取消另一個"""
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._send(operation, url, data, params, headers, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(metric))
+        if done:
+            outcome = primary.result()
+        else:
+            self.resilience_stats.increment("hedges")
+            backup = asyncio.ensure_future(self._send(operation, url, data, params, headers, timeout))
+            pending = {primary, backup}
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    winner = next((task for task in done if not is_backend_failure(task.result()[0])), None)
+                    if winner is not None:
+                        outcome = winner.result()
+                        if winner is backup:
+                            self.resilience_stats.increment("hedge_wins")
+                        break
+                    outcome = done.pop().result()
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        # 延遲樣本使用呼叫端實際等待的時間，避免只記錄較快的一方而讓 p95 持續下降
+        outcome[2]["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return outcome
+
+    async def _send(self,
+                    operation: Operation,
+                    url: str,
+                    data: Optional[Dict],
+                    params: Optional[Dict],
+                    headers: Optional[Dict[str, str]],
+                    timeout: float) -> Tuple[Dict, Any, Dict[str, float]]:
+        """送出單次 HTTP 請求並轉換回應"""
+        timer = AsyncRequestTimer()
+        response = None
+
+        try:
+            if operation.method not in ("GET", "POST", "PUT", "DELETE"):
+                raise ValueError(f"不支援的 HTTP 方法: {operation.method}")
+            response = await self.client.request(
+                operation.method, url,
+                params=encode_params(params),
+                json=data,
+                headers=headers,
+                timeout=timeout,
+                extensions={"trace": timer}
+            )
+            result = self._parse_response(operation, response)
+
+        except httpx.TimeoutException as e:
+            logger.error(f"API 請求超時: {e}")
+            result = {
+                "success": False,
+                "message": "請求超時",
+                "details": str(e)
+            }
+        except (httpx.ConnectError, httpx.RemoteProtocolError) as e:
+            logger.error(f"API 連接失敗: {e}")
+            result = {
+                "success": False,
+                "message": "連接失敗",
+                "details": f"無法連接到 {self.base_url}: {str(e)}"
+            }
+        except httpx.HTTPError as e:
+            logger.error(f"API 請求失敗: {e}")
+            result = {
+                "success": False,
+                "message": "請求失敗",
+                "details": str(e)
+            }
+        except Exception as e:
+            logger.error(f"未知錯誤: {e}")
+            result = {
+                "success": False,
+                "message": "未知錯誤",
+                "details": str(e)
+            }
+
+        return result, response.status_code if response is not None else "-", timer.finish()
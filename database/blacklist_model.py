@@ -7,8 +7,8 @@ logger = logging.getLogger(__name__)
 class BlacklistModel:
     """使用 API 的黑名單模型"""
     
-    def __init__(self):
-        self.api = api_manager
+    def __init__(self, api=None):
+        self.api = api or api_manager
     
     def _log_success(self, message: str):
         """記錄成功訊息"""
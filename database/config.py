@@ -38,6 +38,19 @@ API_MODE = API_MODE.lower()
 if API_MODE not in ["internal", "public"]:
     raise ValueError("API_MODE must be either 'internal' or 'public'. Please check your config.yaml file")
 
+# API 傳輸層：http（呼叫 MongoDB Operation API）或 embedded（程序內文件儲存，單節點 / 測試用）
+API_TRANSPORT = (config.get('api', {}).get('transport') or 'http').lower()
+if API_TRANSPORT not in ["http", "embedded"]:
+    raise ValueError("api.transport must be either 'http' or 'embedded'. Please check your config.yaml file")
+
+# API 請求追蹤配置（只在 database.api_manager logger 啟用 DEBUG 時生效）
+API_TRACE_CONFIG = config.get('api', {}).get('trace', {}) or {}
+API_TRACE_SAMPLE_RATE = float(API_TRACE_CONFIG.get('sample_rate', 1.0))
+API_TRACE_MAX_BODY_CHARS = int(API_TRACE_CONFIG.get('max_body_chars', 512))
+
+# API 容錯策略配置（超時、重試、hedged 讀取、斷路器），由 ResilienceSettings.from_config 解析
+API_RESILIENCE_CONFIG = config.get('api', {}).get('resilience', {}) or {}
+
 # 公網 API 配置
 PUBLIC_API_BASE_URL = os.environ.get("PUBLIC_API_BASE_URL")
 if not PUBLIC_API_BASE_URL:
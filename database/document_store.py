@@ -0,0 +1,441 @@
+"""
+Embedded Document Store
+
+程序內的索引化記憶體文件儲存，實作 MongoDB Operation API 的 /add、/search、/update、/delete 端點契約。
+InProcessTransport 以它取代 HTTP，供單節點部署、基準測試與測試使用：
+
+    store = EmbeddedDocumentStore()
+    api = APIManager(transport=InProcessTransport(store))
+
+- 每個集合以 _id 為主鍵，並對常用查詢欄位建立等值索引（DEFAULT_INDEXES，可用 create_index 新增）
+- 查詢條件支援等值、$or、$in、$ne、$gt、$gte、$lt、$lte；查詢字串的值與文件欄位以字串形式比對
+- 查詢字串中的運算子條件以 JSON 字串作為參數值（例如 expires_at={"$lt":"..."}，見 transport.encode_params）
+- 帶 Idempotency-Key 的 POST 重送時返回第一次的結果，不重複寫入
+- 資料只保存在記憶體中，程序結束即消失
+"""
+
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 預設建立等值索引的欄位（集合 -> 欄位）
+DEFAULT_INDEXES: Dict[str, Tuple[str, ...]] = {
+    "users": ("email", "username"),
+    "roles": ("role_name",),
+    "user_role_mapping": ("user_id", "role_id"),
+    "blacklist": ("token",),
+}
+
+_RANGE_OPERATORS = {
+    "$gt": lambda value, bound: value > bound,
+    "$gte": lambda value, bound: value >= bound,
+    "$lt": lambda value, bound: value < bound,
+    "$lte": lambda value, bound: value <= bound,
+}
+
+
+def _index_key(value: Any) -> Optional[str]:
+    """索引鍵：純量值的字串形式（查詢字串的值都是字串），其他型別不建立索引"""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return str(value)
+
+
+def _equals(value: Any, expected: Any) -> bool:
+    """等值比對；查詢字串傳入的字串也可比對非字串欄位（例如 "True" 與 True）"""
+    if value == expected:
+        return True
+    return isinstance(expected, str) and value is not None and not isinstance(value, str) and str(value) == expected
+
+
+def _compare(value: Any, operator: str, bound: Any) -> bool:
+    """範圍比對；型別不同時以字串比較"""
+    if value is None:
+        return False
+    try:
+        return _RANGE_OPERATORS[operator](value, bound)
+    except TypeError:
+        return _RANGE_OPERATORS[operator](str(value), str(bound))
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """
+    判斷文件是否符合查詢
+
+    Args:
+        document: 文件
+        query: 查詢條件（等值或 $or、$in、$ne、$gt、$gte、$lt、$lte）
+
+    Returns:
+        是否符合
+    """
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, sub_query) for sub_query in condition):
+                return False
+            continue
+        value = document.get(key)
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            for operator, bound in condition.items():
+                if operator in _RANGE_OPERATORS:
+                    if not _compare(value, operator, bound):
+                        return False
+                elif operator == "$in":
+                    if not any(_equals(value, item) for item in bound):
+                        return False
+                elif operator == "$ne":
+                    if _equals(value, bound):
+                        return False
+                else:
+                    return False
+        elif not _equals(value, condition):
+            return False
+    return True
+
+
+def is_operator_condition(value: Any) -> bool:
+    """是否為運算子條件（例如 {"$lt": "..."}）"""
+    return isinstance(value, dict) and bool(value) and all(str(key).startswith("$") for key in value)
+
+
+def decode_param(value: str) -> Any:
+    """
+    還原 encode_params 以 JSON 字串傳送的運算子條件（其他參數值原樣返回）
+
+    Args:
+        value: 查詢字串中的參數值
+
+    Returns:
+        運算子條件字典或原字串
+    """
+    if value.startswith("{"):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            return value
+        if is_operator_condition(decoded):
+            return decoded
+    return value
+
+
+class EmbeddedDocumentStore:
+    """以集合分組、具等值索引的記憶體文件儲存"""
+
+    def __init__(self,
+                 indexes: Optional[Dict[str, Iterable[str]]] = None,
+                 idempotency_cache_size: int = 10000):
+        """
+        初始化文件儲存
+
+        Args:
+            indexes: 建立等值索引的欄位（集合 -> 欄位列表），預設為 DEFAULT_INDEXES
+            idempotency_cache_size: 保留多少個 Idempotency-Key 的回應
+        """
+        self._lock = threading.RLock()
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # 集合 -> 欄位 -> 索引鍵 -> 文件 ID（以 dict 保存，維持加入順序）
+        self._indexes: Dict[str, Dict[str, Dict[str, Dict[str, None]]]] = {}
+        self._idempotency_cache_size = idempotency_cache_size
+        self._idempotent_responses: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+
+        for collection, fields in (DEFAULT_INDEXES if indexes is None else indexes).items():
+            for field in fields:
+                self.create_index(collection, field)
+
+    # 索引維護
+
+    def create_index(self, collection: str, field: str) -> None:
+        """
+        為集合的欄位建立等值索引（已有文件會一併加入索引）
+
+        Args:
+            collection: 集合名稱
+            field: 欄位名稱
+        """
+        with self._lock:
+            field_indexes = self._indexes.setdefault(collection, {})
+            if field in field_indexes:
+                return
+            index: Dict[str, Dict[str, None]] = {}
+            for document_id, document in self.collections.get(collection, {}).items():
+                key = _index_key(document.get(field))
+                if key is not None:
+                    index.setdefault(key, {})[document_id] = None
+            field_indexes[field] = index
+
+    def _index_document(self, collection: str, document: Dict[str, Any]) -> None:
+        for field, index in self._indexes.get(collection, {}).items():
+            key = _index_key(document.get(field))
+            if key is not None:
+                index.setdefault(key, {})[document["_id"]] = None
+
+    def _unindex_document(self, collection: str, document: Dict[str, Any]) -> None:
+        for field, index in self._indexes.get(collection, {}).items():
+            key = _index_key(document.get(field))
+            ids = index.get(key) if key is not None else None
+            if ids is not None:
+                ids.pop(document["_id"], None)
+                if not ids:
+                    del index[key]
+
+    def _candidates(self, collection: str, query: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        """以查詢中最有選擇性的索引欄位縮小候選文件，沒有可用索引時掃描整個集合"""
+        documents = self.collections.get(collection, {})
+        if "_id" in query and not isinstance(query["_id"], dict):
+            document = documents.get(str(query["_id"]))
+            return [document] if document is not None else []
+
+        best: Optional[Dict[str, None]] = None
+        for field, index in self._indexes.get(collection, {}).items():
+            condition = query.get(field)
+            if condition is None or isinstance(condition, (dict, list)):
+                continue
+            ids = index.get(str(condition), {})
+            if best is None or len(ids) < len(best):
+                best = ids
+        if best is None:
+            return list(documents.values())
+        return [documents[document_id] for document_id in best]
+
+    # 文件操作
+
+    def insert(self, collection: str, document: Dict[str, Any]) -> str:
+        """
+        新增文件
+
+        Args:
+            collection: 集合名稱
+            document: 文件內容（未提供 _id 時自動產生）
+
+        Returns:
+            文件 ID
+        """
+        document = dict(document)
+        document_id = str(document.get("_id") or uuid.uuid4().hex)
+        document["_id"] = document_id
+        with self._lock:
+            documents = self.collections.setdefault(collection, {})
+            previous = documents.get(document_id)
+            if previous is not None:
+                self._unindex_document(collection, previous)
+            documents[document_id] = document
+            self._index_document(collection, document)
+        return document_id
+
+    def get(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        以 ID 取得文件
+
+        Args:
+            collection: 集合名稱
+            document_id: 文件 ID
+
+        Returns:
+            文件副本，不存在時返回 None
+        """
+        with self._lock:
+            document = self.collections.get(collection, {}).get(document_id)
+            return dict(document) if document is not None else None
+
+    def find(self, collection: str, query: Dict[str, Any], skip: int = 0, limit: int = 0) -> List[Dict[str, Any]]:
+        """
+        查詢文件
+
+        Args:
+            collection: 集合名稱
+            query: 查詢條件
+            skip: 跳過的筆數
+            limit: 最多返回的筆數（0 表示不限制）
+
+        Returns:
+            符合條件的文件副本列表（淺複製）
+        """
+        with self._lock:
+            found = [dict(doc) for doc in self._candidates(collection, query) if matches(doc, query)]
+        found = found[skip:]
+        return found[:limit] if limit else found
+
+    def update(self, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> int:
+        """
+        更新符合條件的文件（支援 $set、$unset，或直接提供欄位）
+
+        Args:
+            collection: 集合名稱
+            query: 查詢條件
+            update: 更新內容
+
+        Returns:
+            更新的文件數量
+        """
+        set_fields = update.get("$set", {} if "$unset" in update else update)
+        unset_fields = update.get("$unset", {})
+        with self._lock:
+            targets = [doc for doc in self._candidates(collection, query) if matches(doc, query)]
+            for document in targets:
+                self._unindex_document(collection, document)
+                document.update({key: value for key, value in set_fields.items() if key != "_id"})
+                for key in unset_fields:
+                    document.pop(key, None)
+                self._index_document(collection, document)
+        return len(targets)
+
+    def delete(self, collection: str, query: Dict[str, Any]) -> int:
+        """
+        刪除符合條件的文件
+
+        Args:
+            collection: 集合名稱
+            query: 查詢條件
+
+        Returns:
+            刪除的文件數量
+        """
+        with self._lock:
+            documents = self.collections.get(collection, {})
+            targets = [doc for doc in self._candidates(collection, query) if matches(doc, query)]
+            for document in targets:
+                self._unindex_document(collection, document)
+                del documents[document["_id"]]
+        return len(targets)
+
+    def drop(self, collection: str) -> bool:
+        """
+        刪除整個集合（保留索引定義）
+
+        Args:
+            collection: 集合名稱
+
+        Returns:
+            集合是否存在
+        """
+        with self._lock:
+            existed = self.collections.pop(collection, None) is not None
+            for index in self._indexes.get(collection, {}).values():
+                index.clear()
+        return existed
+
+    # API 端點契約
+
+    def handle(self,
+               method: str,
+               path: str,
+               query: Optional[Dict[str, str]] = None,
+               body: Optional[Dict[str, Any]] = None,
+               idempotency_key: Optional[str] = None) -> Tuple[int, Any]:
+        """
+        以 MongoDB Operation API 的端點契約處理一個請求
+
+        Args:
+            method: HTTP 方法
+            path: 端點路徑，例如 /search/documents/users
+            query: 查詢參數（值為字串）
+            body: JSON 請求內容
+            idempotency_key: Idempotency-Key 標頭（POST 重送時返回第一次的結果）
+
+        Returns:
+            (HTTP 狀態碼, 回應內容)
+        """
+        if idempotency_key and method == "POST":
+            with self._lock:
+                cached = self._idempotent_responses.get(idempotency_key)
+                if cached is not None:
+                    return cached
+                response = self._dispatch(method, path, dict(query or {}), body or {})
+                if response[0] < 500:
+                    self._idempotent_responses[idempotency_key] = response
+                    if len(self._idempotent_responses) > self._idempotency_cache_size:
+                        self._idempotent_responses.popitem(last=False)
+                return response
+        return self._dispatch(method, path, dict(query or {}), body or {})
+
+    def _dispatch(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any]:
+        parts = [part for part in path.split("/") if part]
+        # 運算子條件（$lt、$gte 等）以 JSON 字串作為查詢參數值傳送
+        query = {key: decode_param(value) if isinstance(value, str) else value for key, value in query.items()}
+        handler = getattr(self, f"_handle_{method.lower()}", None)
+        if handler is None or not parts:
+            return 404, {"message": "未知端點"}
+        try:
+            return handler(parts, query, body)
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {"message": f"請求格式錯誤: {e}"}
+
+    @staticmethod
+    def _paging(query: Dict[str, str]) -> Tuple[int, int]:
+        skip = int(query.pop("skip", 0) or 0)
+        limit = int(query.pop("limit", 0) or 0)
+        return skip, limit
+
+    def _handle_get(self, parts: List[str], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any]:
+        if parts == ["health_check"]:
+            return 200, {"status": "ok"}
+        if parts == ["collections"]:
+            return 200, {"collections": sorted(self.collections)}
+        if len(parts) in (4, 5) and parts[:2] == ["search", "document"] and parts[4:] in ([], ["export"]):
+            document = self.get(parts[2], parts[3])
+            if document is None:
+                return 404, {"message": "文件不存在"}
+            return 200, {"data": document}
+        if len(parts) >= 3 and parts[:2] == ["search", "documents"]:
+            collection, action = parts[2], parts[3:]
+            if action == ["stats"]:
+                group_by = query.pop("group_by", None)
+                documents = self.find(collection, query)
+                stats: Dict[str, Any] = {"count": len(documents)}
+                if group_by:
+                    groups: Dict[str, int] = {}
+                    for document in documents:
+                        key = str(document.get(group_by))
+                        groups[key] = groups.get(key, 0) + 1
+                    stats["groups"] = groups
+                return 200, {"data": stats}
+            skip, limit = self._paging(query)
+            if len(action) == 2 and action[0] == "distinct":
+                values = []
+                for document in self.find(collection, query):
+                    value = document.get(action[1])
+                    if value is not None and value not in values:
+                        values.append(value)
+                return 200, {"data": values}
+            documents = self.find(collection, query, skip, limit)
+            if action == ["count"]:
+                return 200, {"count": len(documents)}
+            if action in ([], ["export"]):
+                return 200, {"data": documents}
+        return 404, {"message": "未知端點"}
+
+    def _handle_post(self, parts: List[str], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any]:
+        if len(parts) == 3 and parts[:2] == ["add", "document"]:
+            return 200, {"inserted_id": self.insert(parts[2], body.get("data", {}))}
+        if len(parts) == 5 and parts[:2] == ["add", "document"] and parts[4] == "clone":
+            document = self.get(parts[2], parts[3])
+            if document is None:
+                return 404, {"message": "文件不存在"}
+            document.pop("_id")
+            return 200, {"inserted_id": self.insert(parts[2], document)}
+        if len(parts) == 4 and parts[:2] == ["add", "documents"] and parts[3] == "batch":
+            ids = [self.insert(parts[2], document) for document in body.get("data", [])]
+            return 200, {"inserted_ids": ids, "inserted_count": len(ids)}
+        if len(parts) == 3 and parts[:2] == ["search", "documents"]:
+            return 200, {"data": self.find(parts[2], body.get("query", {}))}
+        return 404, {"message": "未知端點"}
+
+    def _handle_put(self, parts: List[str], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any]:
+        if len(parts) == 4 and parts[:2] == ["update", "document"]:
+            modified = self.update(parts[2], {"_id": parts[3]}, body.get("update", {}))
+            return 200, {"matched_count": modified, "modified_count": modified}
+        if len(parts) == 4 and parts[:2] == ["update", "documents"] and parts[3] == "batch":
+            modified = self.update(parts[2], body.get("query", {}), body.get("update", {}))
+            return 200, {"matched_count": modified, "modified_count": modified}
+        return 404, {"message": "未知端點"}
+
+    def _handle_delete(self, parts: List[str], query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any]:
+        if len(parts) == 4 and parts[:2] == ["delete", "document"]:
+            return 200, {"deleted_count": self.delete(parts[2], {"_id": parts[3]})}
+        if len(parts) == 3 and parts[0] == "delete" and parts[1] in ("document", "documents"):
+            return 200, {"deleted_count": self.delete(parts[2], query)}
+        if len(parts) == 4 and parts[:2] == ["delete", "collection"] and parts[3] == "drop":
+            return 200, {"dropped": self.drop(parts[2])}
+        return 404, {"message": "未知端點"}
@@ -0,0 +1,195 @@
+"""
+MongoDB Operation API 操作描述
+
+每個 API 操作只宣告一次：HTTP 方法、路徑模板、回應格式、是否冪等與超時。
+是否冪等與超時也決定 APIManager 的容錯策略（見 database/resilience.py）。
+APIManager 以操作名稱查表後直接呼叫對應的回應轉換函數，
+不需在每次請求時以字串比對端點判斷回應格式。
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+
+def _normalize_health(result: Any) -> Dict:
+    """健康檢查端點"""
+    return {
+        "success": True,
+        "message": "健康檢查通過",
+        "data": result
+    }
+
+
+def _normalize_created(result: Any) -> Dict:
+    """創建文件端點"""
+    if "inserted_id" in result:
+        return {
+            "success": True,
+            "message": "創建成功",
+            "data": {"id": result["inserted_id"]}
+        }
+    return {
+        "success": True,
+        "message": "操作成功",
+        "data": result
+    }
+
+
+def _normalize_search(result: Any) -> Dict:
+    """搜尋端點"""
+    return {
+        "success": True,
+        "message": "搜尋成功",
+        "data": result["data"] if "data" in result else result
+    }
+
+
+def _normalize_updated(result: Any) -> Dict:
+    """更新端點"""
+    return {
+        "success": True,
+        "message": "更新成功",
+        "data": result
+    }
+
+
+def _normalize_deleted(result: Any) -> Dict:
+    """刪除端點"""
+    return {
+        "success": True,
+        "message": "刪除成功",
+        "data": result
+    }
+
+
+def _normalize_raw(result: Any) -> Dict:
+    """其他端點"""
+    return {
+        "success": True,
+        "message": "操作成功",
+        "data": result
+    }
+
+
+# 回應格式 -> 轉換函數
+RESPONSE_SHAPES: Dict[str, Callable[[Any], Dict]] = {
+    "health": _normalize_health,
+    "created": _normalize_created,
+    "search": _normalize_search,
+    "updated": _normalize_updated,
+    "deleted": _normalize_deleted,
+    "raw": _normalize_raw,
+}
+
+
+class Operation:
+    """MongoDB Operation API 的單一操作描述"""
+
+    __slots__ = ("name", "method", "path", "shape", "idempotent", "timeout", "normalize", "is_static")
+
+    def __init__(self,
+                 name: str,
+                 method: str,
+                 path: str,
+                 shape: str,
+                 idempotent: bool,
+                 timeout: Optional[float] = None):
+        """
+        初始化操作描述
+
+        Args:
+            name: 操作名稱（也是統計與追蹤使用的名稱）
+            method: HTTP 方法（GET、POST、PUT、DELETE）
+            path: 路徑模板，例如 /search/document/{collection}/{document_id}
+            shape: 回應格式（RESPONSE_SHAPES 的鍵）
+            idempotent: 重複送出是否安全（非冪等操作重試時帶 Idempotency-Key；冪等讀取可 hedge）
+            timeout: 請求超時秒數（None 表示依讀寫使用 api.resilience 的 read_timeout / write_timeout）
+        """
+        if shape not in RESPONSE_SHAPES:
+            raise ValueError(f"無效的回應格式: {shape}。可選值: {', '.join(RESPONSE_SHAPES)}")
+        self.name = name
+        self.method = method
+        self.path = path
+        self.shape = shape
+        self.idempotent = idempotent
+        self.timeout = timeout
+        self.normalize = RESPONSE_SHAPES[shape]
+        # 沒有參數的路徑不需要在每次呼叫時格式化
+        self.is_static = "{" not in path
+
+    def endpoint(self, **path_args: str) -> str:
+        """
+        以路徑參數產生端點
+
+        Args:
+            **path_args: 路徑模板中的參數（collection、document_id、field）
+
+        Returns:
+            API 端點路徑
+        """
+        return self.path if self.is_static else self.path.format(**path_args)
+
+    def __repr__(self) -> str:
+        return f"Operation({self.name!r}, {self.method} {self.path}, shape={self.shape!r})"
+
+
+# 所有 API 操作（名稱 -> 描述）
+OPERATIONS: Dict[str, Operation] = {op.name: op for op in (
+    Operation("health_check", "GET", "/health_check", "health", idempotent=True),
+    Operation("get_collections", "GET", "/collections", "raw", idempotent=True),
+
+    # 單筆文件
+    Operation("create_document", "POST", "/add/document/{collection}", "created", idempotent=False),
+    Operation("get_document", "GET", "/search/document/{collection}/{document_id}", "search", idempotent=True),
+    Operation("update_document", "PUT", "/update/document/{collection}/{document_id}", "updated", idempotent=True),
+    Operation("delete_document", "DELETE", "/delete/document/{collection}/{document_id}", "deleted", idempotent=True),
+    Operation("delete_matching", "DELETE", "/delete/document/{collection}", "deleted", idempotent=True),
+    Operation("clone_document", "POST", "/add/document/{collection}/{document_id}/clone", "created",
+              idempotent=False),
+    Operation("export_document", "GET", "/search/document/{collection}/{document_id}/export", "search",
+              idempotent=True, timeout=30.0),
+
+    # 查詢與統計
+    Operation("search_documents", "GET", "/search/documents/{collection}", "search", idempotent=True),
+    Operation("count_documents", "GET", "/search/documents/{collection}/count", "search", idempotent=True),
+    Operation("distinct_values", "GET", "/search/documents/{collection}/distinct/{field}", "search",
+              idempotent=True),
+    # 統計與匯出可能掃描整個集合，宣告較長的超時（也不送出 hedged 請求）
+    Operation("collection_stats", "GET", "/search/documents/{collection}/stats", "search", idempotent=True,
+              timeout=30.0),
+    Operation("export_collection", "GET", "/search/documents/{collection}/export", "search", idempotent=True,
+              timeout=30.0),
+
+    # 批次操作
+    Operation("batch_create", "POST", "/add/documents/{collection}/batch", "raw", idempotent=False),
+    Operation("batch_update", "PUT", "/update/documents/{collection}/batch", "updated", idempotent=True),
+    Operation("batch_delete", "DELETE", "/delete/documents/{collection}", "deleted", idempotent=True),
+    Operation("drop_collection", "DELETE", "/delete/collection/{collection}/drop", "deleted", idempotent=True),
+)}
+
+
+def infer_operation(method: str, endpoint: str) -> Operation:
+    """
+    為未宣告的自定義端點推斷操作描述（供 APIManager._make_request 使用）
+
+    Args:
+        method: HTTP 方法（大寫）
+        endpoint: API 端點路徑
+
+    Returns:
+        依端點前綴推斷回應格式的操作描述
+    """
+    if endpoint == "/health_check":
+        shape = "health"
+    elif method == "POST" and "/add/document/" in endpoint:
+        shape = "created"
+    elif method == "GET" and "/search/" in endpoint:
+        shape = "search"
+    elif method == "PUT" and "/update/" in endpoint:
+        shape = "updated"
+    elif method == "DELETE" and "/delete/" in endpoint:
+        shape = "deleted"
+    else:
+        shape = "raw"
+    # 統計名稱取方法加上端點前三段（去除文件 ID 等變動部分）
+    name = f"{method} {'/'.join(endpoint.split('/')[:4])}"
+    return Operation(name, method, endpoint, shape, idempotent=method != "POST")
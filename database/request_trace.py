@@ -0,0 +1,254 @@
+"""
+API Request Trace
+
+APIManager 的請求追蹤與計時：
+- 追蹤紀錄只在 logger 啟用 DEBUG 時產生（可抽樣），停用時不做任何格式化
+- 請求與回應內容會遮蔽密碼、token 等敏感欄位並截斷長度
+- 每次呼叫記錄 connect / TTFB / total 時間，依操作彙總供監控使用
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 追蹤紀錄中需要遮蔽的欄位（不分大小寫）
+REDACTED_KEYS = frozenset({
+    "password", "password_hash", "new_password", "old_password",
+    "token", "access_token", "refresh_token", "secret", "secret_key",
+    "api_key", "authorization"
+})
+REDACTED = "***"
+
+# 各執行緒目前請求的建立連線時間（毫秒）
+_connect_timing = threading.local()
+
+
+def redact(value: Any) -> Any:
+    """
+    遞迴遮蔽字典與列表中的敏感欄位
+
+    Args:
+        value: 請求或回應內容
+
+    Returns:
+        遮蔽後的新物件（不修改輸入）
+    """
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in REDACTED_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def summarize(value: Any, max_chars: int = 512) -> str:
+    """
+    將內容遮蔽後轉為截斷的字串
+
+    Args:
+        value: 請求或回應內容
+        max_chars: 最大字元數
+
+    Returns:
+        適合寫入日誌的字串
+    """
+    text = repr(redact(value))
+    if len(text) > max_chars:
+        return f"{text[:max_chars]}...（共 {len(text)} 字元）"
+    return text
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """記錄建立 TCP 連線時間的 HTTP 連線"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timing.ms = getattr(_connect_timing, "ms", 0.0) + (time.perf_counter() - started) * 1000
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """記錄建立 TCP + TLS 連線時間的 HTTPS 連線"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timing.ms = getattr(_connect_timing, "ms", 0.0) + (time.perf_counter() - started) * 1000
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """新建連線時記錄 connect 時間的 HTTPAdapter（重用連線時 connect 為 0）"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool
+        }
+
+
+def start_timing() -> float:
+    """
+    開始計時一次請求
+
+    Returns:
+        開始時間（perf_counter）
+    """
+    _connect_timing.ms = 0.0
+    return time.perf_counter()
+
+
+def finish_timing(started: float, response=None) -> Dict[str, float]:
+    """
+    結束計時並取得本次請求的時間
+
+    Args:
+        started: start_timing 的返回值
+        response: requests 回應（可選，提供 TTFB）
+
+    Returns:
+        {"connect_ms", "ttfb_ms", "total_ms"}；ttfb_ms 為送出請求到收到回應標頭
+        （含建立連線），沒有回應時為 0
+    """
+    total_ms = (time.perf_counter() - started) * 1000
+    ttfb_ms = response.elapsed.total_seconds() * 1000 if response is not None else 0.0
+    return {
+        "connect_ms": round(getattr(_connect_timing, "ms", 0.0), 3),
+        "ttfb_ms": round(ttfb_ms, 3),
+        "total_ms": round(total_ms, 3)
+    }
+
+
+class AsyncRequestTimer:
+    """
+    以 httpx 的 trace 擴充記錄單次非同步請求的 connect 與 TTFB
+
+    用法：client.request(..., extensions={"trace": timer})，完成後呼叫 finish()。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._connect_started = None
+        self.connect_ms = 0.0
+        self.ttfb_ms = 0.0
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        if event_name == "connection.connect_tcp.started":
+            self._connect_started = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            if self._connect_started is not None:
+                self.connect_ms = (now - self._connect_started) * 1000
+        elif event_name.endswith("receive_response_headers.complete"):
+            self.ttfb_ms = (now - self.started) * 1000
+
+    def finish(self) -> Dict[str, float]:
+        """
+        結束計時
+
+        Returns:
+            {"connect_ms", "ttfb_ms", "total_ms"}，格式與 finish_timing 相同
+        """
+        return {
+            "connect_ms": round(self.connect_ms, 3),
+            "ttfb_ms": round(self.ttfb_ms, 3),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3)
+        }
+
+
+class RequestMetrics:
+    """依操作彙總的請求計時統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations: Dict[str, Dict[str, float]] = {}
+
+    def record(self, operation: str, timing: Dict[str, float], success: bool) -> None:
+        """
+        記錄一次請求
+
+        Args:
+            operation: 操作名稱
+            timing: finish_timing 的返回值
+            success: 請求是否成功
+        """
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = {
+                    "count": 0, "errors": 0, "new_connections": 0,
+                    "connect_ms": 0.0, "ttfb_ms": 0.0, "total_ms": 0.0, "max_total_ms": 0.0
+                }
+            stats["count"] += 1
+            if not success:
+                stats["errors"] += 1
+            if timing["connect_ms"] > 0:
+                stats["new_connections"] += 1
+            stats["connect_ms"] += timing["connect_ms"]
+            stats["ttfb_ms"] += timing["ttfb_ms"]
+            stats["total_ms"] += timing["total_ms"]
+            stats["max_total_ms"] = max(stats["max_total_ms"], timing["total_ms"])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        取得各操作的統計資訊
+
+        Returns:
+            {操作名稱: 次數、錯誤數、新連線數、平均 connect/TTFB/total 與最大 total（毫秒）}
+        """
+        with self._lock:
+            operations = {name: dict(stats) for name, stats in self._operations.items()}
+        result = {}
+        for name, stats in operations.items():
+            count = stats["count"] or 1
+            result[name] = {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "new_connections": stats["new_connections"],
+                "avg_connect_ms": round(stats["connect_ms"] / count, 3),
+                "avg_ttfb_ms": round(stats["ttfb_ms"] / count, 3),
+                "avg_total_ms": round(stats["total_ms"] / count, 3),
+                "max_total_ms": round(stats["max_total_ms"], 3)
+            }
+        return result
+
+    def reset(self) -> None:
+        """清除統計資訊"""
+        with self._lock:
+            self._operations.clear()
+
+
+def should_trace(logger, sample_rate: float) -> bool:
+    """
+    判斷本次請求是否產生追蹤紀錄
+
+    Args:
+        logger: APIManager 的 logger
+        sample_rate: 抽樣比例（0 ~ 1）
+
+    Returns:
+        logger 啟用 DEBUG 且抽中時返回 True
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    return sample_rate >= 1.0 or random.random() < sample_rate
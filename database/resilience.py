@@ -0,0 +1,291 @@
+"""
+API Resilience Policies
+
+APIManager 呼叫 MongoDB Operation API 時的容錯策略：
+- 讀取（GET）使用較短的超時，超過該操作 p95 延遲仍未回應時送出第二個（hedged）請求
+- 失敗時以 full jitter 指數退避重試；POST 帶 Idempotency-Key，重試沿用同一個鍵
+- 斷路器：連續失敗達門檻後開啟並立即失敗，冷卻後放行一個探測請求決定是否恢復
+
+所有狀態轉換與重試、hedge 次數都有計數器，供 get_resilience_stats() 查詢。
+"""
+
+import inspect
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+# 斷路器狀態
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 視為後端暫時性失敗的 HTTP 狀態碼（可重試並計入斷路器）
+RETRYABLE_STATUS_CODES = frozenset({500, 502, 503, 504})
+# 連線層級的失敗（_execute 產生的錯誤訊息）
+TRANSPORT_FAILURE_MESSAGES = frozenset({"請求超時", "連接失敗"})
+
+
+class ResilienceSettings:
+    """容錯策略設定（對應 config.yaml 的 api.resilience 區段）"""
+
+    def __init__(self,
+                 read_timeout: float = 5.0,
+                 write_timeout: float = 30.0,
+                 max_retries: int = 2,
+                 backoff_base: float = 0.1,
+                 backoff_max: float = 2.0,
+                 hedge_enabled: bool = True,
+                 hedge_percentile: float = 95.0,
+                 hedge_min_delay: float = 0.05,
+                 hedge_max_delay: float = 1.0,
+                 hedge_min_samples: int = 20,
+                 hedge_pool_size: int = 32,
+                 breaker_failure_threshold: int = 5,
+                 breaker_reset_timeout: float = 30.0):
+        """
+        初始化容錯策略設定
+
+        Args:
+            read_timeout: 未指定超時的讀取操作超時秒數
+            write_timeout: 未指定超時的寫入操作超時秒數
+            max_retries: 暫時性失敗的最大重試次數
+            backoff_base: 退避基準秒數（第 n 次重試最多等待 backoff_base * 2^n 秒）
+            backoff_max: 單次退避的最長秒數
+            hedge_enabled: 是否對讀取操作送出 hedged 請求
+            hedge_percentile: 觸發 hedged 請求的延遲百分位數
+            hedge_min_delay: hedged 請求的最短等待秒數
+            hedge_max_delay: hedged 請求的最長等待秒數（樣本不足時使用）
+            hedge_min_samples: 以百分位數估計延遲前需要的樣本數
+            hedge_pool_size: 同步版執行讀取與 hedged 請求的執行緒數量
+            breaker_failure_threshold: 開啟斷路器的連續失敗次數
+            breaker_reset_timeout: 斷路器開啟後等待多久放行探測請求（秒）
+        """
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_pool_size = hedge_pool_size
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+
+    @classmethod
+    def from_config(cls, values: Optional[Dict[str, Any]]) -> "ResilienceSettings":
+        """
+        由配置字典建立設定（未提供的欄位使用預設值）
+
+        Args:
+            values: config.yaml 的 api.resilience 區段
+
+        Returns:
+            容錯策略設定
+        """
+        values = values or {}
+        settings = {}
+        # 依 __init__ 宣告的型別轉換（預設值的型別可能較窄，例如以 95 表示 95.0）
+        for name, parameter in inspect.signature(cls).parameters.items():
+            value = values.get(name)
+            settings[name] = parameter.annotation(value) if value is not None else parameter.default
+        return cls(**settings)
+
+    def timeout_for(self, operation) -> float:
+        """
+        取得操作的超時秒數
+
+        Args:
+            operation: 操作描述
+
+        Returns:
+            操作宣告的超時，未宣告時讀取用 read_timeout、寫入用 write_timeout
+        """
+        if operation.timeout is not None:
+            return operation.timeout
+        return self.read_timeout if operation.method == "GET" else self.write_timeout
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        第 attempt 次重試前的等待秒數（full jitter）
+
+        Args:
+            attempt: 重試次數（從 1 開始）
+
+        Returns:
+            0 到 min(backoff_max, backoff_base * 2^attempt) 之間的隨機秒數
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def is_backend_failure(result: Dict[str, Any]) -> bool:
+    """
+    判斷結果是否為後端暫時性失敗（連線錯誤、超時或 5xx）
+
+    4xx 等由請求內容造成的錯誤不視為後端失敗，不重試也不計入斷路器。
+
+    Args:
+        result: _execute 產生的結果字典
+
+    Returns:
+        是否為後端暫時性失敗
+    """
+    if result.get("success"):
+        return False
+    if result.get("status_code") in RETRYABLE_STATUS_CODES:
+        return True
+    return result.get("message") in TRANSPORT_FAILURE_MESSAGES
+
+
+class CircuitBreaker:
+    """以連續失敗次數判斷的斷路器（closed → open → half_open → closed）"""
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_transition: Optional[Callable[[str, str], None]] = None):
+        """
+        初始化斷路器
+
+        Args:
+            failure_threshold: 開啟斷路器的連續失敗次數
+            reset_timeout: 開啟後等待多久放行探測請求（秒）
+            clock: 取得單調時間的函數
+            on_transition: 狀態轉換時呼叫的函數（舊狀態, 新狀態）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._on_transition = on_transition
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.transitions: Dict[str, int] = {}
+
+    def _transition(self, new_state: str) -> None:
+        """切換狀態並累計計數（呼叫端持有鎖）"""
+        old_state = self.state
+        if old_state == new_state:
+            return
+        self.state = new_state
+        key = f"{old_state}->{new_state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        if self._on_transition is not None:
+            self._on_transition(old_state, new_state)
+
+    def allow(self) -> bool:
+        """
+        判斷是否放行請求
+
+        Returns:
+            closed 時放行；open 且冷卻結束時轉為 half_open 並只放行一個探測請求
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """記錄成功：重置失敗次數，half_open 時關閉斷路器"""
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """記錄後端失敗：達門檻或探測失敗時開啟斷路器"""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._transition(OPEN)
+
+
+class LatencyTracker:
+    """各操作最近延遲的滑動視窗，用於估計 hedged 請求的等待時間"""
+
+    def __init__(self, window: int = 200):
+        """
+        初始化延遲追蹤器
+
+        Args:
+            window: 每個操作保留的最近樣本數
+        """
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, operation: str, seconds: float) -> None:
+        """
+        記錄一次成功請求的延遲
+
+        Args:
+            operation: 操作名稱
+            seconds: 延遲秒數
+        """
+        samples = self._samples.get(operation)
+        if samples is None:
+            samples = self._samples.setdefault(operation, deque(maxlen=self.window))
+        samples.append(seconds)
+
+    def percentile(self, operation: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """
+        取得操作延遲的百分位數
+
+        Args:
+            operation: 操作名稱
+            percentile: 百分位數（0 ~ 100）
+            min_samples: 至少需要的樣本數
+
+        Returns:
+            延遲秒數，樣本不足時返回 None
+        """
+        samples = self._samples.get(operation)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+class ResilienceStats:
+    """重試、hedge 與斷路器的計數器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "short_circuited": 0,
+        }
+
+    def increment(self, name: str) -> None:
+        """
+        累加計數器
+
+        Args:
+            name: 計數器名稱
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """取得計數器的副本"""
+        with self._lock:
+            return dict(self.counters)
@@ -7,8 +7,8 @@ logger = logging.getLogger(__name__)
 class RoleModel:
     """使用 API 的角色模型"""
     
-    def __init__(self):
-        self.api = api_manager
+    def __init__(self, api=None):
+        self.api = api or api_manager
         self._initialize_default_roles()
     
     def _log_success(self, message: str):
@@ -0,0 +1,192 @@
+"""
+API Transports
+
+APIManager 送出請求的傳輸層：
+
+- HTTPTransport：以 requests.Session 呼叫 MongoDB Operation API（預設）
+- InProcessTransport：在程序內交給 EmbeddedDocumentStore 處理，不經過網路；
+  用於單節點部署、基準測試（無網路的延遲上限基準）與測試
+
+兩者返回的回應物件都提供 status_code、text、json() 與 elapsed，
+APIManager 的回應轉換、重試與計時不需區分傳輸層。
+"""
+
+import json
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+try:
+    import httpx
+except ImportError:  # AsyncAPIManager 才需要
+    httpx = None
+
+from database.document_store import EmbeddedDocumentStore, is_operator_condition
+from database.request_trace import TimedHTTPAdapter
+
+
+def encode_params(params: Optional[Dict]) -> Optional[Dict[str, List[Any]]]:
+    """
+    將查詢參數轉為 MongoDB Operation API 的查詢字串編碼
+
+    略過 None、布林值為 True/False、列表為同名的多個參數；運算子條件（$lt、$gte 等）
+    以 JSON 字串作為參數值（requests 會把字典值編碼成它的鍵，範圍條件會被吃掉）。
+
+    Args:
+        params: 查詢參數
+
+    Returns:
+        參數名稱 -> 值列表
+    """
+    if not params:
+        return params
+    encoded = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if is_operator_condition(value):
+            encoded[key] = [json.dumps(value, separators=(",", ":"), default=str)]
+            continue
+        values = [value] if isinstance(value, (str, bytes)) or not hasattr(value, "__iter__") else list(value)
+        encoded[key] = [str(item) if isinstance(item, bool) else item for item in values if item is not None]
+    return encoded
+
+
+class Transport(ABC):
+    """APIManager 的傳輸層介面"""
+
+    # 未指定 base_url 時 APIManager 使用的基礎網址（None 表示使用 database.config 的 API_BASE_URL）
+    base_url: Optional[str] = None
+    # 是否經過網路（程序內傳輸不需要 hedged 讀取）
+    remote: bool = True
+
+    @abstractmethod
+    def request(self,
+                method: str,
+                url: str,
+                params: Optional[Dict] = None,
+                json: Optional[Dict] = None,
+                headers: Optional[Dict[str, str]] = None,
+                timeout: Optional[float] = None) -> Any:
+        """
+        送出請求
+
+        Args:
+            method: HTTP 方法
+            url: 完整網址
+            params: 查詢參數
+            json: JSON 請求內容
+            headers: 額外的請求標頭
+            timeout: 超時秒數
+
+        Returns:
+            具有 status_code、text、json()、elapsed 的回應物件；
+            連線層級的失敗以 requests.exceptions.RequestException 拋出
+        """
+
+    def close(self) -> None:
+        """釋放連線等資源"""
+
+
+class HTTPTransport(Transport):
+    """以 requests.Session 呼叫 MongoDB Operation API"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, session: Optional[requests.Session] = None):
+        """
+        初始化 HTTP 傳輸層
+
+        Args:
+            headers: 每個請求都帶上的標頭（Content-Type、Authorization）
+            session: 沿用的 requests.Session（例如黑名單的連線池 session，不另外掛載計時 adapter）
+        """
+        if session is not None:
+            self.session = session
+        else:
+            self.session = requests.Session()
+            # 記錄建立連線時間的 adapter（connect 計時）
+            adapter = TimedHTTPAdapter()
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def request(self, method, url, params=None, json=None, headers=None, timeout=None):
+        return self.session.request(method, url, params=encode_params(params), json=json, headers=headers,
+                                    timeout=timeout)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class InProcessResponse:
+    """程序內傳輸的回應（內容經過 JSON 序列化，與 HTTP 回應的型別一致且不共用文件物件）"""
+
+    __slots__ = ("status_code", "text", "elapsed")
+
+    def __init__(self, status_code: int, body: Any, elapsed: float):
+        self.status_code = status_code
+        self.text = json.dumps(body, ensure_ascii=False, default=str)
+        self.elapsed = timedelta(seconds=elapsed)
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class InProcessTransport(Transport):
+    """在程序內由 EmbeddedDocumentStore 處理請求，不經過網路"""
+
+    base_url = "http://embedded.local"
+    remote = False
+
+    def __init__(self, store: Optional[EmbeddedDocumentStore] = None):
+        """
+        初始化程序內傳輸層
+
+        Args:
+            store: 文件儲存（預設建立新的 EmbeddedDocumentStore）
+        """
+        self.store = store if store is not None else EmbeddedDocumentStore()
+
+    def request(self, method, url, params=None, json=None, headers=None, timeout=None):
+        started = time.perf_counter()
+        parts = urlsplit(url)
+        # 與 HTTP 相同：查詢參數以字串傳遞，同名參數取最後一個值
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        for key, values in (encode_params(params) or {}).items():
+            if values:
+                query[key] = str(values[-1])
+        status, body = self.store.handle(method.upper(), parts.path, query, json,
+                                         (headers or {}).get("Idempotency-Key"))
+        return InProcessResponse(status, body, time.perf_counter() - started)
+
+    def async_transport(self) -> "httpx.AsyncBaseTransport":
+        """
+        取得供 httpx.AsyncClient 使用的程序內傳輸層（AsyncAPIManager 使用）
+
+        Returns:
+            將 httpx 請求交給同一個 EmbeddedDocumentStore 處理的 transport
+        """
+        if httpx is None:
+            raise ImportError("AsyncAPIManager 需要安裝 httpx 套件：pip install 'httpx[http2]'")
+        return _AsyncInProcessTransport(self.store)
+
+
+if httpx is not None:
+    class _AsyncInProcessTransport(httpx.AsyncBaseTransport):
+        """httpx 版本的程序內傳輸層"""
+
+        def __init__(self, store: EmbeddedDocumentStore):
+            self.store = store
+
+        async def handle_async_request(self, request: "httpx.Request") -> "httpx.Response":
+            content = await request.aread()
+            query = {key: values[-1] for key, values in parse_qs(request.url.query.decode("ascii")).items()}
+            status, body = self.store.handle(request.method, request.url.path, query,
+                                             json.loads(content) if content else None,
+                                             request.headers.get("Idempotency-Key"))
+            return httpx.Response(status, request=request, headers={"Content-Type": "application/json"},
+                                  content=json.dumps(body, ensure_ascii=False, default=str).encode("utf-8"))
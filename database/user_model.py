@@ -8,8 +8,8 @@ logger = logging.getLogger(__name__)
 class UserModel:
     """使用 API 的用戶模型"""
     
-    def __init__(self):
-        self.api = api_manager
+    def __init__(self, api=None):
+        self.api = api or api_manager
     
     def _log_success(self, message: str):
         """記錄成功訊息"""
@@ -30,6 +30,14 @@ class UserModel:
             logger.error(f"❌ {message}")
             print(f"❌ {message}")
     
+    def _record_revocation_epoch(self, user_id: str, not_before: int):
+        """寫入使用者撤銷水位（經由黑名單使用的 API，與 token 驗證讀取的位置一致）"""
+        try:
+            from utils.jwt_utils import record_user_revocation_epoch
+            record_user_revocation_epoch(user_id, not_before)
+        except Exception as e:
+            self._log_warning(f"寫入撤銷水位失敗: {e}")
+    
     def register_user(self, email: str, password: str, username: str = None):
         """
         註冊新使用者
@@ -264,15 +272,17 @@ class UserModel:
             # 生成新密碼雜湊
             new_password_hash = generate_password_hash(new_password)
             
-            # 更新密碼
+            # 更新密碼，並以撤銷水位讓舊密碼期間簽發的 token 全部失效
+            now = datetime.now(UTC)
             update_data = {
                 "password_hash": new_password_hash,
-                "updated_at": datetime.now(UTC).isoformat()
+                "updated_at": now.isoformat()
             }
             
             update_result = self.api.update_user(user["_id"], update_data)
             
             if update_result.get("success"):
+                self._record_revocation_epoch(user["_id"], int(now.timestamp()))
                 self._log_success(f"密碼變更成功: {email}")
                 return True
             else:
@@ -300,14 +310,17 @@ class UserModel:
                 self._log_warning(f"使用者不存在: {email}")
                 return False
             
+            # 停用帳號時一併寫入撤銷水位，讓既有 token 全部失效
+            now = datetime.now(UTC)
             update_data = {
                 "is_active": False,
-                "updated_at": datetime.now(UTC).isoformat()
+                "updated_at": now.isoformat()
             }
             
             result = self.api.update_user(user["id"], update_data)
             
             if result.get("success"):
+                self._record_revocation_epoch(user["id"], int(now.timestamp()))
                 self._log_success(f"使用者已停用: {email}")
                 return True
             else:
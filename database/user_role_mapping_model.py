@@ -7,8 +7,8 @@ logger = logging.getLogger(__name__)
 class UserRoleMappingModel:
     """使用 API 的用戶角色映射模型"""
     
-    def __init__(self):
-        self.api = api_manager
+    def __init__(self, api=None):
+        self.api = api or api_manager
     
     def _log_success(self, message: str):
         """記錄成功訊息"""
@@ -31,7 +31,7 @@ class UserRoleMappingModel:
         try:
             # 檢查角色是否存在
             from database.role_model import RoleModel
-            role_model = RoleModel()
+            role_model = RoleModel(self.api)
             role = role_model.get_role_by_name(role_name)
             if not role:
                 raise Exception(f"角色 '{role_name}' 不存在")
@@ -62,7 +62,7 @@ class UserRoleMappingModel:
                         role_id = role_mapping.get("role_id")
                         if role_id:
                             from database.role_model import RoleModel
-                            role_model = RoleModel()
+                            role_model = RoleModel(self.api)
                             role = role_model.get_role_by_id(role_id)
                             if role:
                                 return role
@@ -84,7 +84,7 @@ class UserRoleMappingModel:
             
             # 從角色模型取得權限
             from database.role_model import RoleModel
-            role_model = RoleModel()
+            role_model = RoleModel(self.api)
             return role_model.get_role_permissions(role_name, include_inherited=True)
             
         except Exception as e:
@@ -105,7 +105,7 @@ class UserRoleMappingModel:
         try:
             # 檢查角色是否存在
             from database.role_model import RoleModel
-            role_model = RoleModel()
+            role_model = RoleModel(self.api)
             role = role_model.get_role_by_name(role_name)
             if not role:
                 raise Exception(f"角色 '{role_name}' 不存在")
@@ -171,7 +171,7 @@ class UserRoleMappingModel:
         try:
             # 這個功能需要透過用戶模型來實現
             from database.user_model import UserModel
-            user_model = UserModel()
+            user_model = UserModel(self.api)
             return user_model.get_all_active_users()
         except Exception as e:
             self._log_error("取得活躍使用者失敗", e)
@@ -182,7 +182,7 @@ class UserRoleMappingModel:
         try:
             # 先取得角色 ID
             from database.role_model import RoleModel
-            role_model = RoleModel()
+            role_model = RoleModel(self.api)
             role = role_model.get_role_by_name(role_name)
             if not role:
                 return []
@@ -223,7 +223,7 @@ class UserRoleMappingModel:
             
             # 從角色模型取得階層結構
             from database.role_model import RoleModel
-            role_model = RoleModel()
+            role_model = RoleModel(self.api)
             return role_model.get_role_hierarchy(role_name)
             
         except Exception as e:
@@ -236,7 +236,7 @@ class UserRoleMappingModel:
             if role_name:
                 # 指定角色名稱
                 from database.role_model import RoleModel
-                role_model = RoleModel()
+                role_model = RoleModel(self.api)
                 role = role_model.get_role_by_name(role_name)
                 if not role:
                     raise Exception(f"角色 '{role_name}' 不存在")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+JWT 非對稱金鑰對產生器
+產生 ES256 / EdDSA / RS256 的 PEM 私鑰與公鑰檔案
+"""
+
+import os
+import sys
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+def generate_private_key(algorithm):
+    """依演算法產生私鑰"""
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "ES384":
+        return ec.generate_private_key(ec.SECP384R1())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm.startswith("RS"):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"不支援的演算法: {algorithm}")
+
+def main():
+    """主函數"""
+    algorithm = sys.argv[1] if len(sys.argv) > 1 else "ES256"
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "keys"
+
+    private_key = generate_private_key(algorithm)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    private_path = os.path.join(output_dir, "jwt_private.pem")
+    public_path = os.path.join(output_dir, "jwt_public.pem")
+    with open(private_path, "wb") as f:
+        f.write(private_pem)
+    os.chmod(private_path, 0o600)
+    with open(public_path, "wb") as f:
+        f.write(public_pem)
+
+    print(f"🔐 JWT {algorithm} 金鑰對")
+    print("=" * 50)
+    print(f"私鑰: {private_path}")
+    print(f"公鑰: {public_path}")
+    print("=" * 50)
+    print("請在 config.yaml 設定：")
+    print(f"  algorithm: {algorithm}")
+    print(f"  private_key_file: {private_path}")
+    print(f"  public_key_file: {public_path}")
+    print("私鑰請勿提交到版本控制")
+
+if __name__ == "__main__":
+    main()
@@ -35,4 +35,9 @@ graceful_timeout = 30
 # 安全設置
 limit_request_line = 4094
 limit_request_fields = 100
-limit_request_field_size = 8190 
\ No newline at end of file
+limit_request_field_size = 8190
+
+# 工作進程結束時寫出尚未送出的撤銷紀錄（write-behind 佇列）
+def worker_exit(server, worker):
+    from utils.jwt_utils import shutdown_blacklist_system
+    shutdown_blacklist_system()
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
-from jwt_auth_middleware import verify_access_token
-from utils.jwt_utils import create_access_token, revoke_token
+import jwt
+from utils.jwt_utils import create_access_token, create_token_pair, revoke_token
+from utils.jwt_utils import verify_token_cached, verify_with_keyring, exchange_refresh_token
+from utils.claims import expand_claims
 from database.user_role_mapping_model import UserRoleMappingModel
 from database.user_model import UserModel
 
@@ -96,11 +98,12 @@ def login():
         "user_id": user["id"]
     }
     
-    # 使用 create_access_token 函數建立 token
-    token = create_access_token(token_data)
+    # 以共用 claims 同時建立 access token 與 refresh token（refresh token 用於 /refresh 換發）
+    tokens = create_token_pair(token_data)
     
     return jsonify({
-        "access_token": token,
+        "access_token": tokens["access_token"],
+        "refresh_token": tokens["refresh_token"],
         "user": {
             "id": user["id"],
             "email": user["email"],
@@ -120,14 +123,50 @@ def logout():
     
     token = auth_header.split(" ")[1]
     
-    # 使用 revoke_token 函數撤銷 token
-    revoke_token(token)
+    # 以金鑰集合驗證（支援輪替中的舊金鑰）；已過期但簽章正確的 access token 仍可登出，
+    # 以撤銷同時送出的 refresh token
+    try:
+        payload = verify_with_keyring(token, "access", options={"verify_exp": False})
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+    
+    # 請求內容中的 refresh token（可選）同樣先驗證簽章，且必須屬於同一位使用者
+    refresh_token = (request.get_json(silent=True) or {}).get("refresh_token")
+    refresh_payload = None
+    if refresh_token:
+        try:
+            refresh_payload = verify_with_keyring(refresh_token, "refresh", options={"verify_exp": False})
+        except jwt.InvalidTokenError:
+            return jsonify({"message": "Invalid refresh token"}), 401
+        if refresh_payload.get("sub") != payload.get("sub"):
+            return jsonify({"message": "Refresh token does not belong to this user"}), 403
+    
+    # 驗證後的 payload 直接交給 revoke_token
+    revoke_token(token, payload=payload)
+    if refresh_payload is not None:
+        revoke_token(refresh_token, reason="user_logout", payload=refresh_payload)
     
     return jsonify({
         "message": "Logout successful",
         "note": "Token has been revoked and can no longer be used"
     }), 200
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """
+    換發 token 端點 - 啟用 refresh token 輪替時同時換發新的 refresh token 並消耗舊的
+    """
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get("refresh_token")
+    if not refresh_token:
+        return jsonify({"message": "refresh_token is required"}), 400
+    
+    tokens = exchange_refresh_token(refresh_token)
+    if not tokens:
+        return jsonify({"message": "Invalid, expired or already used refresh token"}), 401
+    
+    return jsonify({"message": "Token refreshed", **tokens}), 200
+
 @auth_bp.route('/switch-account', methods=['POST'])
 def switch_account():
     """
@@ -187,8 +226,11 @@ def get_profile():
         
         token = auth_header.split(" ")[1]
         
-        # 使用 verify_access_token 函數驗證 token
-        payload = verify_access_token(token)
+        # 以金鑰集合驗證 token 並檢查黑名單與使用者撤銷水位（結果快取至 token 過期；compact token 還原為標準欄位）
+        try:
+            payload = expand_claims(verify_token_cached(token))
+        except jwt.InvalidTokenError:
+            return jsonify({"message": "Invalid or expired token"}), 401
         
         # 從 token 中取得使用者 email
         email = payload.get("email")
@@ -241,8 +283,11 @@ def update_profile():
         
         token = auth_header.split(" ")[1]
         
-        # 驗證 JWT token
-        payload = verify_access_token(token)
+        # 以金鑰集合驗證 token 並檢查黑名單與使用者撤銷水位（結果快取至 token 過期；compact token 還原為標準欄位）
+        try:
+            payload = expand_claims(verify_token_cached(token))
+        except jwt.InvalidTokenError:
+            return jsonify({"message": "Invalid or expired token"}), 401
         
         # 從 token 中取得使用者 email
         email = payload.get("email")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+APIManager 同步 / 非同步 A/B 延遲基準測試
+
+對本地替身 API 伺服器（tests/stub_api_server.py，可設定模擬往返延遲）量測：
+- 登入流程：get_user_by_email → update_user + get_user_role_mapping → get_role_by_id
+  （同步版依序 4 次往返；非同步版將互不相依的兩個呼叫以 gather_many 並行，3 次往返）
+- 個人資料頁：get_user_by_id、get_user_role_mapping、get_all_roles 三個獨立查詢
+- 扇出查詢：一次取得多位使用者
+
+使用方式：
+    python tests/benchmark_api_manager.py
+    python tests/benchmark_api_manager.py --latency 0.05 --iterations 20 --only login
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# 替身伺服器不需要真實的 API 與資料庫設定，未設定時以佔位值滿足 database.config 的檢查
+for _name in ("JWT_SECRET_KEY", "PUBLIC_API_BASE_URL", "PUBLIC_API_KEY", "INTERNAL_API_BASE_URL",
+              "INTERNAL_API_KEY", "DB_ACCOUNT", "DB_PASSWORD", "DB_URI", "DB_NAME"):
+    os.environ.setdefault(_name, "stub")
+
+from database.api_manager import APIManager
+from database.async_api_manager import AsyncAPIManager
+from stub_api_server import StubAPIServer
+
+
+class APIManagerBenchmark:
+    """同步 / 非同步 APIManager 延遲比較"""
+
+    def __init__(self, latency: float = 0.02, iterations: int = 30, fan_out: int = 10):
+        """
+        初始化基準測試器
+
+        Args:
+            latency: 替身伺服器每個請求的模擬延遲秒數
+            iterations: 每個情境的執行次數
+            fan_out: 扇出查詢的使用者數量
+        """
+        self.latency = latency
+        self.iterations = iterations
+        self.fan_out = fan_out
+        self.server = StubAPIServer(latency=latency)
+
+    def _seed(self) -> None:
+        """建立測試用的使用者、角色與角色映射"""
+        store = self.server.store
+        role_id = store.insert("roles", {"role_name": "user", "permissions": ["read"]})
+        self.user_ids: List[str] = []
+        for index in range(self.fan_out):
+            email = f"bench{index}@example.com"
+            user_id = store.insert("users", {"email": email, "username": f"bench{index}", "is_active": True})
+            store.insert("user_role_mapping", {"user_id": user_id, "role_id": role_id, "is_active": True})
+            self.user_ids.append(user_id)
+        self.email = "bench0@example.com"
+        self.user_id = self.user_ids[0]
+        self.role_id = role_id
+
+    @staticmethod
+    def _summary(name: str, samples: List[float]) -> Dict:
+        """輸出並返回延遲統計（毫秒）"""
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        result = {"name": name, "p50_ms": statistics.median(ordered), "p95_ms": p95}
+        print(f"  {name:<40} p50 {result['p50_ms']:>8.1f} ms   p95 {p95:>8.1f} ms")
+        return result
+
+    def _measure_sync(self, name: str, func: Callable[[], object]) -> Dict:
+        func()  # 暖身（建立連線）
+        samples = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return self._summary(name, samples)
+
+    async def _measure_async(self, name: str, func: Callable[[], Awaitable[object]]) -> Dict:
+        await func()  # 暖身（建立連線）
+        samples = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            await func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return self._summary(name, samples)
+
+    def _compare(self, sync_result: Dict, async_result: Dict) -> None:
+        speedup = sync_result["p50_ms"] / async_result["p50_ms"] if async_result["p50_ms"] else 0
+        print(f"  p50 加速比: {speedup:.2f}x")
+        print()
+
+    def benchmark_login(self, api: APIManager, async_api: AsyncAPIManager, loop) -> None:
+        """登入流程：依序查詢與並行查詢的比較"""
+        print("🔧 登入流程")
+        print("-" * 80)
+
+        def sync_login():
+            user = api.get_user_by_email(self.email)["data"][0]
+            api.update_user(user["_id"], {"last_login": "now"})
+            mapping = api.get_user_role_mapping(user["_id"])["data"][0]
+            return api.get_role_by_id(mapping["role_id"])
+
+        async def async_login():
+            user = (await async_api.get_user_by_email(self.email))["data"][0]
+            _, mapping = await async_api.gather_many(
+                async_api.update_user(user["_id"], {"last_login": "now"}),
+                async_api.get_user_role_mapping(user["_id"])
+            )
+            return await async_api.get_role_by_id(mapping["data"][0]["role_id"])
+
+        sync_result = self._measure_sync("同步 APIManager（4 次依序往返）", sync_login)
+        async_result = loop.run_until_complete(
+            self._measure_async("AsyncAPIManager + gather_many", async_login))
+        self._compare(sync_result, async_result)
+
+    def benchmark_profile(self, api: APIManager, async_api: AsyncAPIManager, loop) -> None:
+        """個人資料頁：三個獨立查詢"""
+        print("🔧 個人資料頁（三個獨立查詢）")
+        print("-" * 80)
+
+        def sync_profile():
+            return (api.get_user_by_id(self.user_id),
+                    api.get_user_role_mapping(self.user_id),
+                    api.get_all_roles())
+
+        async def async_profile():
+            return await async_api.gather_many(
+                async_api.get_user_by_id(self.user_id),
+                async_api.get_user_role_mapping(self.user_id),
+                async_api.get_all_roles()
+            )
+
+        sync_result = self._measure_sync("同步 APIManager", sync_profile)
+        async_result = loop.run_until_complete(self._measure_async("AsyncAPIManager + gather_many", async_profile))
+        self._compare(sync_result, async_result)
+
+    def benchmark_fan_out(self, api: APIManager, async_api: AsyncAPIManager, loop) -> None:
+        """扇出查詢：一次取得多位使用者"""
+        print(f"🔧 扇出查詢（{self.fan_out} 位使用者）")
+        print("-" * 80)
+
+        def sync_fan_out():
+            return [api.get_user_by_id(user_id) for user_id in self.user_ids]
+
+        async def async_fan_out():
+            return await async_api.gather_many(*(async_api.get_user_by_id(user_id) for user_id in self.user_ids))
+
+        sync_result = self._measure_sync("同步 APIManager", sync_fan_out)
+        async_result = loop.run_until_complete(self._measure_async("AsyncAPIManager + gather_many", async_fan_out))
+        self._compare(sync_result, async_result)
+
+    def run_all(self, only: List[str] = None):
+        """
+        執行所有（或指定的）基準測試
+
+        Args:
+            only: 只執行的項目名稱列表
+        """
+        benchmarks = {
+            "login": self.benchmark_login,
+            "profile": self.benchmark_profile,
+            "fan_out": self.benchmark_fan_out
+        }
+
+        with self.server:
+            self._seed()
+            api = APIManager(base_url=self.server.url, api_key="stub")
+            loop = asyncio.new_event_loop()
+            async_api = AsyncAPIManager(base_url=self.server.url, api_key="stub")
+
+            print("=" * 80)
+            print(f"🚀 APIManager A/B 基準測試（模擬延遲 {self.latency * 1000:.0f} ms，每項 {self.iterations} 次，"
+                  f"HTTP/2: {async_api.http2}）")
+            print("=" * 80)
+            try:
+                for name, benchmark in benchmarks.items():
+                    if only and name not in only:
+                        continue
+                    benchmark(api, async_api, loop)
+            finally:
+                loop.run_until_complete(async_api.aclose())
+                loop.close()
+
+
+def main():
+    """主函數"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="APIManager 同步 / 非同步延遲基準測試")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="替身伺服器每個請求的模擬延遲秒數")
+    parser.add_argument("--iterations", type=int, default=30,
+                        help="每個情境的執行次數")
+    parser.add_argument("--only", nargs="*",
+                        help="只執行指定的基準測試項目")
+
+    args = parser.parse_args()
+
+    APIManagerBenchmark(args.latency, args.iterations).run_all(args.only)
+
+
+if __name__ == "__main__":
+    main()
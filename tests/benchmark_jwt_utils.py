@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JWT Utils 效能基準測試腳本
+
+在本地（不連線 MongoDB API）量測 utils 模組熱路徑的吞吐量：
+- 黑名單鍵：SHA-256(token) 與 jti 的比較
+- 撤銷時取得過期時間：驗簽解碼與重用 payload / 不驗簽解析的比較
+- Token 簽發：預先準備的 TokenSigner 與舊版 jwt.encode 流程的比較
+- Token 對簽發：共用 claims 序列化的 create_token_pair 與分別簽發的比較
+- 批次簽發：create_access_tokens / iter_access_tokens 與逐一呼叫的比較
+- jti 產生：uuid4 字串與批次 base64url（compact）的比較
+- Claim profile：standard 與 compact 的 token 大小與每次請求的雜湊成本
+- 簽章演算法：HS256 / RS256 / ES256 / EdDSA 的簽發與驗證吞吐量（需要 cryptography）
+- 已驗證 token 快取：每次驗簽與 verify_token_cached 命中的比較
+- 時鐘：system / coarse / frozen 模式的讀取成本與 create_access_token 吞吐量
+
+使用方式：
+    python tests/benchmark_jwt_utils.py
+    python tests/benchmark_jwt_utils.py --only blacklist_keys --iterations 50000
+"""
+
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+import jwt
+
+from utils.jwt_config import JWTConfig
+from utils.blacklist_manager import BlacklistManager
+from utils.jti_generator import JTIGenerator
+from utils.token_signer import TokenSigner
+from utils.clock import SystemClock, CoarseClock, FrozenClock
+from utils import jwt_utils
+
+BENCHMARK_SECRET = "benchmark-secret-key-0123456789abcdef"
+
+
+def legacy_create_access_token(data: Dict[str, Any], jwt_config: JWTConfig) -> str:
+    """舊版 create_access_token 的流程（作為比較基準）"""
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + timedelta(minutes=jwt_config.access_token_expires)
+    to_encode.update({
+        "exp": expire,
+        "type": "access",
+        "iat": datetime.now(timezone.utc),
+        "jti": str(uuid.uuid4())
+    })
+    return jwt.encode(to_encode, jwt_config.secret_key, algorithm=jwt_config.algorithm)
+
+
+class JWTBenchmark:
+    """JWT Utils 效能基準測試器"""
+
+    def __init__(self, iterations: int = 20000):
+        """
+        初始化基準測試器
+
+        Args:
+            iterations: 每個項目的執行次數
+        """
+        self.iterations = iterations
+        self.config = JWTConfig(
+            secret_key=BENCHMARK_SECRET,
+            config_file=os.path.join(PROJECT_ROOT, "config.yaml")
+        )
+        self.results: List[Dict] = []
+
+        # 與 /login 相同結構的測試 token
+        now = int(time.time())
+        self.payload = {
+            "sub": "benchmark@example.com",
+            "email": "benchmark@example.com",
+            "user_id": "64b7f0c2e1a2b3c4d5e6f789",
+            "type": "access",
+            "iat": now,
+            "exp": now + 3600,
+            "jti": str(uuid.uuid4())
+        }
+        self.token = jwt.encode(self.payload, BENCHMARK_SECRET, algorithm="HS256")
+
+    def measure(self, name: str, func: Callable[[], object]) -> Dict:
+        """
+        量測函數的每秒執行次數
+
+        Args:
+            name: 項目名稱
+            func: 要量測的函數（無參數）
+
+        Returns:
+            量測結果
+        """
+        # 暖身
+        for _ in range(min(1000, self.iterations)):
+            func()
+
+        started = time.perf_counter()
+        for _ in range(self.iterations):
+            func()
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "name": name,
+            "ops_per_sec": self.iterations / elapsed,
+            "us_per_op": elapsed / self.iterations * 1_000_000
+        }
+        self.results.append(result)
+        print(f"  {name:<48} {result['ops_per_sec']:>12,.0f} ops/s  {result['us_per_op']:>8.2f} µs/op")
+        return result
+
+    def _make_manager(self, key_mode: str) -> BlacklistManager:
+        """建立指定鍵模式的黑名單管理器（不啟用背景執行緒與遠端查詢）"""
+        self.config.blacklist_key_mode = key_mode
+        self.config.blacklist_bloom_enabled = False
+        self.config.blacklist_write_behind_enabled = False
+        return BlacklistManager(jwt_config=self.config)
+
+    def benchmark_blacklist_keys(self):
+        """比較 token_hash 與 jti 兩種黑名單鍵的計算成本與大小"""
+        print("🔧 黑名單鍵：token_hash vs jti")
+        print("-" * 80)
+
+        hash_manager = self._make_manager("token_hash")
+        jti_manager = self._make_manager("jti")
+        token, payload = self.token, self.payload
+
+        self.measure("token_hash：SHA-256(token)",
+                     lambda: hash_manager._lookup_keys(token))
+        self.measure("jti：由已驗證的 payload 取得",
+                     lambda: jti_manager._lookup_keys(token, payload))
+        self.measure("jti：不驗簽解析 token 取得",
+                     lambda: jti_manager._lookup_keys(token))
+
+        hash_key = hash_manager._key_id(hash_manager._lookup_keys(token)[0])
+        jti_key = jti_manager._key_id(jti_manager._lookup_keys(token, payload)[0])
+        print(f"  token 長度: {len(token)} bytes")
+        print(f"  鍵長度: token_hash={len(hash_key)} bytes, jti={len(jti_key)} bytes")
+        print()
+
+    def benchmark_revocation_expiration(self):
+        """比較撤銷時取得 exp 的成本（舊版每次撤銷都會重新驗簽解碼）"""
+        print("🔧 撤銷時取得過期時間")
+        print("-" * 80)
+
+        manager = self._make_manager("token_hash")
+        token, payload = self.token, self.payload
+
+        self.measure("舊路徑：jwt.decode 驗簽後取得 exp",
+                     lambda: jwt.decode(token, BENCHMARK_SECRET, algorithms=["HS256"])["exp"])
+        self.measure("傳入已驗證的 payload",
+                     lambda: manager._get_token_expiration(token, payload))
+        self.measure("傳入 exp",
+                     lambda: manager._get_token_expiration(token, exp=payload["exp"]))
+        self.measure("不驗簽解析 payload",
+                     lambda: manager._get_token_expiration(token))
+        self.measure("建立完整黑名單文件（傳入 payload）",
+                     lambda: manager._build_document(token, "logout", manager._lookup_keys(token, payload), payload))
+        print()
+
+    def benchmark_token_minting(self):
+        """比較 create_access_token 與舊版 jwt.encode 流程的每秒簽發數"""
+        print("🔧 Token 簽發：TokenSigner vs 舊版 jwt.encode")
+        print("-" * 80)
+
+        jwt_utils.set_jwt_config(self.config)
+        claims = {
+            "sub": self.payload["sub"],
+            "email": self.payload["email"],
+            "user_id": self.payload["user_id"]
+        }
+
+        legacy = self.measure("舊版：datetime + jwt.encode",
+                              lambda: legacy_create_access_token(claims, self.config))
+        current = self.measure("create_access_token（TokenSigner）",
+                               lambda: jwt_utils.create_access_token(claims))
+        print(f"  加速比: {current['ops_per_sec'] / legacy['ops_per_sec']:.2f}x")
+        print()
+
+    def benchmark_token_pairs(self):
+        """比較單次共用 claims 的 create_token_pair 與分別簽發兩個 token"""
+        print("🔧 Token 對簽發：共用 claims vs 分別簽發")
+        print("-" * 80)
+
+        jwt_utils.set_jwt_config(self.config)
+        claims = {
+            "sub": self.payload["sub"],
+            "email": self.payload["email"],
+            "user_id": self.payload["user_id"]
+        }
+
+        separate = self.measure("分別呼叫 create_access/refresh_token",
+                                lambda: (jwt_utils.create_access_token(claims),
+                                         jwt_utils.create_refresh_token(claims)))
+        paired = self.measure("create_token_pair（共用 claims）",
+                              lambda: jwt_utils.create_token_pair(claims))
+        print(f"  加速比: {paired['ops_per_sec'] / separate['ops_per_sec']:.2f}x")
+
+        batch = [dict(claims, user_id=str(i)) for i in range(100)]
+        bulk = self.measure("create_token_pairs（每次 100 個主體）",
+                            lambda: jwt_utils.create_token_pairs(batch))
+        print(f"  批次每秒 token 對數: {bulk['ops_per_sec'] * len(batch):,.0f}")
+        print()
+
+    def benchmark_batch_minting(self, batch_size: int = 1000):
+        """比較逐一呼叫 create_access_token 與批次簽發 API"""
+        print(f"🔧 批次簽發：每批 {batch_size:,} 個身分")
+        print("-" * 80)
+
+        jwt_utils.set_jwt_config(self.config)
+        batch = [
+            {"sub": f"device-{i}", "user_id": f"device-{i}", "role": "service"}
+            for i in range(batch_size)
+        ]
+        rounds = max(1, self.iterations // batch_size)
+
+        def timed(name: str, func: Callable[[], object]) -> float:
+            started = time.perf_counter()
+            for _ in range(rounds):
+                func()
+            rate = rounds * batch_size / (time.perf_counter() - started)
+            print(f"  {name:<48} {rate:>12,.0f} tokens/s")
+            return rate
+
+        loop = timed("逐一呼叫 create_access_token",
+                     lambda: [jwt_utils.create_access_token(claims) for claims in batch])
+        timed("iter_access_tokens（串流）",
+              lambda: sum(1 for _ in jwt_utils.iter_access_tokens(batch)))
+        bulk = timed("create_access_tokens", lambda: jwt_utils.create_access_tokens(batch))
+        workers = os.cpu_count() or 1
+        if workers > 1:
+            big_batch = batch * workers * 4
+            started = time.perf_counter()
+            jwt_utils.create_access_tokens(big_batch, processes=workers, chunk_size=batch_size)
+            rate = len(big_batch) / (time.perf_counter() - started)
+            print(f"  {f'create_access_tokens（{workers} 個子程序）':<48} {rate:>12,.0f} tokens/s")
+        print(f"  批次加速比: {bulk / loop:.2f}x")
+        print()
+
+    def benchmark_jti_generation(self):
+        """比較 uuid 與 compact 兩種 jti 模式的產生成本與 token 大小"""
+        print("🔧 jti 產生：uuid vs compact")
+        print("-" * 80)
+
+        uuid_jti = self.measure("uuid：str(uuid.uuid4())", JTIGenerator("uuid"))
+        compact_jti = self.measure("compact：批次 os.urandom + base64url", JTIGenerator("compact"))
+        print(f"  加速比: {compact_jti['ops_per_sec'] / uuid_jti['ops_per_sec']:.2f}x")
+
+        claims = {"sub": self.payload["sub"], "email": self.payload["email"], "user_id": self.payload["user_id"]}
+        sizes = {}
+        for mode in ("uuid", "compact"):
+            self.config.jti_mode = mode
+            jwt_utils.set_jwt_config(self.config)
+            sizes[mode] = len(jwt_utils.create_access_token(claims))
+            self.measure(f"create_access_token（jti_mode={mode}）",
+                         lambda: jwt_utils.create_access_token(claims))
+        self.config.jti_mode = "uuid"
+        jwt_utils.set_jwt_config(self.config)
+        print(f"  token 長度: uuid={sizes['uuid']} bytes, compact={sizes['compact']} bytes")
+        print()
+
+    def benchmark_claim_profiles(self):
+        """比較 standard 與 compact claim profile 的 token 大小與黑名單雜湊成本"""
+        print("🔧 Claim profile：standard vs compact")
+        print("-" * 80)
+
+        claims = {"sub": self.payload["sub"], "email": self.payload["email"], "user_id": self.payload["user_id"]}
+        manager = self._make_manager("token_hash")
+        sizes = {}
+        for profile in ("standard", "compact"):
+            self.config.claim_profile = profile
+            self.config.jti_mode = "compact" if profile == "compact" else "uuid"
+            jwt_utils.set_jwt_config(self.config)
+            token = jwt_utils.create_access_token(claims)
+            sizes[profile] = len(token)
+            self.measure(f"_hash_token（{profile}，{len(token)} bytes）",
+                         lambda: manager._hash_token(token))
+        self.config.claim_profile = "standard"
+        self.config.jti_mode = "uuid"
+        jwt_utils.set_jwt_config(self.config)
+
+        saved = sizes["standard"] - sizes["compact"]
+        print(f"  token 長度: standard={sizes['standard']} bytes, compact={sizes['compact']} bytes")
+        print(f"  每個 token 減少 {saved} bytes（{saved / sizes['standard']:.1%}）")
+        print()
+
+    def _generate_private_key(self, algorithm: str) -> str:
+        """在記憶體中產生指定演算法的 PEM 私鑰"""
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+        if algorithm == "ES256":
+            key = ec.generate_private_key(ec.SECP256R1())
+        elif algorithm == "EdDSA":
+            key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        return key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ).decode()
+
+    def benchmark_signing_algorithms(self):
+        """比較各簽章演算法的簽發與驗證吞吐量及 token 大小"""
+        print("🔧 簽章演算法：簽發 / 驗證吞吐量")
+        print("-" * 80)
+
+        try:
+            import cryptography  # noqa: F401
+        except ImportError:
+            print("  ⚠️ 未安裝 cryptography，略過非對稱演算法")
+            print()
+            return
+
+        claims = {"sub": self.payload["sub"], "email": self.payload["email"], "user_id": self.payload["user_id"]}
+        original = (self.config.algorithm, self.config.private_key, self.config.public_key)
+        for algorithm in ("HS256", "RS256", "ES256", "EdDSA"):
+            self.config.algorithm = algorithm
+            self.config.private_key = None if algorithm == "HS256" else self._generate_private_key(algorithm)
+            self.config.public_key = None
+            signer = TokenSigner(self.config)
+            token = signer.sign(dict(claims, exp=int(time.time()) + 3600))
+            self.measure(f"{algorithm} 簽發（{len(token)} bytes）", lambda: signer.sign(dict(claims)))
+            self.measure(f"{algorithm} 驗證", lambda: signer.verify(token))
+        self.config.algorithm, self.config.private_key, self.config.public_key = original
+        print()
+
+    def benchmark_verified_cache(self):
+        """比較每次驗簽與已驗證 token 快取命中的成本（不連線黑名單 API）"""
+        print("🔧 已驗證 token 快取")
+        print("-" * 80)
+
+        enable_blacklist = self.config.enable_blacklist
+        self.config.enable_blacklist = False
+        jwt_utils.set_jwt_config(self.config)
+        token = self.token
+
+        def verifier(value: str) -> Dict[str, Any]:
+            return jwt.decode(value, BENCHMARK_SECRET, algorithms=["HS256"])
+
+        uncached = self.measure("每次 jwt.decode 驗簽", lambda: verifier(token))
+        cached = self.measure("verify_token_cached 命中",
+                              lambda: jwt_utils.verify_token_cached(token, verifier))
+        print(f"  加速比: {cached['ops_per_sec'] / uncached['ops_per_sec']:.2f}x")
+        print(f"  快取統計: {jwt_utils.get_verified_token_cache_stats()}")
+
+        self.config.enable_blacklist = enable_blacklist
+        jwt_utils.set_jwt_config(self.config)
+        print()
+
+    def benchmark_clock_modes(self):
+        """比較各時鐘模式的讀取成本與對簽發吞吐量的影響"""
+        print("🔧 時鐘：system / coarse / frozen")
+        print("-" * 80)
+
+        jwt_utils.set_jwt_config(self.config)
+        claims = {"sub": self.payload["sub"], "email": self.payload["email"], "user_id": self.payload["user_id"]}
+        self.measure("舊路徑：datetime.now(timezone.utc)", lambda: datetime.now(timezone.utc))
+        for name, clock in (("system", SystemClock()), ("coarse", CoarseClock()), ("frozen", FrozenClock())):
+            self.measure(f"{name}：讀取時間", clock)
+            jwt_utils.set_clock(clock)
+            self.measure(f"{name}：create_access_token", lambda: jwt_utils.create_access_token(claims))
+            jwt_utils.set_clock(None)
+        print()
+
+    def run_all(self, only: List[str] = None):
+        """
+        執行所有（或指定的）基準測試
+
+        Args:
+            only: 只執行的項目名稱列表
+        """
+        benchmarks = {
+            "blacklist_keys": self.benchmark_blacklist_keys,
+            "revocation_expiration": self.benchmark_revocation_expiration,
+            "token_minting": self.benchmark_token_minting,
+            "token_pairs": self.benchmark_token_pairs,
+            "batch_minting": self.benchmark_batch_minting,
+            "jti_generation": self.benchmark_jti_generation,
+            "claim_profiles": self.benchmark_claim_profiles,
+            "signing_algorithms": self.benchmark_signing_algorithms,
+            "verified_cache": self.benchmark_verified_cache,
+            "clock_modes": self.benchmark_clock_modes
+        }
+
+        print("=" * 80)
+        print(f"🚀 JWT Utils 基準測試（每項 {self.iterations:,} 次）")
+        print("=" * 80)
+        for name, benchmark in benchmarks.items():
+            if only and name not in only:
+                continue
+            benchmark()
+
+
+def main():
+    """主函數"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="JWT Utils 效能基準測試")
+    parser.add_argument("--iterations", type=int, default=20000,
+                        help="每個項目的執行次數")
+    parser.add_argument("--only", nargs="*",
+                        help="只執行指定的基準測試項目")
+
+    args = parser.parse_args()
+
+    JWTBenchmark(args.iterations).run_all(args.only)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料模型方法的無網路延遲基準
+
+以 InProcessTransport（程序內 EmbeddedDocumentStore）執行 UserModel、RoleModel、
+UserRoleMappingModel、BlacklistModel 的每個方法，量測不含網路往返的延遲，
+作為各方法延遲的上限基準（實際部署的延遲 = 本基準 + API 往返次數 × 網路延遲）。
+加上 --http 時，同樣的方法也經由本地替身伺服器（HTTP over loopback）量測一次以便比較。
+
+使用方式：
+    python tests/benchmark_model_baseline.py
+    python tests/benchmark_model_baseline.py --iterations 200 --http
+"""
+
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+from typing import Any, Callable, Dict, List, Optional
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# 程序內傳輸不需要真實的 API 與資料庫設定，未設定時以佔位值滿足 database.config 的檢查
+for _name in ("JWT_SECRET_KEY", "PUBLIC_API_BASE_URL", "PUBLIC_API_KEY", "INTERNAL_API_BASE_URL",
+              "INTERNAL_API_KEY", "DB_ACCOUNT", "DB_PASSWORD", "DB_URI", "DB_NAME"):
+    os.environ.setdefault(_name, "stub")
+
+from database.api_manager import APIManager
+from database.blacklist_model import BlacklistModel
+from database.resilience import ResilienceSettings
+from database.role_model import RoleModel
+from database.transport import InProcessTransport
+from database.user_model import UserModel
+from database.user_role_mapping_model import UserRoleMappingModel
+from stub_api_server import StubAPIServer
+
+
+class ModelBaselineBenchmark:
+    """各資料模型方法的延遲基準"""
+
+    def __init__(self, api: APIManager, iterations: int = 100):
+        """
+        初始化基準測試器
+
+        Args:
+            api: 模型使用的 API 管理器
+            iterations: 每個方法的執行次數
+        """
+        self.api = api
+        self.iterations = iterations
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.roles = RoleModel(api)
+            self.users = UserModel(api)
+            self.mappings = UserRoleMappingModel(api)
+            self.blacklist = BlacklistModel(api)
+
+    def _measure(self,
+                 name: str,
+                 func: Callable[[Any], Any],
+                 setup: Optional[Callable[[], Any]] = None,
+                 iterations: Optional[int] = None) -> Dict:
+        """
+        量測單一方法（模型的 print 輸出不顯示）
+
+        Args:
+            name: 方法名稱
+            func: 以 setup 返回值為參數的待測函數
+            setup: 每次執行前的準備函數（不計入時間）
+            iterations: 執行次數（預設使用 self.iterations）
+
+        Returns:
+            延遲統計（毫秒）
+        """
+        samples = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(iterations or self.iterations):
+                argument = setup() if setup else None
+                started = time.perf_counter()
+                func(argument)
+                samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        return {
+            "name": name,
+            "p50_ms": statistics.median(samples),
+            "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        }
+
+    def run(self) -> List[Dict]:
+        """
+        執行所有模型方法
+
+        Returns:
+            各方法的延遲統計列表
+        """
+        users, roles, mappings, blacklist = self.users, self.roles, self.mappings, self.blacklist
+        password = "Benchmark#2024"
+        # 密碼雜湊刻意緩慢，只執行少量次數
+        hash_iterations = max(3, self.iterations // 20)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            email = f"baseline-{uuid.uuid4().hex[:8]}@example.com"
+            user_id = users.register_user(email, password)
+            mappings.assign_role_to_user(user_id, email, "user")
+            roles.create_role("baseline", "基準測試角色", ["baseline:read"], ["user"])
+            role_id = roles.get_role_by_name("baseline")["_id"]
+        token = f"baseline-token-{uuid.uuid4().hex}"
+        expires_at = datetime.now(UTC) + timedelta(hours=1)
+
+        def new_email():
+            return f"baseline-{uuid.uuid4().hex[:12]}@example.com"
+
+        def new_user():
+            value = new_email()
+            with contextlib.redirect_stdout(io.StringIO()):
+                users.register_user(value, password)
+            return value
+
+        def new_role():
+            name = f"tmp-{uuid.uuid4().hex[:8]}"
+            with contextlib.redirect_stdout(io.StringIO()):
+                roles.create_role(name, "暫存角色", [])
+            return name
+
+        def new_token():
+            value = f"tmp-token-{uuid.uuid4().hex}"
+            blacklist.add_to_blacklist(value, user_id, expires_at)
+            return value
+
+        cases = [
+            # UserModel
+            ("UserModel.register_user", lambda _: users.register_user(new_email(), password), None, hash_iterations),
+            ("UserModel.authenticate_user", lambda _: users.authenticate_user(email, password), None, hash_iterations),
+            ("UserModel.change_password", lambda _: users.change_password(email, password, password), None,
+             hash_iterations),
+            ("UserModel.get_user_by_email", lambda _: users.get_user_by_email(email), None, None),
+            ("UserModel.update_user_profile", lambda _: users.update_user_profile(email, {"nickname": "baseline"}),
+             None, None),
+            ("UserModel.deactivate_user", lambda value: users.deactivate_user(value), new_user, hash_iterations),
+            ("UserModel.get_all_active_users", lambda _: users.get_all_active_users(), None, None),
+            # RoleModel
+            ("RoleModel.create_role", lambda _: roles.create_role(f"tmp-{uuid.uuid4().hex[:8]}", "暫存角色", []),
+             None, None),
+            ("RoleModel.get_role_by_name", lambda _: roles.get_role_by_name("admin"), None, None),
+            ("RoleModel.get_role_by_id", lambda _: roles.get_role_by_id(role_id), None, None),
+            ("RoleModel.get_all_roles", lambda _: roles.get_all_roles(), None, None),
+            ("RoleModel.get_role_permissions", lambda _: roles.get_role_permissions("baseline"), None, None),
+            ("RoleModel.update_role", lambda _: roles.update_role("baseline", role_description="更新"), None, None),
+            ("RoleModel.deactivate_role", lambda name: roles.deactivate_role(name), new_role, None),
+            ("RoleModel.activate_role", lambda name: roles.activate_role(name), new_role, None),
+            ("RoleModel.check_role_permission", lambda _: roles.check_role_permission("baseline", "user:read"),
+             None, None),
+            ("RoleModel.get_role_hierarchy", lambda _: roles.get_role_hierarchy("admin"), None, None),
+            ("RoleModel.delete_role", lambda name: roles.delete_role(name), new_role, None),
+            # UserRoleMappingModel
+            ("UserRoleMappingModel.assign_role_to_user",
+             lambda _: mappings.assign_role_to_user(user_id, email, "user"), None, None),
+            ("UserRoleMappingModel.get_user_role", lambda _: mappings.get_user_role(user_id), None, None),
+            ("UserRoleMappingModel.get_user_permissions", lambda _: mappings.get_user_permissions(user_id), None, None),
+            ("UserRoleMappingModel.check_user_permission",
+             lambda _: mappings.check_user_permission(user_id, "user:read"), None, None),
+            ("UserRoleMappingModel.update_user_role", lambda _: mappings.update_user_role(user_id, "user"), None, None),
+            ("UserRoleMappingModel.deactivate_user", lambda _: mappings.deactivate_user(user_id), None, None),
+            ("UserRoleMappingModel.activate_user", lambda _: mappings.activate_user(user_id), None, None),
+            ("UserRoleMappingModel.get_all_active_users", lambda _: mappings.get_all_active_users(), None, None),
+            ("UserRoleMappingModel.get_users_by_role", lambda _: mappings.get_users_by_role("user"), None, None),
+            ("UserRoleMappingModel.ensure_user_role_exists",
+             lambda _: mappings.ensure_user_role_exists(user_id, email), None, None),
+            ("UserRoleMappingModel.get_user_role_hierarchy",
+             lambda _: mappings.get_user_role_hierarchy(user_id), None, None),
+            ("UserRoleMappingModel.remove_role_from_user",
+             lambda _: mappings.remove_role_from_user(user_id, "user"),
+             lambda: mappings.assign_role_to_user(user_id, email, "user"), None),
+            # BlacklistModel
+            ("BlacklistModel.add_to_blacklist",
+             lambda _: blacklist.add_to_blacklist(f"tmp-token-{uuid.uuid4().hex}", user_id, expires_at), None, None),
+            ("BlacklistModel.is_blacklisted", lambda _: blacklist.is_blacklisted(token), None, None),
+            ("BlacklistModel.get_blacklist_stats", lambda _: blacklist.get_blacklist_stats(), None, None),
+            ("BlacklistModel.cleanup_expired_tokens", lambda _: blacklist.cleanup_expired_tokens(), None, None),
+            ("BlacklistModel.get_user_blacklisted_tokens",
+             lambda _: blacklist.get_user_blacklisted_tokens(user_id), None, None),
+            ("BlacklistModel.remove_from_blacklist", lambda value: blacklist.remove_from_blacklist(value),
+             new_token, None),
+        ]
+
+        return [self._measure(name, func, setup, iterations) for name, func, setup, iterations in cases]
+
+
+def _print_results(results: Dict[str, List[Dict]]) -> None:
+    """輸出各傳輸層的延遲表"""
+    labels = list(results)
+    header = f"  {'方法':<46}" + "".join(f"{label + ' p50':>16}{label + ' p95':>16}" for label in labels)
+    print(header)
+    print("-" * len(header))
+    for row in zip(*results.values()):
+        line = f"  {row[0]['name']:<46}"
+        for result in row:
+            line += f"{result['p50_ms']:>13.3f} ms{result['p95_ms']:>13.3f} ms"
+        print(line)
+
+
+def main():
+    """主函數"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="資料模型方法的無網路延遲基準")
+    parser.add_argument("--iterations", type=int, default=100, help="每個方法的執行次數")
+    parser.add_argument("--http", action="store_true", help="同時經由本地替身伺服器（HTTP）量測")
+    args = parser.parse_args()
+
+    # 基準只量測單一路徑，不送出 hedged 請求
+    settings = ResilienceSettings(hedge_enabled=False)
+    results = {}
+
+    print("=" * 80)
+    print(f"🚀 資料模型方法延遲基準（每個方法 {args.iterations} 次，密碼雜湊方法較少）")
+    print("=" * 80)
+
+    api = APIManager(transport=InProcessTransport(), resilience=settings)
+    results["inproc"] = ModelBaselineBenchmark(api, args.iterations).run()
+
+    if args.http:
+        with StubAPIServer() as server:
+            api = APIManager(base_url=server.url, api_key="stub", resilience=settings)
+            results["http"] = ModelBaselineBenchmark(api, args.iterations).run()
+
+    _print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MongoDB Operation API 本地替身伺服器
+
+以 HTTP 提供 database.document_store.EmbeddedDocumentStore 的 /add、/search、/update、/delete 端點，
+並可加上固定延遲模擬遠端 API 的往返時間。供本地測試與基準測試使用，不連線真正的資料庫。
+不需要網路往返時可直接使用 database.transport.InProcessTransport。
+
+使用方式：
+    # 作為程式庫
+    with StubAPIServer(latency=0.02) as server:
+        api = APIManager(base_url=server.url, api_key="stub")
+
+    # 獨立執行
+    python tests/stub_api_server.py --port 8765 --latency 0.02
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 替身伺服器不需要真實的 API 與資料庫設定，未設定時以佔位值滿足 database.config 的檢查
+for _name in ("JWT_SECRET_KEY", "PUBLIC_API_BASE_URL", "PUBLIC_API_KEY", "INTERNAL_API_BASE_URL",
+              "INTERNAL_API_KEY", "DB_ACCOUNT", "DB_PASSWORD", "DB_URI", "DB_NAME"):
+    os.environ.setdefault(_name, "stub")
+
+from database.document_store import EmbeddedDocumentStore
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """替身 API 的請求處理器（端點契約由 EmbeddedDocumentStore.handle 處理）"""
+
+    protocol_version = "HTTP/1.1"
+    # 標頭與內容一次寫出，避免 Nagle / delayed ACK 造成額外延遲
+    wbufsize = 1 << 16
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body: Any, status: int = 200) -> None:
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self) -> None:
+        """模擬網路延遲後交給文件儲存處理"""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, payload = self.server.store.handle(self.command, parsed.path, query, body,
+                                                   self.headers.get("Idempotency-Key"))
+        self._reply(payload, status)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class StubAPIServer:
+    """在背景執行緒中執行的替身 API 伺服器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        """
+        初始化替身伺服器
+
+        Args:
+            host: 監聽位址
+            port: 監聽埠（0 表示自動選擇）
+            latency: 每個請求的模擬延遲秒數
+        """
+        self.httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.store = EmbeddedDocumentStore()
+        self.httpd.latency = latency
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def store(self) -> EmbeddedDocumentStore:
+        return self.httpd.store
+
+    def start(self) -> "StubAPIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-api-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main():
+    """主函數"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MongoDB Operation API 本地替身伺服器")
+    parser.add_argument("--host", default="127.0.0.1", help="監聽位址")
+    parser.add_argument("--port", type=int, default=8765, help="監聽埠")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求的模擬延遲秒數")
+    args = parser.parse_args()
+
+    server = StubAPIServer(args.host, args.port, args.latency)
+    print(f"🧪 替身 API 伺服器: {server.url}（延遲 {args.latency * 1000:.0f} ms）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+database.api_manager 的行為測試
+
+以程序內傳輸（InProcessTransport）或本地替身伺服器（tests/stub_api_server.py）取代
+MongoDB Operation API，不連線真正的資料庫。
+
+使用方式：
+    python tests/test_api_manager.py
+    python -m pytest tests/test_api_manager.py
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# 不需要真實的 API 與資料庫設定，未設定時以佔位值滿足 database.config 的檢查
+for _name in ("JWT_SECRET_KEY", "PUBLIC_API_BASE_URL", "PUBLIC_API_KEY", "INTERNAL_API_BASE_URL",
+              "INTERNAL_API_KEY", "DB_ACCOUNT", "DB_PASSWORD", "DB_URI", "DB_NAME"):
+    os.environ.setdefault(_name, "stub")
+
+from database.api_manager import APIManager
+from database.async_api_manager import AsyncAPIManager
+from database.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ResilienceSettings
+from database.request_trace import REDACTED, redact, should_trace, summarize
+from database.operations import OPERATIONS, Operation, infer_operation
+from database.transport import InProcessTransport, encode_params
+from stub_api_server import StubAPIServer
+
+# database 套件匯出同名的全域實例，模組本身以 import_module 取得
+api_manager_module = importlib.import_module("database.api_manager")
+
+COLLECTION = "jwt_blacklist"
+# 不會真的連線的位址（測試替換 _send，只檢查容錯策略）
+UNREACHABLE_URL = "http://127.0.0.1:9"
+
+
+def _settings(**overrides) -> ResilienceSettings:
+    """測試用的容錯設定（預設不重試、不 hedge）"""
+    values = {"max_retries": 0, "hedge_enabled": False}
+    values.update(overrides)
+    return ResilienceSettings(**values)
+
+
+def _result(status: int):
+    """_send 返回的 (結果, 狀態碼, 計時)"""
+    result = {"success": True, "data": []} if status == 200 else {"success": False, "status_code": status}
+    return result, status, {"connect_ms": 0.0, "ttfb_ms": 0.0, "total_ms": 0.0}
+
+
+def _recording_send(statuses, delays=None):
+    """依序返回指定狀態碼的 _send 替身（呼叫紀錄在 send.calls：送出時間與標頭）"""
+    lock = threading.Lock()
+
+    def send(operation, url, data, params, headers, timeout):
+        with lock:
+            index = len(send.calls)
+            send.calls.append((time.perf_counter(), dict(headers or {})))
+        if delays:
+            time.sleep(delays[min(index, len(delays) - 1)])
+        return _result(statuses[min(index, len(statuses) - 1)])
+
+    send.calls = []
+    return send
+
+
+def test_breaker_opens_probes_and_closes():
+    """斷路器：連續失敗達門檻後開啟，冷卻後只放行一個探測請求，探測成功後關閉"""
+    now = [0.0]
+    transitions = []
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0],
+                             on_transition=lambda old, new: transitions.append((old, new)))
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.allow() is False
+
+    now[0] = 9.9
+    assert breaker.allow() is False
+    now[0] = 10.0
+    assert breaker.allow() is True and breaker.state == HALF_OPEN
+    assert breaker.allow() is False, "half_open 只放行一個探測請求"
+
+    breaker.record_failure()
+    assert breaker.state == OPEN, "探測失敗時重新開啟"
+    now[0] = 20.0
+    assert breaker.allow() is True
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow() is True
+    assert transitions == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, OPEN),
+                           (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)], transitions
+
+
+def test_open_breaker_short_circuits_requests():
+    """斷路器開啟時 APIManager 不送出請求，直接返回快速失敗結果"""
+    api = APIManager(base_url=UNREACHABLE_URL, api_key="stub",
+                     resilience=_settings(breaker_failure_threshold=2, breaker_reset_timeout=60.0))
+    api._send = _recording_send([503])
+
+    results = [api.count_documents(COLLECTION) for _ in range(3)]
+
+    assert len(api._send.calls) == 2, api._send.calls
+    assert results[2]["message"] == "服務暫時無法使用", results[2]
+    stats = api.get_resilience_stats()
+    assert stats["breaker_state"] == OPEN and stats["short_circuited"] == 1, stats
+
+
+def test_hedge_fires_only_after_delay():
+    """讀取在 hedge 延遲內回應時只送出一個請求；超過延遲才送出第二個並採用先回應的結果"""
+    settings = _settings(hedge_enabled=True, hedge_max_delay=0.2, hedge_min_delay=0.2)
+    api = APIManager(base_url=UNREACHABLE_URL, api_key="stub", resilience=settings)
+
+    api._send = _recording_send([200], delays=[0.05])
+    fast = api.count_documents(COLLECTION)
+    assert fast["success"] and len(api._send.calls) == 1, api._send.calls
+
+    api._send = _recording_send([200], delays=[1.0, 0.0])
+    started = time.perf_counter()
+    slow = api.count_documents(COLLECTION)
+    elapsed = time.perf_counter() - started
+
+    primary_at, backup_at = (sent for sent, _ in api._send.calls)
+    assert slow["success"]
+    assert backup_at - primary_at >= 0.2, backup_at - primary_at
+    assert elapsed < 0.8, f"等待了輸掉的請求: {elapsed:.2f}s"
+    stats = api.get_resilience_stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1, stats
+
+
+def test_async_hedge_cancels_losing_request():
+    """非同步版 hedge 採用先回應的結果，並取消仍在進行的請求"""
+    cancelled = []
+
+    async def run():
+        settings = _settings(hedge_enabled=True, hedge_max_delay=0.1, hedge_min_delay=0.1)
+        api = AsyncAPIManager(base_url=UNREACHABLE_URL, api_key="stub", resilience=settings)
+        calls = []
+
+        async def send(operation, url, data, params, headers, timeout):
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+            return _result(200)
+
+        api._send = send
+        try:
+            result = await api.count_documents(COLLECTION)
+            await asyncio.sleep(0)
+        finally:
+            await api.aclose()
+        return result, calls
+
+    result, calls = asyncio.run(run())
+
+    assert result["success"]
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.1, calls
+    assert cancelled == [True]
+
+
+def test_retries_reuse_idempotency_key():
+    """非冪等寫入重試時每次都帶同一個 Idempotency-Key"""
+    api = APIManager(base_url=UNREACHABLE_URL, api_key="stub", resilience=_settings(max_retries=2, backoff_base=0.0))
+    api._send = _recording_send([503, 503, 200])
+
+    result = api.batch_create_documents(COLLECTION, [{"jti": "a"}])
+
+    keys = [headers.get("Idempotency-Key") for _, headers in api._send.calls]
+    assert result["success"], result
+    assert len(keys) == 3 and keys[0] and len(set(keys)) == 1, keys
+    assert api.get_resilience_stats()["retries"] == 2
+
+
+def test_non_idempotent_write_without_key_is_not_retried():
+    """沒有 Idempotency-Key 的非冪等寫入失敗時不重試（避免重複寫入）；冪等操作照常重試"""
+    api = APIManager(base_url=UNREACHABLE_URL, api_key="stub", resilience=_settings(max_retries=2, backoff_base=0.0))
+    api._request_headers = lambda operation: None
+
+    api._send = _recording_send([503, 200])
+    write = api.batch_create_documents(COLLECTION, [{"jti": "a"}])
+    assert write["success"] is False and len(api._send.calls) == 1, api._send.calls
+
+    api._send = _recording_send([503, 200])
+    read = api.count_documents(COLLECTION)
+    assert read["success"] and len(api._send.calls) == 2, api._send.calls
+
+
+def test_redact_masks_nested_secrets_without_mutating():
+    """敏感欄位（不分大小寫、巢狀字典與列表）被遮蔽，輸入不被修改"""
+    value = {"user": {"Password": "hunter2", "name": "n"}, "items": [{"refresh_token": "t"}], "count": 1}
+
+    masked = redact(value)
+
+    assert masked == {"user": {"Password": REDACTED, "name": "n"}, "items": [{"refresh_token": REDACTED}],
+                      "count": 1}, masked
+    assert value["user"]["Password"] == "hunter2"
+    text = summarize({"data": "x" * 100, "api_key": "k"}, max_chars=40)
+    assert len(text) < 60 and "共" in text and "'k'" not in summarize({"api_key": "k"}), text
+
+
+def test_traces_are_sampled_and_redacted():
+    """只在 DEBUG 時產生追蹤紀錄；紀錄中的密碼等欄位已遮蔽"""
+    logger = logging.getLogger("database.api_manager")
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    level, sample_rate = logger.level, api_manager_module.API_TRACE_SAMPLE_RATE
+    logger.addHandler(handler)
+    try:
+        logger.setLevel(logging.INFO)
+        assert should_trace(logger, 1.0) is False
+        logger.setLevel(logging.DEBUG)
+        assert should_trace(logger, 1.0) is True and should_trace(logger, 0.0) is False
+
+        api_manager_module.API_TRACE_SAMPLE_RATE = 1.0
+        api = APIManager(transport=InProcessTransport(), resilience=_settings())
+        api.create_user({"email": "trace@example.com", "password_hash": "secret-hash"})
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+        api_manager_module.API_TRACE_SAMPLE_RATE = sample_rate
+
+    traces = [record.getMessage() for record in records if record.levelno == logging.DEBUG]
+    assert len(traces) == 1, traces
+    assert "trace@example.com" in traces[0] and "secret-hash" not in traces[0] and REDACTED in traces[0], traces
+
+
+def test_operation_descriptors_are_consistent():
+    """每個操作只宣告一次：名稱與鍵一致、只有 POST 非冪等、路徑模板依參數格式化"""
+    for name, operation in OPERATIONS.items():
+        assert operation.name == name, operation
+        assert operation.method in ("GET", "POST", "PUT", "DELETE"), operation
+        assert operation.idempotent == (operation.method != "POST"), operation
+        assert operation.is_static == ("{" not in operation.path), operation
+
+    assert OPERATIONS["health_check"].endpoint() == "/health_check"
+    assert OPERATIONS["get_document"].endpoint(collection="users", document_id="42") == "/search/document/users/42"
+    assert OPERATIONS["collection_stats"].timeout == 30.0 and OPERATIONS["search_documents"].timeout is None
+    try:
+        Operation("bad", "GET", "/bad", "unknown", idempotent=True)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知的回應格式應拋出 ValueError")
+
+
+def test_custom_endpoints_infer_shape_and_name():
+    """未宣告的自定義端點依前綴推斷回應格式，統計名稱去除文件 ID 等變動部分"""
+    cases = {
+        ("GET", "/health_check"): "health",
+        ("POST", "/add/document/users"): "created",
+        ("GET", "/search/document/users/42"): "search",
+        ("PUT", "/update/document/users/42"): "updated",
+        ("DELETE", "/delete/document/users/42"): "deleted",
+        ("POST", "/search/documents/users"): "raw",
+    }
+    for (method, endpoint), shape in cases.items():
+        operation = infer_operation(method, endpoint)
+        assert operation.shape == shape, (method, endpoint, operation)
+        assert operation.idempotent == (method != "POST")
+    assert infer_operation("GET", "/search/document/users/42").name == "GET /search/document/users"
+
+    api = APIManager(transport=InProcessTransport(), resilience=_settings())
+    created = api._make_request("post", "/add/document/users", data={"data": {"email": "x@example.com"}})
+    assert created["success"] and "id" in created["data"], created
+    assert "POST /add/document/users" in api.get_request_stats()
+
+
+def test_operator_conditions_are_sent_as_json_params():
+    """運算子條件以 JSON 字串作為參數值，不會像 requests 一樣只剩下鍵名"""
+    encoded = encode_params({"expires_at": {"$lt": "2026-01-01T00:00:00+00:00"}, "reason": "logout",
+                             "active": True, "skip": None})
+
+    assert encoded == {
+        "expires_at": ['{"$lt":"2026-01-01T00:00:00+00:00"}'],
+        "reason": ["logout"],
+        "active": ["True"]
+    }, encoded
+
+
+def test_batch_delete_and_count_apply_range_filters():
+    """batch_delete_documents 與 count_documents 的範圍條件在 HTTP 與程序內傳輸都生效"""
+    now = datetime.now(timezone.utc)
+    expired = {"expires_at": {"$lt": now.isoformat()}}
+
+    with StubAPIServer() as server:
+        for api, store in ((APIManager(base_url=server.url, api_key="stub", resilience=_settings()), server.store),
+                           (APIManager(transport=InProcessTransport(), resilience=_settings()), None)):
+            store = store if store is not None else api.transport.store
+            for offset in (-3, -2, 1):
+                store.insert(COLLECTION, {"expires_at": (now + timedelta(hours=offset)).isoformat()})
+
+            counted = api.count_documents(COLLECTION, expired)
+            deleted = api.batch_delete_documents(COLLECTION, expired)
+
+            assert counted["success"] and counted["data"]["count"] == 2, counted
+            assert deleted["success"] and deleted["data"]["deleted_count"] == 2, deleted
+            assert len(store.find(COLLECTION, {})) == 1
+
+
+def main() -> int:
+    """依序執行本檔案的測試函數"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n通過: {len(tests) - failed} / {len(tests)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
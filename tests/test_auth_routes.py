@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+routes.auth_routes 的登出與使用者資料端點測試
+
+以 Flask 測試用戶端呼叫藍圖，黑名單以本地替身伺服器（tests/stub_api_server.py）取代 mongodb 區段的 API。
+
+使用方式：
+    python tests/test_auth_routes.py
+    python -m pytest tests/test_auth_routes.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+from datetime import timedelta
+
+import jwt
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# 不需要真實的 API 與資料庫設定，未設定時以佔位值滿足 database.config 的檢查
+for _name in ("JWT_SECRET_KEY", "PUBLIC_API_BASE_URL", "PUBLIC_API_KEY", "INTERNAL_API_BASE_URL",
+              "INTERNAL_API_KEY", "DB_ACCOUNT", "DB_PASSWORD", "DB_URI", "DB_NAME"):
+    os.environ.setdefault(_name, "stub")
+
+from flask import Flask
+
+from routes.auth_routes import auth_bp
+from stub_api_server import StubAPIServer
+from utils import jwt_utils
+from utils.jwt_config import JWTConfig
+
+SECRET_KEY = "test-secret-key-for-auth-routes"
+EMAIL = "logout@example.com"
+
+
+@contextlib.contextmanager
+def _client():
+    """建立掛載 auth 藍圖的測試用戶端，黑名單寫入替身伺服器"""
+    with StubAPIServer() as server:
+        config = JWTConfig(SECRET_KEY, os.path.join(PROJECT_ROOT, "config.yaml"))
+        config.enable_blacklist = True
+        config.mongodb_api_url = server.url
+        config.blacklist_bloom_enabled = False
+        config.blacklist_write_behind_enabled = False
+        config.user_epoch_enabled = True
+        jwt_utils.set_jwt_config(config)
+        app = Flask(__name__)
+        app.register_blueprint(auth_bp)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield app.test_client(), jwt_utils._get_blacklist_manager()
+        finally:
+            config.enable_blacklist = False
+            jwt_utils.set_jwt_config(config)
+
+
+def _claims(email: str = EMAIL) -> dict:
+    return {"sub": email, "email": email, "user_id": "user-1"}
+
+
+def _logout(client, access_token: str, refresh_token: str = None):
+    body = {"refresh_token": refresh_token} if refresh_token else None
+    return client.post("/logout", headers={"Authorization": f"Bearer {access_token}"}, json=body)
+
+
+def test_logout_accepts_expired_access_token():
+    """已過期但簽章正確的 access token 仍可登出，並撤銷同時送出的 refresh token"""
+    with _client() as (client, manager):
+        expired = jwt_utils.create_access_token(_claims(), expires_delta=timedelta(seconds=-60))
+        refresh_token = jwt_utils.create_refresh_token(_claims())
+
+        response = _logout(client, expired, refresh_token)
+
+        assert response.status_code == 200, response.get_json()
+        assert manager.is_blacklisted(refresh_token) is True
+
+
+def test_logout_rejects_unverified_refresh_token():
+    """簽章不正確或屬於其他使用者的 refresh token 不會被撤銷，access token 也維持有效"""
+    with _client() as (client, manager):
+        pair = jwt_utils.create_token_pair(_claims())
+        forged = jwt.encode({**_claims(), "type": "refresh"}, "another-secret", algorithm="HS256")
+        foreign = jwt_utils.create_refresh_token(_claims("other@example.com"))
+        tampered_access = jwt.encode({**_claims(), "type": "access"}, "another-secret", algorithm="HS256")
+
+        forged_response = _logout(client, pair["access_token"], forged)
+        foreign_response = _logout(client, pair["access_token"], foreign)
+        tampered_response = _logout(client, tampered_access)
+
+        assert forged_response.status_code == 401, forged_response.get_json()
+        assert foreign_response.status_code == 403, foreign_response.get_json()
+        assert tampered_response.status_code == 401, tampered_response.get_json()
+        assert manager.is_blacklisted(forged) is False
+        assert manager.is_blacklisted(foreign) is False
+        assert manager.is_blacklisted(pair["access_token"]) is False
+
+
+def test_profile_checks_user_epoch_once():
+    """/profile 的使用者撤銷水位只在驗證 token 時檢查一次，水位之前簽發的 token 被拒絕"""
+    with _client() as (client, manager):
+        checks = []
+        is_revoked = manager.user_epochs.is_revoked
+
+        def counting_is_revoked(payload):
+            checks.append(payload.get("sub"))
+            return is_revoked(payload)
+
+        manager.user_epochs.is_revoked = counting_is_revoked
+        token = jwt_utils.create_access_token(_claims())
+        headers = {"Authorization": f"Bearer {token}"}
+
+        client.get("/profile", headers=headers)
+        allowed_checks = len(checks)
+        manager.user_epochs.set_not_before("user-1", jwt_utils._now() + 1)
+        jwt_utils._get_verified_token_cache().clear()
+        revoked = client.get("/profile", headers=headers)
+
+        assert allowed_checks == 1, checks
+        assert revoked.status_code == 401, revoked.get_json()
+
+
+def main() -> int:
+    """依序執行本檔案的測試函數"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n通過: {len(tests) - failed} / {len(tests)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BlacklistManager 與 MongoDB Operation API 的往返測試
+
+以本地替身伺服器（tests/stub_api_server.py）取代 mongodb 區段的 API，
+直接檢查文件儲存中的資料，確認批次清理、統計等操作在伺服器端實際生效。
+
+使用方式：
+    python tests/test_blacklist_manager.py
+    python -m pytest tests/test_blacklist_manager.py
+"""
+
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_api_server import StubAPIServer
+from utils.clock import FrozenClock
+from utils.blacklist_manager import BlacklistManager
+from utils.jwt_config import JWTConfig
+
+COLLECTION = "jwt_blacklist"
+
+
+def _create_manager(server: StubAPIServer, key_mode: str = "token_hash", bloom: bool = False,
+                    clock=None) -> BlacklistManager:
+    """建立指向替身伺服器、不啟用背景執行緒的黑名單管理器（bloom=True 時由測試手動同步 Bloom filter）"""
+    config = JWTConfig(os.environ.get("JWT_SECRET_KEY") or "stub", os.path.join(PROJECT_ROOT, "config.yaml"))
+    config.mongodb_api_url = server.url
+    config.blacklist_bloom_enabled = bloom
+    config.blacklist_write_behind_enabled = False
+    config.blacklist_stats_cache_ttl = 0
+    config.user_epoch_enabled = True
+    config.blacklist_key_mode = key_mode
+    manager = BlacklistManager(config, collection_name=COLLECTION, clock=clock)
+    if bloom:
+        # 只保留啟動時的第一次同步，之後由測試呼叫 sync_bloom_filter
+        manager._bloom_stop.set()
+        manager._bloom_thread.join()
+    return manager
+
+
+def _insert(server: StubAPIServer, name: str, expires_in: timedelta) -> None:
+    """直接在文件儲存中寫入一筆黑名單文件"""
+    now = datetime.now(timezone.utc)
+    server.store.insert(COLLECTION, {
+        "token_hash": name,
+        "reason": "test",
+        "revoked_at": now.isoformat(),
+        "expires_at": (now + expires_in).isoformat()
+    })
+
+
+def _token(**claims) -> str:
+    """組出未簽章的 JWT 形式字串（黑名單只解析 payload，不驗證簽章）"""
+    def segment(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+    now = int(datetime.now(timezone.utc).timestamp())
+    return ".".join([segment({"alg": "HS256", "typ": "JWT"}),
+                     segment({"iat": now, "exp": now + 3600, **claims}), "signature"])
+
+
+def test_bulk_revocations_are_visible_to_lookups():
+    """add_many 寫入的位置必須是 is_blacklisted 查詢的位置（另一個實例也看得到）"""
+    with StubAPIServer() as server:
+        writer, reader = _create_manager(server), _create_manager(server)
+        try:
+            revoked = [_token(sub=f"user-{index}@example.com") for index in range(3)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = writer.add_many(revoked, reason="test")
+                untouched = reader.is_blacklisted(_token(sub="other@example.com"))
+                visible = [reader.is_blacklisted(token) for token in revoked]
+
+            assert all(item["success"] for item in results), results
+            assert len(server.store.find(COLLECTION, {})) == 3
+            assert visible == [True, True, True], visible
+            assert untouched is False
+        finally:
+            writer.close()
+            reader.close()
+
+
+def test_user_epoch_is_written_where_lookups_read_it():
+    """使用者撤銷水位經由同一個 API 寫入與讀取"""
+    with StubAPIServer() as server:
+        writer, reader = _create_manager(server), _create_manager(server)
+        try:
+            user_id = server.store.insert("users", {"email": "epoch@example.com"})
+            token = _token(sub="epoch@example.com", user_id=user_id)
+            with contextlib.redirect_stdout(io.StringIO()):
+                stored = writer.user_epochs.set_not_before(user_id)
+                old_session = reader.is_blacklisted(token, {**reader._get_unverified_payload(token), "iat": 100})
+                new_session = reader.is_blacklisted(token)
+
+            assert stored is True
+            assert old_session is True
+            assert new_session is False
+        finally:
+            writer.close()
+            reader.close()
+
+
+def test_dual_mode_lookup_is_one_round_trip():
+    """dual 模式以一次查詢同時比對 jti 與 token_hash（舊資料只有 token_hash 也查得到）"""
+    with StubAPIServer() as server:
+        manager = _create_manager(server, key_mode="dual")
+        manager._cache = None
+        requests_sent = []
+        send = manager.session.request
+
+        def counting_request(method, url, **kwargs):
+            requests_sent.append(method)
+            return send(method, url, **kwargs)
+
+        manager.session.request = counting_request
+        try:
+            legacy = _token(sub="legacy@example.com", jti="legacy-jti")
+            server.store.insert(COLLECTION, {"token_hash": hashlib.sha256(legacy.encode()).hexdigest()})
+            migrated = _token(sub="migrated@example.com", jti="migrated-jti")
+            server.store.insert(COLLECTION, {"jti": "migrated-jti"})
+            active = _token(sub="active@example.com", jti="active-jti")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = [manager.is_blacklisted(token) for token in (legacy, migrated, active)]
+
+            assert results == [True, True, False], results
+            assert len(requests_sent) == 3, requests_sent
+        finally:
+            manager.close()
+
+
+def test_refresh_check_is_one_round_trip_with_family_precedence():
+    """refresh token 檢查只有一次查詢（不為水位查使用者），家族撤銷優先於重複使用"""
+    from utils.blacklist_manager import FAMILY_REVOKED_REASON, REFRESH_ROTATED_REASON
+
+    with StubAPIServer() as server:
+        manager = _create_manager(server)
+        manager._cache = None
+        requests_sent = []
+        send = manager.session.request
+
+        def counting_request(method, url, **kwargs):
+            requests_sent.append(url)
+            return send(method, url, **kwargs)
+
+        manager.session.request = counting_request
+        try:
+            user_id = server.store.insert("users", {"email": "family@example.com"})
+            token = _token(sub="family@example.com", user_id=user_id, type="refresh", fam="family-1")
+            payload = manager._get_unverified_payload(token)
+            token_hash = hashlib.sha256(token.encode()).hexdigest()
+            server.store.insert(COLLECTION, {"token_hash": token_hash, "reason": REFRESH_ROTATED_REASON})
+            server.store.insert(COLLECTION, {"fam": "family-1", "reason": FAMILY_REVOKED_REASON})
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                status = manager.check_refresh_token(token, payload)
+
+            assert status == "revoked", status
+            assert len(requests_sent) == 1, requests_sent
+        finally:
+            manager.close()
+
+
+def test_negative_cache_expires_after_ttl():
+    """未撤銷的結果只快取 negative_ttl 秒，之後才看得到其他實例的撤銷；已撤銷的結果不再查詢"""
+    with StubAPIServer() as server:
+        clock = FrozenClock()
+        writer, reader = _create_manager(server), _create_manager(server, clock=clock)
+        ttl = reader._negative_ttl
+        token = _token(sub="cached@example.com")
+        requests_sent = []
+        send = reader.session.request
+
+        def counting_request(method, url, **kwargs):
+            requests_sent.append(method)
+            return send(method, url, **kwargs)
+
+        reader.session.request = counting_request
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = reader.is_blacklisted(token)
+                writer.add_to_blacklist(token, reason="test")
+                cached = reader.is_blacklisted(token)
+                lookups_while_cached = len(requests_sent)
+                clock.advance(ttl)
+                refreshed = reader.is_blacklisted(token)
+                lookups_after_expiry = len(requests_sent)
+                reader.is_blacklisted(token)
+
+            assert ttl > 0
+            assert (first, cached, refreshed) == (False, False, True)
+            assert lookups_after_expiry > lookups_while_cached
+            assert len(requests_sent) == lookups_after_expiry, "已撤銷的結果應由快取回答"
+        finally:
+            writer.close()
+            reader.close()
+
+
+def test_revoked_at_uses_injected_clock():
+    """revoked_at 取自注入的時鐘（與 Bloom filter 同步水位使用同一個時間來源）"""
+    with StubAPIServer() as server:
+        clock = FrozenClock(1_700_000_000)
+        manager = _create_manager(server, clock=clock)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                manager.add_to_blacklist(_token(sub="clock@example.com"), reason="test")
+                manager.revoke_refresh_family("family-1")
+
+            expected = datetime.fromtimestamp(clock(), timezone.utc).isoformat()
+            documents = server.store.find(COLLECTION, {})
+            assert len(documents) == 2
+            assert all(document["revoked_at"] == expected for document in documents), documents
+        finally:
+            manager.close()
+
+
+def test_cleanup_deletes_expired_documents():
+    """批次清理要在伺服器端實際刪除過期文件，並保留尚未過期的文件"""
+    with StubAPIServer() as server:
+        manager = _create_manager(server)
+        try:
+            _insert(server, "expired-recent", timedelta(minutes=-5))
+            _insert(server, "expired-hours", timedelta(hours=-3))
+            _insert(server, "expired-stale", timedelta(days=-30))
+            _insert(server, "active-soon", timedelta(minutes=5))
+            _insert(server, "active-later", timedelta(hours=6))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = manager.cleanup_expired_tokens_batched()
+
+            remaining = sorted(doc["token_hash"] for doc in server.store.find(COLLECTION, {}))
+            assert report["completed"], report
+            assert report["deleted"] == 3, report
+            assert remaining == ["active-later", "active-soon"], remaining
+        finally:
+            manager.close()
+
+
+def test_cleanup_deletes_historical_backlog_in_bounded_windows():
+    """歷史資料也分成有上下界的視窗刪除（不送出無下界的刪除），並可用 cursor 續傳"""
+    with StubAPIServer() as server:
+        manager = _create_manager(server)
+        deletes = []
+        send = manager.session.request
+
+        def recording_request(method, url, **kwargs):
+            if method == "DELETE":
+                deletes.append(json.loads(kwargs["params"]["expires_at"][0]))
+            return send(method, url, **kwargs)
+
+        manager.session.request = recording_request
+        try:
+            for days in (400, 399, 30, 2):
+                _insert(server, f"expired-{days}d", timedelta(days=-days))
+            _insert(server, "active-later", timedelta(hours=6))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = manager.cleanup_expired_tokens_batched(chunk_seconds=86400, max_chunks=2)
+                rest = manager.cleanup_expired_tokens_batched(cursor=first["cursor"], chunk_seconds=86400)
+
+            remaining = [doc["token_hash"] for doc in server.store.find(COLLECTION, {})]
+            assert not first["completed"] and first["cursor"], first
+            assert rest["completed"], rest
+            assert first["deleted"] + rest["deleted"] == 4, (first, rest)
+            assert remaining == ["active-later"], remaining
+            assert deletes and all(set(condition) == {"$gte", "$lt"} for condition in deletes), deletes
+            # 空區間以計數跳過，不逐日刪除 400 天
+            assert len(deletes) < 10, len(deletes)
+        finally:
+            manager.close()
+
+
+def test_stats_counts_active_and_expired_documents():
+    """統計要以伺服器端範圍計數區分已過期與尚未過期的文件"""
+    with StubAPIServer() as server:
+        manager = _create_manager(server)
+        requests_sent = []
+        send = manager.session.request
+
+        def recording_request(method, url, **kwargs):
+            requests_sent.append((method, url[len(server.url):]))
+            return send(method, url, **kwargs)
+
+        manager.session.request = recording_request
+        try:
+            _insert(server, "active-soon", timedelta(minutes=5))
+            _insert(server, "active-later", timedelta(hours=6))
+            _insert(server, "expired-recent", timedelta(minutes=-5))
+            _insert(server, "expired-hours", timedelta(hours=-3))
+            _insert(server, "expired-stale", timedelta(days=-30))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = manager.get_blacklist_stats(use_cache=False)
+
+            assert stats == {"total": 5, "expired": 3, "active": 2}, stats
+            # APIManager.count_documents 的契約：GET 計數端點，條件在查詢參數
+            assert requests_sent == [("GET", f"/search/documents/{COLLECTION}/count")] * 2, requests_sent
+        finally:
+            manager.close()
+
+
+def _insert_revoked(server: StubAPIServer, manager: BlacklistManager, token: str, revoked_at: datetime) -> str:
+    """以指定的 revoked_at 寫入 token 的黑名單文件，返回 Bloom filter 中的鍵"""
+    keys = manager._lookup_keys(token)
+    document = manager._build_document(token, "test", keys)
+    document["revoked_at"] = revoked_at.isoformat()
+    server.store.insert(COLLECTION, document)
+    return manager._key_id(keys[0])
+
+
+def test_bloom_sync_picks_up_late_writes():
+    """revoked_at 早於水位、但在同步之後才寫入的文件（write-behind 延遲、時鐘誤差）仍會被同步"""
+    with StubAPIServer() as server:
+        manager = _create_manager(server, bloom=True)
+        try:
+            token = _token(sub="late@example.com")
+            with contextlib.redirect_stdout(io.StringIO()):
+                manager.sync_bloom_filter()
+                revoked_at = datetime.fromisoformat(manager._bloom_watermark) - timedelta(seconds=3)
+                key_id = _insert_revoked(server, manager, token, revoked_at)
+                added = manager.sync_bloom_filter()
+                revoked = manager.is_blacklisted(token)
+
+            assert added == 1, added
+            assert manager._bloom.might_contain(key_id)
+            assert revoked is True
+        finally:
+            manager.close()
+
+
+def test_bloom_sync_splits_full_pages():
+    """單次查詢達到筆數上限時切分時間範圍，不會漏掉未返回的文件"""
+    with StubAPIServer() as server:
+        manager = _create_manager(server, bloom=True)
+        manager.BLOOM_SYNC_PAGE_SIZE = 2
+        manager._bloom_watermark = None
+        try:
+            now = datetime.now(timezone.utc)
+            key_ids = [_insert_revoked(server, manager, _token(sub=f"page-{index}@example.com"),
+                                       now - timedelta(minutes=index))
+                       for index in range(5)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                added = manager.sync_bloom_filter()
+
+            assert added == 5, added
+            assert all(manager._bloom.might_contain(key_id) for key_id in key_ids)
+        finally:
+            manager.close()
+
+
+def test_bloom_rebuild_keeps_local_revocations():
+    """重建過濾器期間本地撤銷的鍵會併入新的過濾器"""
+    with StubAPIServer() as server:
+        manager = _create_manager(server, bloom=True)
+        capacity = manager._bloom.capacity
+        for index in range(capacity + 1):
+            manager._bloom.add(f"filler-{index}")
+        token = _token(sub="during-rebuild@example.com")
+        keys = manager._lookup_keys(token)
+        send = manager.session.request
+
+        def revoking_request(method, url, **kwargs):
+            manager._mark_revoked_locally(keys, token)
+            return send(method, url, **kwargs)
+
+        manager.session.request = revoking_request
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                manager.sync_bloom_filter()
+
+            assert manager._bloom.capacity == capacity * 2
+            assert manager._bloom.might_contain(manager._key_id(keys[0]))
+            assert manager._bloom_rebuild_keys is None
+        finally:
+            manager.close()
+
+
+def main() -> int:
+    """依序執行本檔案的測試函數"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n通過: {len(tests) - failed} / {len(tests)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
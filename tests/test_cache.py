@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+utils 快取元件（LRUTTLCache、VerifiedTokenCache）的單元測試
+
+以可控制的時鐘檢查過期與淘汰行為，以執行緒檢查 single-flight，不需要 API 或資料庫。
+
+使用方式：
+    python tests/test_cache.py
+    python -m pytest tests/test_cache.py
+"""
+
+import os
+import sys
+import threading
+import time
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from utils.cache import LRUTTLCache, MISSING
+from utils.clock import FrozenClock
+from utils.verified_token_cache import VerifiedTokenCache
+
+
+def test_lru_evicts_least_recently_used():
+    """超過容量時淘汰最久未使用的項目（讀取會更新使用順序）"""
+    cache = LRUTTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2 and cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    """項目在 ttl（或 default_ttl）到期後視為未命中並移除"""
+    clock = FrozenClock(1000)
+    cache = LRUTTLCache(max_size=10, default_ttl=30, clock=clock)
+    cache.set("default", True)
+    cache.set("short", True, ttl=5)
+
+    clock.advance(4)
+    assert cache.get("short") is True
+    clock.advance(1)
+    assert cache.get("short") is MISSING
+    assert cache.get("default") is True
+    clock.advance(25)
+    assert cache.get("default", None) is None
+
+    stats = cache.stats()
+    assert stats["expirations"] == 2 and stats["size"] == 0, stats
+
+
+def test_absolute_expiry_overrides_ttl_and_falsy_values_are_hits():
+    """expires_at 優先於 ttl；False 與 None 等快取值與未命中可以區分"""
+    clock = FrozenClock(1000)
+    cache = LRUTTLCache(max_size=10, default_ttl=300, clock=clock)
+    cache.set("revoked", False, ttl=300, expires_at=1010)
+    cache.set("none", None)
+
+    assert cache.get("revoked") is False
+    assert cache.get("none") is None
+    clock.set(1010)
+    assert cache.get("revoked") is MISSING
+    assert cache.stats()["hits"] == 2
+
+
+def test_invalid_size_is_rejected():
+    """容量必須為正整數"""
+    try:
+        LRUTTLCache(max_size=0)
+    except ValueError:
+        return
+    raise AssertionError("max_size=0 應拋出 ValueError")
+
+
+def test_concurrent_verifications_are_coalesced():
+    """同一個 token 的並行請求只驗證一次，其餘請求取得 leader 的結果"""
+    cache = VerifiedTokenCache(max_size=10, max_ttl=None)
+    waiters = 7
+    calls = []
+
+    def verifier(token):
+        calls.append(token)
+        # 等所有並行請求都進入等待，確保它們由同一次驗證回答
+        deadline = time.monotonic() + 5
+        while cache.coalesced < waiters and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return {"sub": "x", "exp": int(time.time()) + 60}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_verify("token", verifier)))
+               for _ in range(waiters + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["token"], calls
+    assert len(results) == waiters + 1 and all(result["sub"] == "x" for result in results), results
+    stats = cache.stats()
+    assert stats["verifications"] == 1 and stats["coalesced"] == waiters and stats["inflight"] == 0, stats
+
+
+def test_failed_verification_is_not_cached():
+    """驗證失敗時不寫入快取，下一個請求重新驗證"""
+    cache = VerifiedTokenCache(max_size=10)
+    attempts = []
+
+    def verifier(token):
+        attempts.append(token)
+        if len(attempts) == 1:
+            raise ValueError("invalid")
+        return {"sub": "x", "exp": int(time.time()) + 60}
+
+    try:
+        cache.get_or_verify("token", verifier)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("驗證失敗應拋出 verifier 的異常")
+
+    assert cache.get_or_verify("token", verifier)["sub"] == "x"
+    assert len(attempts) == 2 and cache.stats()["inflight"] == 0
+
+
+def test_verified_entries_expire_at_exp_or_max_ttl():
+    """項目在 exp 與 max_ttl 中較早者到期；invalidate 立即移除"""
+    clock = FrozenClock(1000)
+    cache = VerifiedTokenCache(max_size=10, max_ttl=30, clock=clock)
+    cache.put("long", {"exp": 2000})
+    cache.put("short", {"exp": 1010})
+    cache.put("revoked", {"exp": 2000})
+
+    assert cache.invalidate("revoked") is True and cache.get("revoked") is None
+    clock.set(1010)
+    assert cache.get("short") is None and cache.get("long") == {"exp": 2000}
+    clock.set(1030)
+    assert cache.get("long") is None
+
+
+def main() -> int:
+    """依序執行本檔案的測試函數"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n通過: {len(tests) - failed} / {len(tests)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
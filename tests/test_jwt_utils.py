@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+utils.jwt_utils 的簽發與驗證回歸測試
+
+使用本地金鑰；除 refresh token 輪替測試以本地替身伺服器啟用黑名單外，黑名單停用。
+
+使用方式：
+    python tests/test_jwt_utils.py
+    python -m pytest tests/test_jwt_utils.py
+"""
+
+import os
+import re
+import signal
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from utils import jwt_utils
+from utils.claims import compact_claims, expand_claims
+from utils.jti_generator import JTIGenerator
+from utils.jwt_config import JWTConfig
+from utils.revocation_queue import RevocationQueue
+
+SECRET_KEY = "test-secret-key-for-jwt-utils-regressions"
+
+
+def _use_config(**overrides) -> JWTConfig:
+    """以 config.yaml 為基礎設定 jwt_utils 的配置（黑名單停用）"""
+    config = JWTConfig(SECRET_KEY, os.path.join(PROJECT_ROOT, "config.yaml"))
+    config.enable_blacklist = False
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    jwt_utils.set_jwt_config(config)
+    return config
+
+
+def _decode(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+
+
+def test_access_token_accepts_datetime_nbf():
+    """呼叫端以 datetime 提供 nbf 時，與 jwt.encode 相同轉為整數時間戳"""
+    _use_config()
+    not_before = datetime.now(timezone.utc) - timedelta(seconds=5)
+
+    payload = _decode(jwt_utils.create_access_token({"sub": "x", "nbf": not_before}))
+    naive = _decode(jwt_utils.create_access_token({"sub": "x", "nbf": not_before.replace(tzinfo=None)}))
+
+    assert payload["nbf"] == int(not_before.timestamp()), payload
+    assert naive["nbf"] == payload["nbf"], naive
+    assert payload["sub"] == "x" and payload["type"] == "access"
+
+
+def test_batch_and_pair_minting_accept_datetime_nbf():
+    """共用 claims 的批次與成對簽發同樣接受 datetime 的 nbf"""
+    _use_config()
+    not_before = datetime.now(timezone.utc) - timedelta(seconds=5)
+    claims = {"sub": "x", "nbf": not_before}
+
+    tokens = jwt_utils.create_access_tokens([claims, claims])
+    pair = jwt_utils.create_token_pair(claims)
+
+    for token in tokens + [pair["access_token"]]:
+        assert _decode(token)["nbf"] == int(not_before.timestamp())
+    assert isinstance(claims["nbf"], datetime), "呼叫端的資料不應被修改"
+
+
+def _single_secret_decorator(f):
+    """模擬只認得目前密鑰的中介層裝飾器（此處一律拒絕，用來確認驗證改由 verifier 處理）"""
+    def decorated(*args, **kwargs):
+        return {"message": "Token is missing or invalid"}, 401
+    return decorated
+
+
+def test_cached_auth_accepts_tokens_signed_with_rotated_key():
+    """金鑰輪替後，以舊 kid 簽發的 token 仍可通過 cached_auth 保護的端點"""
+    from flask import Flask
+
+    _use_config(kid="2026-04")
+    old_token = jwt_utils.create_access_token({"sub": "rotated@example.com"})
+
+    rotated_secret = "rotated-secret-key-for-jwt-utils-regressions"
+    _use_config(secret_key=rotated_secret, kid="2026-10",
+                verification_keys=[{"kid": "2026-04", "algorithm": "HS256", "key": SECRET_KEY}])
+    new_token = jwt_utils.create_access_token({"sub": "current@example.com"})
+
+    app = Flask(__name__)
+
+    @app.route("/protected")
+    @jwt_utils.cached_auth(_single_secret_decorator, verifier=jwt_utils.verify_access_token_locally)
+    def protected(current_user):
+        return {"sub": current_user["sub"]}
+
+    client = app.test_client()
+    for token, sub in ((old_token, "rotated@example.com"), (new_token, "current@example.com")):
+        for _ in range(2):  # 第二次命中已驗證 token 快取
+            response = client.get("/protected", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200, response.get_json()
+            assert response.get_json() == {"sub": sub}
+
+    forged = old_token[:-4] + ("AAAA" if not old_token.endswith("AAAA") else "BBBB")
+    assert client.get("/protected", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    assert client.get("/protected").status_code == 401
+
+
+def test_tokens_without_kid_survive_first_rotation():
+    """啟用 kid 前簽發（header 沒有 kid）的 token，在第一次輪替後仍以舊密鑰驗證"""
+    _use_config(kid=None, verification_keys=[])
+    legacy_token = jwt_utils.create_access_token({"sub": "legacy@example.com"})
+    assert "kid" not in jwt.get_unverified_header(legacy_token)
+
+    rotated_secret = "rotated-secret-key-for-jwt-utils-regressions"
+    legacy_keys = [{"kid": "hs-legacy", "algorithm": "HS256", "key": SECRET_KEY}]
+    for legacy_kid in (None, "hs-legacy"):
+        _use_config(secret_key=rotated_secret, kid="2026-10", verification_keys=legacy_keys, legacy_kid=legacy_kid)
+        assert jwt_utils.verify_with_keyring(legacy_token, "access")["sub"] == "legacy@example.com"
+
+        forged = jwt.encode({"sub": "forged@example.com", "type": "access"}, "unknown-secret", algorithm="HS256")
+        try:
+            jwt_utils.verify_with_keyring(forged, "access")
+            raise AssertionError("未知密鑰簽發的 token 不應通過驗證")
+        except jwt.InvalidSignatureError:
+            pass
+
+    # 指定 legacy_kid 時，未帶 kid 的 token 不再以目前密鑰驗證
+    kidless_current = jwt.encode({"sub": "x", "type": "access"}, rotated_secret, algorithm="HS256")
+    try:
+        jwt_utils.verify_with_keyring(kidless_current, "access")
+        raise AssertionError("legacy_kid 已指定，未帶 kid 的 token 只能以舊密鑰驗證")
+    except jwt.InvalidSignatureError:
+        pass
+
+
+def test_asymmetric_tokens_pass_route_verification():
+    """ES256 簽發的 token 在本地驗證路徑（cached_auth、verify_token_cached、到期查詢）都能驗證"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from flask import Flask
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode()
+    _use_config(algorithm="ES256", private_key=pem, public_key=None)
+    token = jwt_utils.create_access_token({"sub": "es256@example.com"})
+    assert jwt.get_unverified_header(token)["alg"] == "ES256"
+
+    app = Flask(__name__)
+
+    @app.route("/protected")
+    @jwt_utils.cached_auth(_single_secret_decorator, verifier=jwt_utils.verify_access_token_locally)
+    def protected(current_user):
+        return {"sub": current_user["sub"]}
+
+    response = app.test_client().get("/protected", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.get_json()
+    assert jwt_utils.verify_token_cached(token)["sub"] == "es256@example.com"
+    assert jwt_utils.get_token_expiration(token) is not None
+    assert jwt_utils.is_token_expired(token) is False
+
+
+def test_refresh_access_token_consumes_token_when_rotation_enabled():
+    """啟用輪替時 refresh_access_token 與 exchange_refresh_token 都會消耗 refresh token"""
+    import contextlib
+    import io
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from stub_api_server import StubAPIServer
+
+    with StubAPIServer() as server:
+        config = _use_config(enable_blacklist=True, mongodb_api_url=server.url, refresh_rotation_enabled=True,
+                             blacklist_bloom_enabled=False, blacklist_write_behind_enabled=False)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = jwt_utils.create_token_pair({"sub": "rotate@example.com"})
+                access_token = jwt_utils.refresh_access_token(first["refresh_token"])
+                replayed = jwt_utils.refresh_access_token(first["refresh_token"])
+
+                second = jwt_utils.create_token_pair({"sub": "rotate@example.com"})
+                exchanged = jwt_utils.exchange_refresh_token(second["refresh_token"])
+                exchanged_again = jwt_utils.exchange_refresh_token(exchanged["refresh_token"])
+                replayed_pair = jwt_utils.exchange_refresh_token(second["refresh_token"])
+
+            assert _decode(access_token)["sub"] == "rotate@example.com"
+            assert replayed is None, "已消耗的 refresh token 不可再換發"
+            assert set(exchanged) == {"access_token", "refresh_token"}, exchanged
+            assert exchanged_again is not None
+            assert replayed_pair is None
+        finally:
+            manager = jwt_utils._get_blacklist_manager()
+            if manager:
+                manager.close()
+            config.enable_blacklist = False
+            jwt_utils.set_jwt_config(config)
+
+
+def _wait_child(pid: int, timeout: float):
+    """等待子程序結束並返回結束碼（逾時時強制結束並返回 None）"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        finished, status = os.waitpid(pid, os.WNOHANG)
+        if finished:
+            return os.waitstatus_to_exitcode(status)
+        time.sleep(0.01)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    return None
+
+
+def test_forked_mint_worker_does_not_flush_parent_revocations():
+    """fork 出的簽發子程序不寫出從父程序複製來的 write-behind 佇列（撤銷不會被寫入兩次）"""
+    if not hasattr(os, "fork"):
+        return
+    config = _use_config()
+    written = []
+    release = threading.Event()
+
+    def writer(documents):
+        written.extend(documents)
+        release.wait(5)
+        return True
+
+    revocations = RevocationQueue(writer, flush_interval=0.01)
+    revocations.enqueue({"jti": "in-flight"})
+    while not written:
+        time.sleep(0.01)
+    # fork 時第一筆正在寫入（寫入鎖被持有），第二筆仍在佇列中
+    revocations.enqueue({"jti": "pending"})
+    jwt_utils._blacklist_manager = types.SimpleNamespace(close=revocations.close)
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            jwt_utils._init_mint_worker(config)
+            # 父程序以 atexit 註冊的 close 也會在子程序結束時執行
+            revocations.close()
+            code = 0 if written == [{"jti": "in-flight"}] and jwt_utils._blacklist_manager is None else 2
+        finally:
+            os._exit(code)
+
+    try:
+        exit_code = _wait_child(pid, 10)
+    finally:
+        release.set()
+        jwt_utils._blacklist_manager = None
+        revocations.close()
+
+    assert exit_code == 0, f"子程序結束碼: {exit_code}"
+    assert [document["jti"] for document in written] == ["in-flight", "pending"], written
+
+
+def test_compact_jti_generator_spans_refills():
+    """compact jti 為 24 字元 base64url，跨多次補充仍不重複；uuid 模式維持 36 字元"""
+    generate = JTIGenerator("compact", batch_size=4)
+    jtis = [generate() for _ in range(10)]
+
+    assert all(re.fullmatch(r"[A-Za-z0-9_-]{24}", jti) for jti in jtis), jtis
+    assert len(set(jtis)) == len(jtis)
+    assert len(JTIGenerator("uuid")()) == 36
+    try:
+        JTIGenerator("short")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知的 jti 模式應拋出 ValueError")
+
+
+def test_compact_jti_mode_mints_short_ids():
+    """jti_mode=compact 時單筆、批次與成對簽發都使用 24 字元的 jti"""
+    _use_config(jti_mode="compact")
+    try:
+        tokens = jwt_utils.create_access_tokens([{"sub": "x"}] * 3)
+        pair = jwt_utils.create_token_pair({"sub": "x"})
+        tokens += [jwt_utils.create_access_token({"sub": "x"}), pair["access_token"], pair["refresh_token"]]
+
+        jtis = [_decode(token)["jti"] for token in tokens]
+        assert all(len(jti) == 24 for jti in jtis), jtis
+        assert len(set(jtis)) == len(jtis)
+    finally:
+        _use_config()
+
+
+def test_compact_claims_round_trip():
+    """compact profile 以 uid 取代 user_id 並省略與 sub 相同的 email，expand_claims 可還原"""
+    data = {"sub": "c@example.com", "email": "c@example.com", "user_id": "u-1", "roles": ["user"]}
+
+    compacted = compact_claims(data)
+
+    assert compacted == {"sub": "c@example.com", "uid": "u-1", "roles": ["user"]}, compacted
+    assert expand_claims(compacted) == data
+    assert "email" in data, "呼叫端的資料不應被修改"
+    # 與 sub 不同的 email、沒有 user_id 的資料都保留 email
+    assert compact_claims({**data, "email": "other@example.com"})["email"] == "other@example.com"
+    assert compact_claims({"sub": "c@example.com", "email": "c@example.com"})["email"] == "c@example.com"
+    standard = {"sub": "c@example.com", "email": "c@example.com"}
+    assert expand_claims(standard) is standard
+
+
+def test_compact_profile_tokens_expand_after_verification():
+    """claim_profile=compact 簽發的 token 較短，驗證後以 expand_claims 取得標準欄位"""
+    data = {"sub": "c@example.com", "email": "c@example.com", "user_id": "u-1", "roles": ["user"]}
+    _use_config(claim_profile="standard")
+    standard = jwt_utils.create_access_token(data)
+    _use_config(claim_profile="compact")
+    try:
+        token = jwt_utils.create_access_token(data)
+        payload = _decode(token)
+        verified = expand_claims(jwt_utils.verify_access_token_locally(token))
+
+        assert len(token) < len(standard)
+        assert "email" not in payload and "user_id" not in payload and payload["uid"] == "u-1", payload
+        assert {key: verified[key] for key in data} == data, verified
+        assert verified["type"] == "access"
+    finally:
+        _use_config()
+
+
+def main() -> int:
+    """依序執行本檔案的測試函數"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n通過: {len(tests) - failed} / {len(tests)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
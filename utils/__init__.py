@@ -6,11 +6,20 @@ Contains utility functions for JWT token management and configuration.
 
 from .jwt_utils import (
     create_access_token,
+    create_access_tokens,
+    iter_access_tokens,
     create_refresh_token,
     create_token_pair,
+    create_token_pairs,
     refresh_access_token,
+    rotate_refresh_token,
+    exchange_refresh_token,
     revoke_token,
     revoke_token_pair,
+    revoke_tokens,
+    revoke_user_tokens,
+    record_user_revocation_epoch,
+    is_token_revoked_for_user,
     get_token_expiration,
     is_token_expired,
     is_token_blacklisted,
@@ -18,20 +27,39 @@ from .jwt_utils import (
     cleanup_expired_blacklist_tokens,
     get_blacklist_statistics,
     initialize_blacklist_system,
+    shutdown_blacklist_system,
+    get_public_key_set,
+    get_jwks_document,
+    verify_with_keyring,
+    verify_access_token_locally,
+    verify_token_cached,
+    cached_auth,
+    get_verified_token_cache_stats,
+    set_clock,
     set_jwt_config
 )
 
 from .jwt_config import JWTConfig, create_jwt_config
 from .blacklist_manager import BlacklistManager
+from .claims import compact_claims, expand_claims
 
 __all__ = [
     # JWT Token functions
     "create_access_token",
+    "create_access_tokens",
+    "iter_access_tokens",
     "create_refresh_token", 
     "create_token_pair",
+    "create_token_pairs",
     "refresh_access_token",
+    "rotate_refresh_token",
+    "exchange_refresh_token",
     "revoke_token",
     "revoke_token_pair",
+    "revoke_tokens",
+    "revoke_user_tokens",
+    "record_user_revocation_epoch",
+    "is_token_revoked_for_user",
     "get_token_expiration",
     "is_token_expired",
     "is_token_blacklisted",
@@ -39,6 +67,15 @@ __all__ = [
     "cleanup_expired_blacklist_tokens",
     "get_blacklist_statistics",
     "initialize_blacklist_system",
+    "shutdown_blacklist_system",
+    "get_public_key_set",
+    "get_jwks_document",
+    "verify_with_keyring",
+    "verify_access_token_locally",
+    "verify_token_cached",
+    "cached_auth",
+    "get_verified_token_cache_stats",
+    "set_clock",
     "set_jwt_config",
     
     # Configuration
@@ -46,5 +83,9 @@ __all__ = [
     "create_jwt_config",
     
     # Blacklist management
-    "BlacklistManager"
+    "BlacklistManager",
+    
+    # Claim profiles
+    "compact_claims",
+    "expand_claims"
 ] 
\ No newline at end of file
@@ -5,24 +5,41 @@ JWT Blacklist Management for Main Project
 Moved from JWT_Midware package to main project.
 """
 
-import requests
+import atexit
+import base64
 import hashlib
-from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+import json
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple, Union, Callable
 from .jwt_config import JWTConfig
+from .cache import LRUTTLCache, MISSING
+from .bloom_filter import BloomFilter
+from .http_session import create_pooled_session
+from .revocation_queue import RevocationQueue
+from .revocation_epoch import UserRevocationEpochs, EPOCH_FIELD, USERS_COLLECTION
+from .clock import SystemClock
+
+# refresh token 輪替使用的撤銷原因
+REFRESH_ROTATED_REASON = "refresh_rotated"
+FAMILY_REVOKED_REASON = "refresh_family_revoked"
 
 class BlacklistManager:
     """JWT 黑名單管理器"""
     
     def __init__(self, 
                  jwt_config: JWTConfig,
-                 collection_name: Optional[str] = None):
+                 collection_name: Optional[str] = None,
+                 clock: Optional[Callable[[], int]] = None):
         """
         初始化黑名單管理器
         
         Args:
             jwt_config: JWT 配置實例（包含 MongoDB API URL 和黑名單配置）
             collection_name: 黑名單集合名稱（可選，預設使用配置中的值）
+            clock: 取得目前時間（整數 epoch 秒）的函數（可選，預設讀取系統時間）
         """
         if not jwt_config:
             raise ValueError("JWT 配置實例是必要的")
@@ -30,6 +47,330 @@ class BlacklistManager:
         self.jwt_config = jwt_config
         self.mongodb_api_url = jwt_config.mongodb_api_url.rstrip('/')
         self.collection_name = collection_name or jwt_config.blacklist_collection
+        self._clock = clock or SystemClock()
+        
+        # 黑名單鍵模式：token_hash、jti 或 dual（遷移期間）
+        self.key_mode = jwt_config.blacklist_key_mode
+        
+        # 共用的連線池 session，避免每次操作重新握手
+        # 所有黑名單讀寫（含批次寫入、清理、統計與使用者撤銷水位）都經由此 session 與 mongodb_api_url，
+        # 撤銷寫入的位置一定是逐筆查詢會讀取的位置；批次刪除與計數以 APIManager 的操作契約送出（見 _get_api）
+        self.session = create_pooled_session(
+            pool_size=jwt_config.http_pool_size,
+            keep_alive=jwt_config.http_keep_alive,
+            retries=jwt_config.http_retries,
+            backoff_factor=jwt_config.http_backoff_factor
+        )
+        connect_timeout = jwt_config.http_connect_timeout
+        self._read_timeout = (connect_timeout, jwt_config.http_read_timeout)
+        self._write_timeout = (connect_timeout, jwt_config.http_write_timeout)
+        self._bulk_timeout = (connect_timeout, jwt_config.http_bulk_timeout)
+        self._api = None
+        
+        # 查詢結果快取：key 為 token 雜湊，value 為是否已撤銷
+        self._cache = None
+        if jwt_config.blacklist_cache_enabled:
+            self._cache = LRUTTLCache(max_size=jwt_config.blacklist_cache_max_size, clock=self._clock)
+        self._negative_ttl = jwt_config.blacklist_cache_negative_ttl
+        
+        # 統計結果的短暫快取，讓管理儀表板可以頻繁輪詢
+        self._stats_cache = None
+        if jwt_config.blacklist_stats_cache_ttl > 0:
+            self._stats_cache = LRUTTLCache(max_size=1, default_ttl=jwt_config.blacklist_stats_cache_ttl)
+        
+        # Bloom filter 前置過濾：完成第一次同步前不啟用判定
+        self._bloom = None
+        self._bloom_ready = False
+        self._bloom_watermark = None
+        self._bloom_lock = threading.Lock()
+        # 重建期間本地新增的鍵（重建完成時併入新的過濾器），未重建時為 None
+        self._bloom_local_lock = threading.Lock()
+        self._bloom_rebuild_keys = None
+        self._bloom_stop = threading.Event()
+        self._bloom_thread = None
+        self.bloom_local_negatives = 0
+        if jwt_config.blacklist_bloom_enabled:
+            self._bloom = BloomFilter(jwt_config.blacklist_bloom_capacity,
+                                      jwt_config.blacklist_bloom_false_positive_rate)
+            self._start_bloom_sync()
+        
+        # 使用者層級撤銷水位（users.tokens_not_before）
+        self.user_epochs = None
+        if jwt_config.user_epoch_enabled:
+            self.user_epochs = UserRevocationEpochs(
+                loader=self._load_user_epoch,
+                writer=self._store_user_epoch,
+                cache_ttl=jwt_config.user_epoch_cache_ttl,
+                clock=self._clock
+            )
+        
+        # write-behind 撤銷佇列：以批次寫入取代每次撤銷一次同步 POST
+        self._revocation_queue = None
+        if jwt_config.blacklist_write_behind_enabled:
+            self._revocation_queue = RevocationQueue(
+                writer=self._write_documents,
+                max_queue_size=jwt_config.blacklist_write_behind_max_queue_size,
+                batch_size=jwt_config.blacklist_write_behind_batch_size,
+                flush_interval=jwt_config.blacklist_write_behind_flush_interval
+            )
+        
+        # refresh token 輪替：已消耗的 refresh token（鍵 -> 家族）與已撤銷的家族
+        # 消耗紀錄一律走獨立的 write-behind 佇列，換發路徑最多只有一次查詢往返
+        self._consumed_refresh = None
+        self._revoked_families = None
+        self._refresh_queue = None
+        self._refresh_lock = threading.Lock()
+        if jwt_config.refresh_rotation_enabled:
+            cache_size = jwt_config.refresh_rotation_cache_size
+            self._consumed_refresh = LRUTTLCache(max_size=cache_size, clock=self._clock)
+            self._revoked_families = LRUTTLCache(max_size=cache_size, clock=self._clock)
+            self._refresh_queue = RevocationQueue(
+                writer=self._write_documents,
+                max_queue_size=jwt_config.blacklist_write_behind_max_queue_size,
+                batch_size=jwt_config.blacklist_write_behind_batch_size,
+                flush_interval=jwt_config.blacklist_write_behind_flush_interval
+            )
+        
+        if self._revocation_queue is not None or self._refresh_queue is not None:
+            atexit.register(self.close)
+    
+    def _start_bloom_sync(self) -> None:
+        """啟動背景執行緒，定期依 revoked_at 水位增量同步 Bloom filter"""
+        def _loop():
+            while True:
+                self.sync_bloom_filter()
+                if self._bloom_stop.wait(self.jwt_config.blacklist_bloom_sync_interval):
+                    break
+        
+        self._bloom_thread = threading.Thread(target=_loop, name="blacklist-bloom-sync", daemon=True)
+        self._bloom_thread.start()
+    
+    # 增量同步每次查詢最多取回的文件數；取回數量達到上限時將時間範圍對半切開再查詢
+    BLOOM_SYNC_PAGE_SIZE = 1000
+    
+    def _bloom_overlap(self) -> timedelta:
+        """
+        增量同步時重新掃描的水位重疊區間
+        
+        revoked_at 在撤銷當下產生，文件可能在 write-behind 等待、重試退避與寫入逾時之後才寫入，
+        其他實例的時鐘也可能有誤差；重疊區間涵蓋這些延遲，晚到的文件不會被水位跳過。
+        """
+        queues = [q for q in (self._revocation_queue, self._refresh_queue) if q is not None]
+        write_delay = max((q.max_write_delay for q in queues), default=0.0)
+        return timedelta(seconds=write_delay + self.jwt_config.http_bulk_timeout
+                         + self.jwt_config.blacklist_bloom_max_clock_skew)
+    
+    def _fetch_revoked_between(self, lower: datetime, upper: datetime) -> Optional[list]:
+        """
+        查詢 revoked_at 介於 [lower, upper) 的黑名單文件
+        
+        以 GET /search/documents/{collection} 的 limit 參數限制單次取回數量；
+        取回數量達到上限時（API 可能只返回部分結果）將範圍對半切開分別查詢，
+        不依賴 API 的排序。
+        
+        Args:
+            lower: revoked_at 下界
+            upper: revoked_at 上界
+            
+        Returns:
+            文件列表，查詢失敗時返回 None
+        """
+        from database.transport import encode_params
+        
+        page_size = self.BLOOM_SYNC_PAGE_SIZE
+        response = self.session.get(
+            f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
+            params=encode_params({
+                "revoked_at": {"$gte": lower.isoformat(), "$lt": upper.isoformat()},
+                "limit": page_size
+            }),
+            timeout=self._bulk_timeout
+        )
+        if response.status_code != 200:
+            print(f"同步 Bloom filter 失敗: {response.status_code} - {response.text}")
+            return None
+        documents = response.json().get("data", [])
+        
+        middle = lower + (upper - lower) / 2
+        if len(documents) < page_size or middle <= lower:
+            return documents
+        first = self._fetch_revoked_between(lower, middle)
+        second = self._fetch_revoked_between(middle, upper) if first is not None else None
+        return first + second if second is not None else None
+    
+    def _add_document_keys(self, bloom: BloomFilter, doc: Dict[str, Any]) -> int:
+        """將黑名單文件的鍵加入 Bloom filter（已存在的鍵不重複計數），返回新加入的數量"""
+        keys = [(field, str(doc[field])) for field in ("jti", "token_hash") if doc.get(field)]
+        if doc.get("fam") and doc.get("reason") == FAMILY_REVOKED_REASON:
+            keys.append(("fam", str(doc["fam"])))
+        added = 0
+        for key in keys:
+            key_id = self._key_id(key)
+            if not bloom.might_contain(key_id):
+                bloom.add(key_id)
+                added += 1
+        return added
+    
+    def _bloom_add_local(self, key_id: str) -> None:
+        """將本程序撤銷的鍵加入 Bloom filter（重建期間同時記錄，重建完成時併入新的過濾器）"""
+        with self._bloom_local_lock:
+            self._bloom.add(key_id)
+            if self._bloom_rebuild_keys is not None:
+                self._bloom_rebuild_keys.append(key_id)
+    
+    def sync_bloom_filter(self) -> int:
+        """
+        從黑名單集合增量同步 Bloom filter
+        
+        查詢 revoked_at 介於「水位 - 重疊區間」與現在之間的文件，完整取回後水位才前進到
+        本次同步開始的時間。超過設計容量時以兩倍容量從頭重建，重建期間本地撤銷的鍵
+        會併入新的過濾器。
+        
+        Returns:
+            本次加入的項目數量
+        """
+        if self._bloom is None:
+            return 0
+        
+        added = 0
+        try:
+            with self._bloom_lock:
+                bloom = self._bloom
+                watermark = self._bloom_watermark
+                rebuild = bloom.is_saturated()
+                if rebuild:
+                    bloom = BloomFilter(bloom.capacity * 2, bloom.false_positive_rate)
+                    watermark = None
+                    with self._bloom_local_lock:
+                        self._bloom_rebuild_keys = []
+                
+                try:
+                    upper = datetime.fromtimestamp(self._clock(), timezone.utc) + timedelta(seconds=1)
+                    if watermark is None:
+                        lower = datetime.fromtimestamp(0, timezone.utc)
+                    else:
+                        lower = datetime.fromisoformat(watermark) - self._bloom_overlap()
+                    
+                    documents = self._fetch_revoked_between(lower, upper)
+                    if documents is None:
+                        return added
+                    for doc in documents:
+                        added += self._add_document_keys(bloom, doc)
+                    
+                    if rebuild:
+                        with self._bloom_local_lock:
+                            for key_id in self._bloom_rebuild_keys:
+                                bloom.add(key_id)
+                            self._bloom = bloom
+                    self._bloom_watermark = upper.isoformat()
+                    self._bloom_ready = True
+                finally:
+                    if rebuild:
+                        with self._bloom_local_lock:
+                            self._bloom_rebuild_keys = None
+        except Exception as e:
+            print(f"同步 Bloom filter 時發生錯誤: {str(e)}")
+        return added
+    
+    def get_bloom_filter_stats(self) -> Dict[str, Any]:
+        """
+        取得 Bloom filter 統計資訊
+        
+        Returns:
+            Bloom filter 統計資訊，未啟用時返回 {"enabled": False}
+        """
+        if self._bloom is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "ready": self._bloom_ready,
+            "watermark": self._bloom_watermark,
+            "local_negatives": self.bloom_local_negatives,
+            **self._bloom.stats()
+        }
+    
+    def close(self) -> None:
+        """寫出待處理的撤銷紀錄、停止背景執行緒並關閉連線池"""
+        if self._revocation_queue is not None:
+            self._revocation_queue.close()
+        if self._refresh_queue is not None:
+            self._refresh_queue.close()
+        self._bloom_stop.set()
+        self.session.close()
+    
+    def _get_api(self):
+        """
+        取得指向 mongodb_api_url 的 APIManager（延遲建立）
+        
+        傳輸層沿用黑名單的連線池 session，批次刪除與計數送往逐筆查詢讀取的同一個 API。
+        session 已在連線層重試，這裡不再重試也不送出 hedged 請求。
+        
+        Returns:
+            database.api_manager.APIManager 實例
+        """
+        if self._api is None:
+            from database.api_manager import APIManager
+            from database.resilience import ResilienceSettings
+            from database.transport import HTTPTransport
+            
+            self._api = APIManager(
+                base_url=self.mongodb_api_url,
+                resilience=ResilienceSettings(read_timeout=self.jwt_config.http_bulk_timeout,
+                                              write_timeout=self.jwt_config.http_bulk_timeout,
+                                              max_retries=0,
+                                              hedge_enabled=False),
+                transport=HTTPTransport(session=self.session)
+            )
+        return self._api
+    
+    def _load_user_epoch(self, user_id: str) -> Optional[int]:
+        """
+        讀取使用者文件中的撤銷水位
+        
+        Args:
+            user_id: 使用者 ID
+            
+        Returns:
+            水位（epoch 秒，未設定或使用者不存在時為 0），查詢失敗時返回 None
+        """
+        response = self.session.get(
+            f"{self.mongodb_api_url}/search/document/{USERS_COLLECTION}/{user_id}",
+            timeout=self._read_timeout
+        )
+        if response.status_code == 404:
+            return 0
+        if response.status_code != 200:
+            print(f"查詢使用者撤銷水位失敗: {response.status_code} - {response.text}")
+            return None
+        
+        user = response.json().get("data") or {}
+        if isinstance(user, list):
+            user = user[0] if user else {}
+        try:
+            return int(user.get(EPOCH_FIELD) or 0)
+        except (TypeError, ValueError):
+            return 0
+    
+    def _store_user_epoch(self, user_id: str, not_before: int) -> bool:
+        """
+        將撤銷水位寫入使用者文件
+        
+        Args:
+            user_id: 使用者 ID
+            not_before: 水位（epoch 秒）
+            
+        Returns:
+            是否寫入成功
+        """
+        response = self.session.put(
+            f"{self.mongodb_api_url}/update/document/{USERS_COLLECTION}/{user_id}",
+            json={"update": {EPOCH_FIELD: not_before}},
+            timeout=self._write_timeout
+        )
+        if response.status_code != 200:
+            print(f"寫入使用者撤銷水位失敗: {response.status_code} - {response.text}")
+            return False
+        return True
     
     def _hash_token(self, token: str) -> str:
         """
@@ -43,63 +384,248 @@ class BlacklistManager:
         """
         return hashlib.sha256(token.encode()).hexdigest()
     
-    def _get_token_expiration(self, token: str) -> Optional[datetime]:
+    def _get_token_expiration(self,
+                              token: str,
+                              payload: Optional[Dict[str, Any]] = None,
+                              exp: Optional[int] = None) -> Optional[datetime]:
         """
         取得 token 的過期時間
         
+        呼叫端通常剛驗證過同一個 token，因此優先使用傳入的 exp 或 payload；
+        都未提供時以不驗簽的方式解析 payload，不再重複計算 HMAC。
+        撤銷一個偽造的 token 只會讓該 token 本身失效，不影響安全性。
+        
         Args:
             token: JWT token
+            payload: 已解碼的 payload（可選）
+            exp: 已知的 exp 時間戳（可選，優先於 payload）
             
         Returns:
             過期時間
         """
+        if exp is None:
+            exp = self._get_unverified_exp(token, payload)
         try:
-            import jwt
-            payload = jwt.decode(token, self.jwt_config.secret_key, 
-                               algorithms=[self.jwt_config.algorithm])
-            exp_timestamp = payload.get("exp")
-            if exp_timestamp:
-                return datetime.fromtimestamp(exp_timestamp)
-        except Exception:
+            if exp:
+                return datetime.fromtimestamp(int(exp), timezone.utc)
+        except (TypeError, ValueError, OverflowError, OSError):
             pass
         return None
     
-    def add_to_blacklist(self, token: str, reason: str = "revoked") -> bool:
+    def _get_unverified_payload(self, token: str) -> Dict[str, Any]:
+        """
+        不驗證簽名，直接以 base64url + JSON 解析 token 的 payload（僅用於快取與水位判斷）
+        
+        Args:
+            token: JWT token
+            
+        Returns:
+            payload，無法解析時返回空字典
+        """
+        try:
+            payload_segment = token.split(".", 2)[1]
+            padded = payload_segment + "=" * (-len(payload_segment) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+            return payload if isinstance(payload, dict) else {}
+        except Exception:
+            return {}
+    
+    def _get_unverified_exp(self, token: str, payload: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        不驗證簽名，直接讀取 token 的 exp（僅用於決定快取存活時間）
+        
+        Args:
+            token: JWT token
+            payload: 已解碼的 payload（可選）
+            
+        Returns:
+            exp 時間戳，無法解析時返回 None
+        """
+        if payload is None:
+            payload = self._get_unverified_payload(token)
+        exp_timestamp = payload.get("exp")
+        try:
+            return int(exp_timestamp) if exp_timestamp else None
+        except (TypeError, ValueError):
+            return None
+    
+    def _lookup_keys(self, token: str, payload: Optional[Dict[str, Any]] = None) -> List[Tuple[str, str]]:
+        """
+        取得 token 在黑名單中的鍵（依查詢優先順序）
+        
+        - token_hash 模式：整個 token 的 SHA-256
+        - jti 模式：token 的 jti（沒有 jti 的 token 退回 token_hash）
+        - dual 模式：jti 與 token_hash 兩者（遷移期間同時接受兩種鍵）
+        
+        Args:
+            token: JWT token
+            payload: 已解碼的 payload（可選，未提供時不驗簽解析）
+            
+        Returns:
+            (欄位名稱, 鍵值) 列表
+        """
+        if self.key_mode != "token_hash":
+            if payload is None:
+                payload = self._get_unverified_payload(token)
+            jti = payload.get("jti")
+            if jti:
+                if self.key_mode == "jti":
+                    return [("jti", str(jti))]
+                return [("jti", str(jti)), ("token_hash", self._hash_token(token))]
+        return [("token_hash", self._hash_token(token))]
+    
+    @staticmethod
+    def _key_id(key: Tuple[str, str]) -> str:
+        """將 (欄位, 鍵值) 轉為快取與 Bloom filter 使用的鍵"""
+        field, value = key
+        return value if field == "token_hash" else f"{field}:{value}"
+    
+    def _cache_result(self,
+                      key_id: str,
+                      token: str,
+                      blacklisted: bool,
+                      payload: Optional[Dict[str, Any]] = None) -> None:
+        """
+        將查詢結果寫入快取
+        
+        已撤銷的結果保留到 token 過期為止（之後 token 本身即無效），
+        未撤銷的結果只保留 negative_ttl 秒，以便盡快反映新的撤銷。
+        
+        Args:
+            key_id: 快取鍵
+            token: 原始 JWT token
+            blacklisted: 是否已撤銷
+            payload: 已解碼的 payload（可選）
+        """
+        if self._cache is None:
+            return
+        if blacklisted:
+            self._cache.set(key_id, True, expires_at=self._get_unverified_exp(token, payload))
+        elif self._negative_ttl > 0:
+            self._cache.set(key_id, False, ttl=self._negative_ttl)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        取得黑名單查詢快取的統計資訊
+        
+        Returns:
+            快取統計資訊（命中、未命中、淘汰次數等），未啟用時返回 {"enabled": False}
+        """
+        if self._cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._cache.stats()}
+    
+    def _build_document(self,
+                        token: str,
+                        reason: str,
+                        keys: List[Tuple[str, str]],
+                        payload: Optional[Dict[str, Any]] = None,
+                        exp: Optional[int] = None) -> Dict[str, Any]:
+        """
+        建立黑名單文件
+        
+        Args:
+            token: JWT token
+            reason: 撤銷原因
+            keys: _lookup_keys 取得的鍵（全部寫入文件）
+            payload: 已解碼的 payload（可選）
+            exp: 已知的 exp 時間戳（可選）
+            
+        Returns:
+            黑名單文件
+        """
+        expiration = self._get_token_expiration(token, payload, exp)
+        document = dict(keys)
+        document.update({
+            "reason": reason,
+            "revoked_at": datetime.fromtimestamp(self._clock(), timezone.utc).isoformat(),
+            "expires_at": expiration.isoformat() if expiration else None
+        })
+        return document
+    
+    def _mark_revoked_locally(self,
+                              keys: List[Tuple[str, str]],
+                              token: str,
+                              payload: Optional[Dict[str, Any]] = None) -> None:
+        """將撤銷結果寫入本地快取與 Bloom filter，讓本程序立即拒絕該 token"""
+        for key in keys:
+            key_id = self._key_id(key)
+            self._cache_result(key_id, token, True, payload)
+            if self._bloom is not None:
+                self._bloom_add_local(key_id)
+    
+    def _write_documents(self, documents: list) -> bool:
+        """以一次批次寫入多筆黑名單文件（供 add_many 與 write-behind 佇列使用）"""
+        response = self.session.post(
+            f"{self.mongodb_api_url}/add/documents/{self.collection_name}/batch",
+            json={"data": documents},
+            timeout=self._bulk_timeout
+        )
+        if response.status_code != 200:
+            print(f"批次寫入黑名單失敗: {response.status_code} - {response.text}")
+            return False
+        return True
+    
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """
+        取得 write-behind 撤銷佇列的統計資訊
+        
+        Returns:
+            佇列深度與刷新延遲等資訊，未啟用時返回 {"enabled": False}
+        """
+        if self._revocation_queue is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._revocation_queue.stats()}
+    
+    def add_to_blacklist(self,
+                         token: str,
+                         reason: str = "revoked",
+                         payload: Optional[Dict[str, Any]] = None,
+                         exp: Optional[int] = None) -> bool:
         """
         將 token 加入黑名單
         
+        啟用 write-behind 時，撤銷結果會先寫入本地快取並放入佇列後立即返回；
+        佇列已滿時改走同步寫入。
+        
         Args:
             token: 要加入黑名單的 JWT token
             reason: 撤銷原因
+            payload: 呼叫端已驗證的 payload（可選，避免重複解碼）
+            exp: 已知的 exp 時間戳（可選）
             
         Returns:
-            是否成功加入黑名單
+            是否成功加入黑名單（write-behind 模式下表示已成功排入佇列）
         """
         try:
-            # 雜湊 token
-            token_hash = self._hash_token(token)
+            # 只解析一次 payload，供鍵、過期時間與快取共用
+            if payload is None and (exp is None or self.key_mode != "token_hash"):
+                payload = self._get_unverified_payload(token)
             
-            # 取得過期時間
-            expiration = self._get_token_expiration(token)
+            # 取得黑名單鍵（token 雜湊或 jti）
+            keys = self._lookup_keys(token, payload)
             
             # 準備文件資料
-            document = {
-                "token_hash": token_hash,
-                "reason": reason,
-                "revoked_at": datetime.now(timezone.utc).isoformat(),
-                "expires_at": expiration.isoformat() if expiration else None
-            }
+            document = self._build_document(token, reason, keys, payload, exp)
+            
+            # write-behind：先在本地生效，再由背景執行緒批次寫入
+            if self._revocation_queue is not None and self._revocation_queue.enqueue(document):
+                self._mark_revoked_locally(keys, token, payload)
+                return True
             
             # 呼叫 MongoDB API 插入文件
-            response = requests.post(
+            response = self.session.post(
                 f"{self.mongodb_api_url}/add/document/{self.collection_name}",
                 json={"data": document},
-                timeout=10
+                timeout=self._write_timeout
             )
             
             if response.status_code == 200:
                 result = response.json()
-                return result.get("status") == "ok"
+                added = result.get("status") == "ok"
+                if added:
+                    self._mark_revoked_locally(keys, token, payload)
+                return added
             else:
                 print(f"加入黑名單失敗: {response.status_code} - {response.text}")
                 return False
@@ -108,38 +634,287 @@ class BlacklistManager:
             print(f"加入黑名單時發生錯誤: {str(e)}")
             return False
     
-    def is_blacklisted(self, token: str) -> bool:
+    def add_many(self,
+                 tokens: List[str],
+                 reason: Union[str, List[str]] = "revoked",
+                 chunk_size: int = 500,
+                 payloads: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+        """
+        批次將多個 token 加入黑名單
+        
+        在本地完成雜湊與過期時間解析，再以批次寫入端點分塊寫入，每個區塊只需一次往返。
+        
+        Args:
+            tokens: 要加入黑名單的 JWT token 列表
+            reason: 撤銷原因，或與 tokens 等長的撤銷原因列表
+            chunk_size: 每次批次寫入的最大文件數
+            payloads: 與 tokens 等長的已解碼 payload 列表（可選，避免重複解碼）
+            
+        Returns:
+            與 tokens 順序一致的結果列表，每筆包含 index、key（黑名單鍵）、success 與 message
+        """
+        reasons = reason if isinstance(reason, list) else [reason] * len(tokens)
+        if len(reasons) != len(tokens):
+            raise ValueError("reason 列表長度必須與 tokens 相同")
+        payloads = payloads or [None] * len(tokens)
+        if len(payloads) != len(tokens):
+            raise ValueError("payloads 列表長度必須與 tokens 相同")
+        
+        results = []
+        documents = {}
+        for index, (token, token_reason, payload) in enumerate(zip(tokens, reasons, payloads)):
+            if not token:
+                results.append({"index": index, "key": None, "success": False,
+                                "message": "token 不可為空"})
+                continue
+            if payload is None:
+                payload = self._get_unverified_payload(token)
+            keys = self._lookup_keys(token, payload)
+            key_id = self._key_id(keys[0])
+            results.append({"index": index, "key": key_id, "success": False, "message": ""})
+            # 相同 token 只寫入一次
+            if key_id not in documents:
+                documents[key_id] = (token, keys, payload,
+                                     self._build_document(token, token_reason, keys, payload))
+        
+        succeeded = set()
+        items = list(documents.items())
+        for offset in range(0, len(items), chunk_size):
+            chunk = items[offset:offset + chunk_size]
+            try:
+                written = self._write_documents([doc for _, (_, _, _, doc) in chunk])
+            except Exception as e:
+                print(f"批次加入黑名單時發生錯誤: {str(e)}")
+                written = False
+            
+            if written:
+                for key_id, (token, keys, payload, _) in chunk:
+                    self._mark_revoked_locally(keys, token, payload)
+                    succeeded.add(key_id)
+        
+        for item in results:
+            if item["key"] is None:
+                continue
+            item["success"] = item["key"] in succeeded
+            item["message"] = "已加入黑名單" if item["success"] else "批次寫入失敗"
+        return results
+    
+    def is_blacklisted(self, token: str, payload: Optional[Dict[str, Any]] = None) -> bool:
         """
         檢查 token 是否在黑名單中
         
+        除了逐筆黑名單外，也會檢查使用者層級的撤銷水位（iat 早於水位即視為撤銷）。
+        
         Args:
             token: 要檢查的 JWT token
+            payload: 已解碼的 payload（可選，未提供時在需要時不驗簽解析）
             
         Returns:
             是否在黑名單中
         """
         try:
-            # 雜湊 token
-            token_hash = self._hash_token(token)
+            # 使用者撤銷水位：O(1) 的本地快取查詢
+            if self.user_epochs is not None:
+                if payload is None:
+                    payload = self._get_unverified_payload(token)
+                if self.user_epochs.is_revoked(payload):
+                    return True
             
-            # 呼叫 MongoDB API 查詢
-            response = requests.get(
-                f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
-                params={"token_hash": token_hash},
-                timeout=10
-            )
+            # 取得黑名單鍵（token 雜湊或 jti）
+            keys = self._lookup_keys(token, payload)
+            key_ids = [self._key_id(key) for key in keys]
             
-            if response.status_code == 200:
-                result = response.json()
-                return len(result.get("data", [])) > 0
+            # Bloom filter 判定所有鍵「一定不存在」時直接在本地回答
+            if self._bloom_ready and not any(self._bloom.might_contain(key_id) for key_id in key_ids):
+                self.bloom_local_negatives += 1
+                return False
+            
+            # 先查詢程序內快取
+            if self._cache is not None:
+                cached = self._cache.get(key_ids[0])
+                if cached is not MISSING:
+                    return cached
+            
+            # 呼叫 MongoDB API 查詢（dual 模式下以一次 $or 查詢同時比對 jti 與 token_hash）
+            if len(keys) == 1:
+                response = self.session.get(
+                    f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
+                    params=dict(keys),
+                    timeout=self._read_timeout
+                )
             else:
+                response = self.session.post(
+                    f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
+                    json={"query": {"$or": [{field: value} for field, value in keys]}},
+                    timeout=self._read_timeout
+                )
+            
+            if response.status_code != 200:
                 print(f"查詢黑名單失敗: {response.status_code} - {response.text}")
                 return False
+            
+            blacklisted = len(response.json().get("data", [])) > 0
+            self._cache_result(key_ids[0], token, blacklisted, payload)
+            return blacklisted
                 
         except Exception as e:
             print(f"查詢黑名單時發生錯誤: {str(e)}")
             return False
     
+    def check_refresh_token(self, token: str, payload: Dict[str, Any]) -> str:
+        """
+        檢查輪替中的 refresh token 狀態
+        
+        依序查詢本地的已消耗紀錄、已撤銷家族、黑名單快取與已快取的使用者撤銷水位
+        （不為水位另外查詢），Bloom filter 判定 token 與家族都不存在時直接在本地回答；
+        否則以一次查詢同時比對 token 的黑名單鍵與家族撤銷文件。
+        多筆文件符合時依「家族已撤銷 > 重複使用 > 已撤銷」決定結果。
+        
+        Args:
+            token: refresh token
+            payload: 已驗證的 payload（包含 fam）
+            
+        Returns:
+            "ok"（可換發）、"revoked"（已撤銷）或 "reused"（已消耗的 token 被重複使用）
+        """
+        try:
+            keys = self._lookup_keys(token, payload)
+            key_ids = [self._key_id(key) for key in keys]
+            fam = payload.get("fam")
+            
+            if self._consumed_refresh is not None and self._consumed_refresh.get(key_ids[0]) is not MISSING:
+                return "reused"
+            if fam and self._revoked_families is not None and self._revoked_families.get(fam) is not MISSING:
+                return "revoked"
+            if self._cache is not None and self._cache.get(key_ids[0]) is True:
+                return "revoked"
+            # 只使用已快取的水位，換發路徑不為水位多一次往返
+            if self.user_epochs is not None and self.user_epochs.is_revoked(payload, fetch=False):
+                return "revoked"
+            
+            # Bloom filter 判定 token 與家族都「一定不存在」時直接在本地回答
+            if self._bloom_ready:
+                candidates = key_ids + ([self._key_id(("fam", str(fam)))] if fam else [])
+                if not any(self._bloom.might_contain(key_id) for key_id in candidates):
+                    self.bloom_local_negatives += 1
+                    return "ok"
+            
+            conditions = [{field: value} for field, value in keys]
+            if fam:
+                conditions.append({"fam": fam, "reason": FAMILY_REVOKED_REASON})
+            response = self.session.post(
+                f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
+                json={"query": {"$or": conditions}},
+                timeout=self._read_timeout
+            )
+            if response.status_code != 200:
+                print(f"查詢 refresh token 狀態失敗: {response.status_code} - {response.text}")
+                return "ok"
+            
+            reasons = {doc.get("reason") for doc in response.json().get("data", [])}
+            if not reasons:
+                return "ok"
+            if FAMILY_REVOKED_REASON in reasons:
+                self._remember_revoked_family(fam)
+                return "revoked"
+            status = "reused" if REFRESH_ROTATED_REASON in reasons else "revoked"
+            if status == "reused" and self._consumed_refresh is not None:
+                self._consumed_refresh.set(key_ids[0], fam, expires_at=self._get_unverified_exp(token, payload))
+            elif status == "revoked":
+                self._cache_result(key_ids[0], token, True, payload)
+            return status
+        
+        except Exception as e:
+            print(f"查詢 refresh token 狀態時發生錯誤: {str(e)}")
+            return "ok"
+    
+    def consume_refresh_token(self, token: str, payload: Dict[str, Any]) -> bool:
+        """
+        將 refresh token 標記為已消耗（換發新 token 前呼叫）
+        
+        本地標記在鎖內完成，同一程序內同一個 token 只有一個請求能成功消耗；
+        消耗紀錄由 write-behind 佇列批次寫入，佇列已滿時改走同步寫入。
+        
+        Args:
+            token: refresh token
+            payload: 已驗證的 payload（包含 fam）
+            
+        Returns:
+            是否成功消耗（已被其他請求消耗時返回 False）
+        """
+        keys = self._lookup_keys(token, payload)
+        key_id = self._key_id(keys[0])
+        with self._refresh_lock:
+            if self._consumed_refresh is not None:
+                if self._consumed_refresh.get(key_id) is not MISSING:
+                    return False
+                self._consumed_refresh.set(key_id, payload.get("fam"),
+                                           expires_at=self._get_unverified_exp(token, payload))
+        
+        document = self._build_document(token, REFRESH_ROTATED_REASON, keys, payload)
+        if payload.get("fam"):
+            document["fam"] = payload["fam"]
+        self._mark_revoked_locally(keys, token, payload)
+        
+        if self._refresh_queue is not None and self._refresh_queue.enqueue(document):
+            return True
+        try:
+            if not self._write_documents([document]):
+                print("寫入 refresh token 消耗紀錄失敗")
+        except Exception as e:
+            print(f"寫入 refresh token 消耗紀錄時發生錯誤: {str(e)}")
+        return True
+    
+    def _remember_revoked_family(self, fam: str) -> None:
+        """將已撤銷的家族寫入本地快取與 Bloom filter"""
+        if self._revoked_families is not None:
+            self._revoked_families.set(fam, True, ttl=self.jwt_config.refresh_token_expires * 60)
+        if self._bloom is not None:
+            self._bloom_add_local(self._key_id(("fam", fam)))
+    
+    def revoke_refresh_family(self, fam: str) -> bool:
+        """
+        撤銷整個 refresh token 家族（偵測到重複使用時呼叫）
+        
+        只寫入一份家族文件，該家族簽發過的所有 refresh token 都會被拒絕；
+        文件在家族中最新的 refresh token 過期後即可清理。
+        
+        Args:
+            fam: 家族 ID（refresh token 的 fam claim）
+            
+        Returns:
+            是否成功寫入
+        """
+        self._remember_revoked_family(fam)
+        expiration = datetime.fromtimestamp(self._clock() + self.jwt_config.refresh_token_expires * 60, timezone.utc)
+        document = {
+            "fam": fam,
+            "reason": FAMILY_REVOKED_REASON,
+            "revoked_at": datetime.fromtimestamp(self._clock(), timezone.utc).isoformat(),
+            "expires_at": expiration.isoformat()
+        }
+        try:
+            return self._write_documents([document])
+        except Exception as e:
+            print(f"撤銷 refresh token 家族時發生錯誤: {str(e)}")
+            return False
+    
+    def get_refresh_rotation_stats(self) -> Dict[str, Any]:
+        """
+        取得 refresh token 輪替的統計資訊
+        
+        Returns:
+            本地快取大小與消耗紀錄佇列資訊，未啟用時返回 {"enabled": False}
+        """
+        if self._refresh_queue is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "consumed": self._consumed_refresh.stats(),
+            "revoked_families": self._revoked_families.stats(),
+            "queue": self._refresh_queue.stats()
+        }
+    
     def remove_from_blacklist(self, token: str) -> bool:
         """
         從黑名單中移除 token
@@ -151,30 +926,34 @@ class BlacklistManager:
             是否成功移除
         """
         try:
-            # 雜湊 token
-            token_hash = self._hash_token(token)
-            
-            # 先查詢文件 ID
-            response = requests.get(
-                f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
-                params={"token_hash": token_hash},
-                timeout=10
-            )
+            keys = self._lookup_keys(token)
             
-            if response.status_code == 200:
-                result = response.json()
-                documents = result.get("data", [])
-                if documents:
-                    # 取得第一個文件的 ID
-                    doc_id = documents[0].get("_id")
-                    if doc_id:
-                        # 刪除文件
-                        delete_response = requests.delete(
-                            f"{self.mongodb_api_url}/delete/document/{self.collection_name}/{doc_id}",
-                            timeout=10
-                        )
-                        if delete_response.status_code == 200:
-                            return True
+            for field, value in keys:
+                # 先查詢文件 ID
+                response = self.session.get(
+                    f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
+                    params={field: value},
+                    timeout=self._read_timeout
+                )
+                if response.status_code != 200:
+                    continue
+                
+                documents = response.json().get("data", [])
+                # 取得第一個文件的 ID
+                doc_id = documents[0].get("_id") if documents else None
+                if not doc_id:
+                    continue
+                
+                # 刪除文件
+                delete_response = self.session.delete(
+                    f"{self.mongodb_api_url}/delete/document/{self.collection_name}/{doc_id}",
+                    timeout=self._write_timeout
+                )
+                if delete_response.status_code == 200:
+                    if self._cache is not None:
+                        for key in keys:
+                            self._cache.delete(self._key_id(key))
+                    return True
             
             print(f"從黑名單移除失敗: token 不存在或刪除失敗")
             return False
@@ -190,103 +969,179 @@ class BlacklistManager:
         Returns:
             清理的 token 數量
         """
-        try:
-            # 取得當前時間
-            now = datetime.now(timezone.utc)
-            
-            # 準備查詢條件
-            query_data = {
-                "query": {
-                    "expires_at": {
-                        "$lt": now.isoformat()
-                    }
-                }
-            }
+        return self.cleanup_expired_tokens_batched().get("deleted", 0)
+    
+    def cleanup_expired_tokens_batched(self,
+                                       cursor: Optional[str] = None,
+                                       chunk_seconds: Optional[int] = None,
+                                       max_chunks: Optional[int] = None) -> Dict[str, Any]:
+        """
+        以伺服器端批次刪除清理已過期的黑名單 tokens
+        
+        依 expires_at 切成固定時間視窗，每個視窗以一次 APIManager.batch_delete_documents
+        處理，不需下載文件也不需逐筆刪除。每次刪除都有上下界：未提供 cursor 時以伺服器端計數
+        找出最早到期文件所在的視窗，之後遇到空視窗也以計數跳過沒有文件的區間，
+        大量的歷史資料同樣分成多個視窗刪除。
+        
+        Args:
+            cursor: 續傳游標（上次回報的 cursor，ISO 格式的 expires_at 下界）
+            chunk_seconds: 每個區塊涵蓋的秒數（預設使用配置值）
+            max_chunks: 本次最多處理的區塊數（None 表示處理到現在為止）
             
-            # 呼叫 MongoDB API 查詢過期 tokens
-            response = requests.post(
-                f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
-                json=query_data,
-                timeout=10
-            )
+        Returns:
+            清理報告，包含總刪除數、各區塊刪除數、總耗時，
+            以及尚未完成時用於續傳的 cursor
+        """
+        started = time.perf_counter()
+        chunk = timedelta(seconds=chunk_seconds or self.jwt_config.blacklist_cleanup_chunk_seconds)
+        now = datetime.now(timezone.utc)
+        
+        report = {
+            "deleted": 0,
+            "chunks": [],
+            "cursor": None,
+            "completed": False,
+            "elapsed_seconds": 0.0
+        }
+        
+        lower = datetime.fromisoformat(cursor.replace('Z', '+00:00')) if cursor else None
+        try:
+            if lower is None:
+                lower = self._find_next_expiry(datetime.fromtimestamp(0, timezone.utc), now, chunk)
             
-            if response.status_code == 200:
-                result = response.json()
-                expired_tokens = result.get("data", [])
+            while lower is not None and lower < now:
+                if max_chunks is not None and len(report["chunks"]) >= max_chunks:
+                    report["cursor"] = lower.isoformat()
+                    break
                 
-                # 刪除過期的 tokens
-                deleted_count = 0
-                for token_doc in expired_tokens:
-                    doc_id = token_doc.get("_id")
-                    if doc_id:
-                        delete_response = requests.delete(
-                            f"{self.mongodb_api_url}/delete/document/{self.collection_name}/{doc_id}",
-                            timeout=10
-                        )
-                        if delete_response.status_code == 200:
-                            deleted_count += 1
+                upper = min(lower + chunk, now)
+                chunk_started = time.perf_counter()
+                result = self._get_api().batch_delete_documents(
+                    self.collection_name,
+                    {"expires_at": {"$gte": lower.isoformat(), "$lt": upper.isoformat()}}
+                )
+                if not result.get("success"):
+                    print(f"批次清理過期 tokens 失敗: {result.get('message')} - {result.get('details')}")
+                    report["cursor"] = lower.isoformat()
+                    break
                 
-                print(f"清理了 {deleted_count} 個過期的黑名單 tokens")
-                return deleted_count
-            else:
-                print(f"查詢過期 tokens 失敗: {response.status_code} - {response.text}")
-                return 0
+                data = result.get("data")
+                deleted = int(data.get("deleted_count", 0)) if isinstance(data, dict) else 0
+                report["deleted"] += deleted
+                report["chunks"].append({
+                    "start": lower.isoformat(),
+                    "end": upper.isoformat(),
+                    "deleted": deleted,
+                    "elapsed_ms": round((time.perf_counter() - chunk_started) * 1000, 2)
+                })
                 
+                lower = upper
+                if deleted == 0 and lower < now:
+                    # 跳過沒有文件的區間（歷史資料稀疏時不逐一刪除空視窗）
+                    lower = self._find_next_expiry(lower, now, chunk)
+            else:
+                report["completed"] = True
         except Exception as e:
-            print(f"清理過期 tokens 時發生錯誤: {str(e)}")
-            return 0
+            print(f"批次清理過期 tokens 時發生錯誤: {str(e)}")
+            report["cursor"] = lower.isoformat() if lower else cursor
+        
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        print(f"清理了 {report['deleted']} 個過期的黑名單 tokens"
+              f"（{len(report['chunks'])} 個區塊，耗時 {report['elapsed_seconds']} 秒）")
+        return report
     
-    def get_blacklist_stats(self) -> Dict[str, Any]:
+    def _find_next_expiry(self, lower: datetime, upper: datetime, chunk: timedelta) -> Optional[datetime]:
+        """
+        以伺服器端計數二分搜尋 [lower, upper) 中最早到期文件所在的視窗起點
+        
+        Args:
+            lower: 搜尋下界（視窗以此對齊）
+            upper: 搜尋上界
+            chunk: 視窗長度
+            
+        Returns:
+            視窗起點（lower + k * chunk），區間內沒有文件時返回 None
+            
+        Raises:
+            RuntimeError: 計數查詢失敗
+        """
+        def count(end: datetime) -> int:
+            found = self._count_documents({"expires_at": {"$gte": lower.isoformat(), "$lt": end.isoformat()}})
+            if found is None:
+                raise RuntimeError("計數過期 tokens 失敗")
+            return found
+        
+        if count(upper) == 0:
+            return None
+        # 找出最小的 k，使 [lower, lower + (k + 1) * chunk) 內有文件
+        low, high = 0, math.ceil((upper - lower) / chunk) - 1
+        while low < high:
+            mid = (low + high) // 2
+            if count(min(lower + (mid + 1) * chunk, upper)) > 0:
+                high = mid
+            else:
+                low = mid + 1
+        return lower + low * chunk
+    
+    def _count_documents(self, query: Dict[str, Any]) -> Optional[int]:
+        """
+        以 APIManager.count_documents 取得符合條件的黑名單文件數量
+        
+        Args:
+            query: 查詢條件（可包含 $gte 等運算子條件）
+            
+        Returns:
+            文件數量，回應失敗或格式不符時返回 None
+        """
+        result = self._get_api().count_documents(self.collection_name, query)
+        if not result.get("success"):
+            print(f"計數黑名單文件失敗: {result.get('message')} - {result.get('details')}")
+            return None
+        data = result.get("data")
+        if isinstance(data, dict):
+            data = data.get("count")
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            return None
+    
+    def get_blacklist_stats(self, use_cache: bool = True) -> Dict[str, Any]:
         """
         取得黑名單統計資訊
         
+        以兩次 APIManager.count_documents（GET /search/documents/{collection}/count）
+        取得總數與尚未過期數，不下載整個集合。沒有 expires_at 的文件與舊版相同，視為已過期。
+        
+        Args:
+            use_cache: 是否使用短暫快取的結果（存活時間由 stats_cache_ttl 設定）
+            
         Returns:
             黑名單統計資訊
         """
+        if use_cache and self._stats_cache is not None:
+            cached = self._stats_cache.get("stats")
+            if cached is not MISSING:
+                return dict(cached)
+        
         try:
-            # 取得當前時間
-            now = datetime.now(timezone.utc)
+            now = datetime.now(timezone.utc).isoformat()
             
-            # 查詢所有 tokens
-            response = requests.get(
-                f"{self.mongodb_api_url}/search/documents/{self.collection_name}",
-                timeout=10
-            )
+            total_count = self._count_documents({})
+            active_count = self._count_documents({"expires_at": {"$gte": now}})
             
-            if response.status_code == 200:
-                result = response.json()
-                all_tokens = result.get("data", [])
-                
-                # 計算統計資訊
-                total_count = len(all_tokens)
-                expired_count = 0
-                active_count = 0
-                
-                for token_doc in all_tokens:
-                    expires_at = token_doc.get("expires_at")
-                    if expires_at:
-                        try:
-                            expiration = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-                            if expiration < now:
-                                expired_count += 1
-                            else:
-                                active_count += 1
-                        except Exception:
-                            # 如果無法解析日期，算作過期
-                            expired_count += 1
-                    else:
-                        # 沒有過期時間的算作過期
-                        expired_count += 1
-                
-                return {
-                    "total": total_count,
-                    "expired": expired_count,
-                    "active": active_count
-                }
-            else:
-                print(f"取得黑名單統計失敗: {response.status_code} - {response.text}")
+            if total_count is None or active_count is None:
+                print("取得黑名單統計失敗: 計數查詢未成功")
                 return {"total": 0, "expired": 0, "active": 0}
+            
+            stats = {
+                "total": total_count,
+                "expired": max(total_count - active_count, 0),
+                "active": active_count
+            }
+            if self._stats_cache is not None:
+                self._stats_cache.set("stats", stats)
+            return dict(stats)
                 
         except Exception as e:
             print(f"取得黑名單統計時發生錯誤: {str(e)}")
-            return {"total": 0, "expired": 0, "active": 0} 
\ No newline at end of file
+            return {"total": 0, "expired": 0, "active": 0}
@@ -0,0 +1,99 @@
+"""
+Bloom Filter
+
+提供黑名單的機率式前置過濾器：判定「一定不存在」時可直接在本地回答，
+只有「可能存在」時才需要呼叫遠端 API 確認。
+"""
+
+import hashlib
+import math
+import threading
+from typing import Any, Dict, Iterable
+
+
+class BloomFilter:
+    """以 bytearray 實作的 Bloom filter（使用 double hashing 產生 k 個位置）"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.001):
+        """
+        初始化 Bloom filter
+
+        Args:
+            capacity: 預期存放的項目數量
+            false_positive_rate: 在達到 capacity 時的目標誤判率（0 < p < 1）
+        """
+        if capacity <= 0:
+            raise ValueError(f"capacity 必須為正整數: {capacity}")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(f"false_positive_rate 必須介於 0 與 1 之間: {false_positive_rate}")
+
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+
+        # m = -n * ln(p) / (ln 2)^2，k = m / n * ln 2
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        """計算 key 對應的 k 個位元位置"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        m = self.num_bits
+        return ((h1 + i * h2) % m for i in range(self.num_hashes))
+
+    def add(self, key: str) -> None:
+        """
+        加入項目
+
+        Args:
+            key: 項目鍵（例如 token 雜湊）
+        """
+        positions = list(self._positions(key))
+        bits = self._bits
+        with self._lock:
+            for pos in positions:
+                bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def might_contain(self, key: str) -> bool:
+        """
+        檢查項目是否可能存在
+
+        Args:
+            key: 項目鍵
+
+        Returns:
+            False 表示一定不存在；True 表示可能存在（需再確認）
+        """
+        bits = self._bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return self.might_contain(key)
+
+    def is_saturated(self) -> bool:
+        """是否已超過設計容量（誤判率將高於目標值）"""
+        return self.count > self.capacity
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得 Bloom filter 統計資訊
+
+        Returns:
+            容量、項目數、位元數與雜湊函數數量
+        """
+        return {
+            "capacity": self.capacity,
+            "count": self.count,
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "size_bytes": len(self._bits),
+            "false_positive_rate": self.false_positive_rate
+        }
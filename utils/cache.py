@@ -0,0 +1,140 @@
+"""
+In-process Cache Utilities
+
+提供執行緒安全、有界的 LRU + TTL 快取，用於減少熱路徑上的遠端查詢。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# 用於區分「未命中」與「快取值為 None/False」的哨兵物件
+MISSING = object()
+
+
+class LRUTTLCache:
+    """有界 LRU 快取，每筆項目可設定獨立的過期時間"""
+
+    def __init__(self,
+                 max_size: int = 10000,
+                 default_ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        初始化快取
+
+        Args:
+            max_size: 最大項目數量，超過時淘汰最久未使用的項目
+            default_ttl: 預設存活秒數（None 表示不過期，僅受容量限制）
+            clock: 取得目前時間（epoch 秒）的函數
+        """
+        if max_size <= 0:
+            raise ValueError(f"max_size 必須為正整數: {max_size}")
+
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 統計計數器
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        取得快取值
+
+        Args:
+            key: 快取鍵
+            default: 未命中時返回的值
+
+        Returns:
+            快取值，未命中或已過期時返回 default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self,
+            key: Hashable,
+            value: Any,
+            ttl: Optional[float] = None,
+            expires_at: Optional[float] = None) -> None:
+        """
+        寫入快取值
+
+        Args:
+            key: 快取鍵
+            value: 快取值
+            ttl: 存活秒數（未提供時使用 default_ttl）
+            expires_at: 絕對過期時間（epoch 秒），優先於 ttl
+        """
+        if expires_at is None:
+            ttl = self.default_ttl if ttl is None else ttl
+            if ttl is not None:
+                expires_at = self._clock() + ttl
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (value, expires_at)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        移除快取項目
+
+        Args:
+            key: 快取鍵
+
+        Returns:
+            項目是否存在
+        """
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """清空快取（不重置統計計數器）"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得快取統計資訊
+
+        Returns:
+            包含命中、未命中、淘汰與過期次數的字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / total) if total else 0.0
+            }
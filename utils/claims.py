@@ -0,0 +1,62 @@
+"""
+Token Claim Profiles
+
+- standard - 呼叫端資料原樣寫入 token（預設）
+- compact  - 縮短 token：user_id 改為 uid，與 sub 相同的 email 不重複寫入
+
+compact token 的讀取端以 expand_claims 還原為標準欄位，兩種 token 可同時流通。
+sub、type、iat、exp、jti 等中介軟體會驗證的欄位維持不變。
+"""
+
+from typing import Any, Dict
+
+# 支援的 claim profile
+CLAIM_PROFILES = ("standard", "compact")
+
+# compact profile 的短鍵對應（標準鍵 -> 短鍵）
+SHORT_CLAIM_KEYS = {
+    "user_id": "uid",
+}
+
+
+def compact_claims(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    將標準 claims 轉為 compact profile
+
+    只有包含 user_id 的資料才會省略與 sub 相同的 email，
+    讓讀取端能以 uid 判斷 email 是否被省略。
+
+    Args:
+        data: 標準 claims
+
+    Returns:
+        compact claims（新字典，不修改輸入）
+    """
+    compacted = {SHORT_CLAIM_KEYS.get(key, key): value for key, value in data.items()}
+    if "uid" in compacted and "email" in compacted and compacted["email"] == compacted.get("sub"):
+        del compacted["email"]
+    return compacted
+
+
+def expand_claims(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    將 compact profile 的 payload 還原為標準 claims
+
+    標準 payload 原樣返回，可對任何已驗證的 payload 呼叫。
+
+    Args:
+        payload: 已解碼的 token payload
+
+    Returns:
+        包含標準欄位（email、user_id 等）的 payload
+    """
+    if "uid" not in payload:
+        return payload
+
+    expanded = dict(payload)
+    for key, short_key in SHORT_CLAIM_KEYS.items():
+        if short_key in expanded:
+            expanded[key] = expanded.pop(short_key)
+    if "email" not in expanded and "sub" in expanded:
+        expanded["email"] = expanded["sub"]
+    return expanded
@@ -0,0 +1,112 @@
+"""
+Token Clock
+
+token 熱路徑使用的時鐘，一律以整數 epoch 秒表示時間（與 JWT 的 iat/exp 相同）：
+- SystemClock - 每次呼叫讀取系統時間（預設）
+- CoarseClock - 由背景執行緒每秒更新一次，讀取只是屬性存取（高 QPS worker）
+- FrozenClock - 固定時間，可手動前進（測試與基準測試）
+"""
+
+import threading
+import time
+from typing import Optional
+
+# 支援的時鐘模式
+CLOCK_MODES = ("system", "coarse")
+
+
+class SystemClock:
+    """每次呼叫讀取系統時間"""
+
+    def __call__(self) -> int:
+        return int(time.time())
+
+    def close(self) -> None:
+        """釋放資源（無）"""
+
+
+class CoarseClock:
+    """以背景執行緒定期更新的粗粒度時鐘"""
+
+    def __init__(self, resolution: float = 1.0):
+        """
+        初始化粗粒度時鐘
+
+        Args:
+            resolution: 更新間隔秒數（讀取值最多落後此時間）
+        """
+        self.resolution = resolution
+        self._now = int(time.time())
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="jwt-coarse-clock", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """背景執行緒：定期更新目前時間"""
+        while not self._stop.wait(self.resolution):
+            self._now = int(time.time())
+
+    def __call__(self) -> int:
+        return self._now
+
+    def close(self) -> None:
+        """停止背景執行緒"""
+        self._stop.set()
+
+
+class FrozenClock:
+    """固定時間的時鐘，供測試與基準測試使用"""
+
+    def __init__(self, now: Optional[int] = None):
+        """
+        初始化固定時鐘
+
+        Args:
+            now: 固定的 epoch 秒，預設為目前時間
+        """
+        self._now = int(time.time()) if now is None else int(now)
+
+    def __call__(self) -> int:
+        return self._now
+
+    def set(self, now: int) -> None:
+        """
+        設定目前時間
+
+        Args:
+            now: epoch 秒
+        """
+        self._now = int(now)
+
+    def advance(self, seconds: int) -> int:
+        """
+        讓時間前進
+
+        Args:
+            seconds: 前進的秒數
+
+        Returns:
+            前進後的時間
+        """
+        self._now += int(seconds)
+        return self._now
+
+    def close(self) -> None:
+        """釋放資源（無）"""
+
+
+def create_clock(mode: str = "system"):
+    """
+    依模式建立時鐘
+
+    Args:
+        mode: 時鐘模式（system 或 coarse）
+
+    Returns:
+        時鐘實例
+    """
+    if mode == "coarse":
+        return CoarseClock()
+    if mode == "system":
+        return SystemClock()
+    raise ValueError(f"無效的時鐘模式: {mode}。可選值: {', '.join(CLOCK_MODES)}")
@@ -0,0 +1,47 @@
+"""
+Pooled HTTP Session
+
+建立具連線池、keep-alive 與重試退避的 requests.Session，
+避免每次呼叫 MongoDB API 都重新進行 TCP + TLS 握手。
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_pooled_session(pool_size: int = 10,
+                          keep_alive: bool = True,
+                          retries: int = 2,
+                          backoff_factor: float = 0.1) -> requests.Session:
+    """
+    建立具連線池的 HTTP session
+
+    只有冪等方法（GET、PUT、DELETE 等）會自動重試；POST 不重試以避免重複寫入。
+
+    Args:
+        pool_size: 每個主機保留的最大連線數
+        keep_alive: 是否重用連線（False 時每次請求後關閉連線）
+        retries: 連線錯誤或 502/503/504 時的最大重試次數
+        backoff_factor: 重試退避係數（第 n 次重試等待 backoff_factor * 2^(n-1) 秒）
+
+    Returns:
+        設定完成的 requests.Session
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
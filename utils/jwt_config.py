@@ -5,8 +5,9 @@ Provides configuration management for JWT authentication.
 Moved from JWT_Midware package to main project.
 """
 
+import os
 import yaml
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pathlib import Path
 
 class JWTConfig:
@@ -49,6 +50,43 @@ class JWTConfig:
         self.access_token_expires = self._get_config_value('jwt.access_token_expires', 120, int)
         self.refresh_token_expires = self._get_config_value('jwt.refresh_token_expires', 1440, int)
         
+        # 非對稱演算法（RS*/ES*/EdDSA）的 PEM 金鑰檔案（可選，相對路徑以配置檔案所在目錄為準）
+        self.private_key_file = self._get_config_value('jwt.private_key_file')
+        self.public_key_file = self._get_config_value('jwt.public_key_file')
+        self.private_key = self._load_key_file(config_file, self.private_key_file)
+        self.public_key = self._load_key_file(config_file, self.public_key_file)
+        
+        # 金鑰輪替（可選）：目前簽章金鑰的 kid 與僅驗證用的舊金鑰
+        kid = self._get_config_value('jwt.kid')
+        self.kid = str(kid) if kid is not None else None
+        self.verification_keys = self._load_verification_keys(config_file)
+        # 未帶 kid 的 token（啟用 kid 前簽發）使用的驗證金鑰；未設定時依序嘗試所有金鑰
+        legacy_kid = self._get_config_value('jwt.legacy_kid')
+        self.legacy_kid = str(legacy_kid) if legacy_kid is not None else None
+        self.jwks_max_age = self._get_config_value('jwt.jwks_max_age', 300, int)
+        
+        # token 熱路徑時鐘：system（每次讀取系統時間）或 coarse（每秒更新一次）
+        self.clock_mode = self._get_config_value('jwt.clock', 'system')
+        if self.clock_mode not in ['system', 'coarse']:
+            raise ValueError(f"無效的時鐘模式: {self.clock_mode}。可選值: system, coarse")
+        
+        # 已驗證 token 快取配置（可選區段）
+        self.verified_cache_enabled = self._get_config_value('jwt.verified_cache.enabled', True, bool)
+        self.verified_cache_max_size = self._get_config_value('jwt.verified_cache.max_size', 10000, int)
+        self.verified_cache_max_ttl = self._get_config_value('jwt.verified_cache.max_ttl', 300, int)
+        
+        # refresh token 輪替（可選區段）：每次換發都消耗舊 refresh token，重複使用即撤銷整個 token 家族
+        self.refresh_rotation_enabled = self._get_config_value('jwt.refresh_rotation.enabled', False, bool)
+        self.refresh_rotation_cache_size = self._get_config_value('jwt.refresh_rotation.family_cache_size', 10000, int)
+        self.claim_profile = self._get_config_value('jwt.claim_profile', 'standard')
+        if self.claim_profile not in ['standard', 'compact']:
+            raise ValueError(f"無效的 claim profile: {self.claim_profile}。可選值: standard, compact")
+        # compact profile 預設搭配 compact jti
+        self.jti_mode = self._get_config_value(
+            'jwt.jti_mode', 'compact' if self.claim_profile == 'compact' else 'uuid')
+        if self.jti_mode not in ['uuid', 'compact']:
+            raise ValueError(f"無效的 jti 模式: {self.jti_mode}。可選值: uuid, compact")
+        
         # 根據 API 模式決定 MongoDB API URL
         self.api_mode = self._get_config_value('api.mode', 'internal')
         if self.api_mode not in ['internal', 'public']:
@@ -61,6 +99,52 @@ class JWTConfig:
         
         self.blacklist_collection = self._get_config_value('mongodb.blacklist.collection', 'jwt_blacklist')
         self.enable_blacklist = self._get_config_value('mongodb.blacklist.enabled', True, bool)
+        self.blacklist_key_mode = self._get_config_value('mongodb.blacklist.key_mode', 'token_hash')
+        if self.blacklist_key_mode not in ['token_hash', 'jti', 'dual']:
+            raise ValueError(f"無效的黑名單鍵模式: {self.blacklist_key_mode}。可選值: token_hash, jti, dual")
+        
+        # 黑名單查詢快取配置（可選區段）
+        self.blacklist_cache_enabled = self._get_config_value('mongodb.blacklist.cache.enabled', True, bool)
+        self.blacklist_cache_max_size = self._get_config_value('mongodb.blacklist.cache.max_size', 10000, int)
+        self.blacklist_cache_negative_ttl = self._get_config_value('mongodb.blacklist.cache.negative_ttl', 30, int)
+        self.blacklist_stats_cache_ttl = self._get_config_value('mongodb.blacklist.cache.stats_ttl', 10, int)
+        
+        # 黑名單 Bloom filter 前置過濾配置（可選區段）
+        self.blacklist_bloom_enabled = self._get_config_value('mongodb.blacklist.bloom_filter.enabled', False, bool)
+        self.blacklist_bloom_capacity = self._get_config_value('mongodb.blacklist.bloom_filter.capacity', 100000, int)
+        self.blacklist_bloom_false_positive_rate = self._get_config_value(
+            'mongodb.blacklist.bloom_filter.false_positive_rate', 0.001, float)
+        self.blacklist_bloom_sync_interval = self._get_config_value('mongodb.blacklist.bloom_filter.sync_interval', 60, int)
+        self.blacklist_bloom_max_clock_skew = self._get_config_value(
+            'mongodb.blacklist.bloom_filter.max_clock_skew', 5, int)
+        
+        # 使用者層級撤銷水位配置（可選區段）
+        self.user_epoch_enabled = self._get_config_value('mongodb.blacklist.user_epoch.enabled', False, bool)
+        self.user_epoch_cache_ttl = self._get_config_value('mongodb.blacklist.user_epoch.cache_ttl', 60, int)
+        
+        # 黑名單 write-behind 撤銷佇列配置（可選區段）
+        self.blacklist_write_behind_enabled = self._get_config_value(
+            'mongodb.blacklist.write_behind.enabled', False, bool)
+        self.blacklist_write_behind_max_queue_size = self._get_config_value(
+            'mongodb.blacklist.write_behind.max_queue_size', 10000, int)
+        self.blacklist_write_behind_batch_size = self._get_config_value(
+            'mongodb.blacklist.write_behind.batch_size', 100, int)
+        self.blacklist_write_behind_flush_interval = self._get_config_value(
+            'mongodb.blacklist.write_behind.flush_interval', 0.5, float)
+        
+        # 黑名單過期清理配置（可選區段）
+        self.blacklist_cleanup_chunk_seconds = self._get_config_value(
+            'mongodb.blacklist.cleanup.chunk_seconds', 3600, int)
+        
+        # MongoDB API HTTP 連線配置（可選區段）
+        self.http_pool_size = self._get_config_value('mongodb.http.pool_size', 10, int)
+        self.http_keep_alive = self._get_config_value('mongodb.http.keep_alive', True, bool)
+        self.http_retries = self._get_config_value('mongodb.http.retries', 2, int)
+        self.http_backoff_factor = self._get_config_value('mongodb.http.backoff_factor', 0.1, float)
+        self.http_connect_timeout = self._get_config_value('mongodb.http.connect_timeout', 1.0, float)
+        self.http_read_timeout = self._get_config_value('mongodb.http.read_timeout', 2.0, float)
+        self.http_write_timeout = self._get_config_value('mongodb.http.write_timeout', 5.0, float)
+        self.http_bulk_timeout = self._get_config_value('mongodb.http.bulk_timeout', 30.0, float)
     
     def _load_yaml_config(self, config_file: str) -> Dict[str, Any]:
         """載入 YAML 配置檔案"""
@@ -73,6 +157,62 @@ class JWTConfig:
         except Exception as e:
             raise ValueError(f"無法載入配置檔案 {config_file}: {e}")
     
+    def _load_key_file(self, config_file: str, key_file: Optional[str]) -> Optional[str]:
+        """載入 PEM 金鑰檔案（未設定時返回 None）"""
+        if not key_file:
+            return None
+        
+        path = Path(key_file)
+        if not path.is_absolute():
+            path = Path(config_file).resolve().parent / path
+        if not path.exists():
+            raise FileNotFoundError(f"金鑰檔案不存在：{path}")
+        return path.read_text(encoding='utf-8')
+    
+    def _load_verification_keys(self, config_file: str) -> List[Dict[str, Any]]:
+        """
+        載入僅驗證用的金鑰列表（jwt.verification_keys）
+        
+        每個項目包含 kid、algorithm（預設與 jwt.algorithm 相同），以及
+        public_key_file（非對稱演算法）或 secret_env（HS* 密鑰的環境變數名稱）。
+        """
+        entries = self._get_config_value('jwt.verification_keys', []) or []
+        keys = []
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get('kid') is None:
+                raise ValueError("jwt.verification_keys 的每個項目都必須包含 kid")
+            
+            algorithm = entry.get('algorithm', self.algorithm)
+            if algorithm.startswith('HS'):
+                secret_env = entry.get('secret_env')
+                key = os.environ.get(secret_env) if secret_env else None
+                if not key:
+                    raise ValueError(f"驗證金鑰 {entry['kid']} 的環境變數未設定: {secret_env}")
+            else:
+                key = self._load_key_file(config_file, entry.get('public_key_file'))
+                if not key:
+                    raise ValueError(f"驗證金鑰 {entry['kid']} 缺少 public_key_file")
+            
+            keys.append({'kid': str(entry['kid']), 'algorithm': algorithm, 'key': key})
+        return keys
+    
+    @property
+    def is_asymmetric(self) -> bool:
+        """是否使用非對稱簽章演算法"""
+        return not self.algorithm.startswith('HS')
+    
+    @property
+    def signing_key(self) -> str:
+        """
+        簽章用的金鑰
+        
+        HS* 使用 secret_key；非對稱演算法使用 private_key_file，
+        未設定時 secret_key 本身需為 PEM 私鑰。
+        """
+        if self.is_asymmetric and self.private_key:
+            return self.private_key
+        return self.secret_key
+    
     def _validate_config_structure(self) -> None:
         """驗證配置檔案結構是否正確"""
         required_sections = {
@@ -122,7 +262,7 @@ class JWTConfig:
         
         # 驗證演算法
         algorithm = self._config_data['jwt']['algorithm']
-        valid_algorithms = ['HS256', 'HS384', 'HS512', 'RS256', 'RS384', 'RS512']
+        valid_algorithms = ['HS256', 'HS384', 'HS512', 'RS256', 'RS384', 'RS512', 'ES256', 'ES384', 'EdDSA']
         if algorithm not in valid_algorithms:
             raise ValueError(f"無效的 JWT 演算法: {algorithm}。可選值: {', '.join(valid_algorithms)}")
     
@@ -169,12 +309,58 @@ class JWTConfig:
                 return False
             if not self.mongodb_api_url or self.mongodb_api_url.strip() == '':
                 return False
+            if self.is_asymmetric and 'PRIVATE KEY' not in self.signing_key:
+                return False
+            kids = [self.kid] + [key['kid'] for key in self.verification_keys]
+            if self.verification_keys and not self.kid:
+                return False
+            if len(set(kids)) != len(kids):
+                return False
+            if self.legacy_kid is not None and self.legacy_kid not in kids:
+                return False
+            if self.jwks_max_age < 0:
+                return False
+            if self.clock_mode not in ['system', 'coarse']:
+                return False
+            if self.verified_cache_max_size <= 0 or self.verified_cache_max_ttl <= 0:
+                return False
+            if self.refresh_rotation_cache_size <= 0:
+                return False
             if self.access_token_expires <= 0:
                 return False
             if self.refresh_token_expires <= 0:
                 return False
             if self.api_mode not in ['internal', 'public']:
                 return False
+            if self.claim_profile not in ['standard', 'compact']:
+                return False
+            if self.jti_mode not in ['uuid', 'compact']:
+                return False
+            if self.blacklist_cache_max_size <= 0 or self.blacklist_cache_negative_ttl < 0:
+                return False
+            if self.blacklist_stats_cache_ttl < 0:
+                return False
+            if self.user_epoch_cache_ttl <= 0:
+                return False
+            if self.blacklist_write_behind_enabled:
+                if self.blacklist_write_behind_max_queue_size <= 0 or self.blacklist_write_behind_batch_size <= 0:
+                    return False
+                if self.blacklist_write_behind_flush_interval <= 0:
+                    return False
+            if self.blacklist_cleanup_chunk_seconds <= 0:
+                return False
+            if self.http_pool_size <= 0 or self.http_retries < 0:
+                return False
+            if min(self.http_connect_timeout, self.http_read_timeout,
+                   self.http_write_timeout, self.http_bulk_timeout) <= 0:
+                return False
+            if self.blacklist_bloom_enabled:
+                if self.blacklist_bloom_capacity <= 0 or self.blacklist_bloom_sync_interval <= 0:
+                    return False
+                if self.blacklist_bloom_max_clock_skew < 0:
+                    return False
+                if not 0 < self.blacklist_bloom_false_positive_rate < 1:
+                    return False
             return True
         except Exception:
             return False
@@ -188,12 +374,51 @@ class JWTConfig:
         """
         return {
             'algorithm': self.algorithm,
+            'private_key_file': self.private_key_file,
+            'public_key_file': self.public_key_file,
+            'kid': self.kid,
+            'verification_kids': [key['kid'] for key in self.verification_keys],
+            'legacy_kid': self.legacy_kid,
+            'jwks_max_age': self.jwks_max_age,
+            'clock_mode': self.clock_mode,
+            'verified_cache_enabled': self.verified_cache_enabled,
+            'verified_cache_max_size': self.verified_cache_max_size,
+            'verified_cache_max_ttl': self.verified_cache_max_ttl,
+            'refresh_rotation_enabled': self.refresh_rotation_enabled,
+            'refresh_rotation_cache_size': self.refresh_rotation_cache_size,
             'access_token_expires': self.access_token_expires,
             'refresh_token_expires': self.refresh_token_expires,
+            'claim_profile': self.claim_profile,
+            'jti_mode': self.jti_mode,
             'api_mode': self.api_mode,
             'mongodb_api_url': self.mongodb_api_url,
             'blacklist_collection': self.blacklist_collection,
-            'enable_blacklist': self.enable_blacklist
+            'enable_blacklist': self.enable_blacklist,
+            'blacklist_key_mode': self.blacklist_key_mode,
+            'blacklist_cache_enabled': self.blacklist_cache_enabled,
+            'blacklist_cache_max_size': self.blacklist_cache_max_size,
+            'blacklist_cache_negative_ttl': self.blacklist_cache_negative_ttl,
+            'blacklist_stats_cache_ttl': self.blacklist_stats_cache_ttl,
+            'blacklist_bloom_enabled': self.blacklist_bloom_enabled,
+            'blacklist_bloom_capacity': self.blacklist_bloom_capacity,
+            'blacklist_bloom_false_positive_rate': self.blacklist_bloom_false_positive_rate,
+            'blacklist_bloom_sync_interval': self.blacklist_bloom_sync_interval,
+            'blacklist_bloom_max_clock_skew': self.blacklist_bloom_max_clock_skew,
+            'user_epoch_enabled': self.user_epoch_enabled,
+            'user_epoch_cache_ttl': self.user_epoch_cache_ttl,
+            'blacklist_write_behind_enabled': self.blacklist_write_behind_enabled,
+            'blacklist_write_behind_max_queue_size': self.blacklist_write_behind_max_queue_size,
+            'blacklist_write_behind_batch_size': self.blacklist_write_behind_batch_size,
+            'blacklist_write_behind_flush_interval': self.blacklist_write_behind_flush_interval,
+            'blacklist_cleanup_chunk_seconds': self.blacklist_cleanup_chunk_seconds,
+            'http_pool_size': self.http_pool_size,
+            'http_keep_alive': self.http_keep_alive,
+            'http_retries': self.http_retries,
+            'http_backoff_factor': self.http_backoff_factor,
+            'http_connect_timeout': self.http_connect_timeout,
+            'http_read_timeout': self.http_read_timeout,
+            'http_write_timeout': self.http_write_timeout,
+            'http_bulk_timeout': self.http_bulk_timeout
         }
     
     def __str__(self) -> str:
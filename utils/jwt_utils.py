@@ -2,21 +2,38 @@
 JWT Utilities for Main Project
 
 Provides JWT token creation and business logic functions.
-Core JWT verification functions are provided by jwt_auth_middleware package.
+Tokens are verified locally through the kid keyring (utils.keyring), which
+covers rotated keys and asymmetric algorithms; app routes wrap the
+jwt_auth_middleware decorators with cached_auth, which only falls back to them
+for requests without a token.
 """
 
 import jwt
-import uuid
 import requests
 import hashlib
-from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, Optional
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple, Callable, Hashable
 from .jwt_config import JWTConfig
 from .blacklist_manager import BlacklistManager
+from .token_signer import TokenSigner
+from .keyring import KeyRing
+from .claims import compact_claims, expand_claims
+from .verified_token_cache import VerifiedTokenCache
+from .clock import create_clock
 
 # 全域配置實例 - 延遲初始化
 _jwt_config = None
 _blacklist_manager = None
+_token_signer = None
+_keyring = None
+_verified_token_cache = None
+_clock = None
+_clock_injected = False
+# cached_auth 使用的快取命名空間（撤銷時需一併移除）
+_auth_cache_namespaces = set()
 
 def _get_jwt_config() -> JWTConfig:
     """獲取 JWT 配置實例"""
@@ -39,16 +56,348 @@ def _get_blacklist_manager() -> Optional[BlacklistManager]:
         config = _get_jwt_config()
         if config.enable_blacklist and config.mongodb_api_url:
             _blacklist_manager = BlacklistManager(
-                jwt_config=config
+                jwt_config=config,
+                clock=_now
             )
     return _blacklist_manager
 
 def set_jwt_config(config: JWTConfig):
     """設置 JWT 配置（主要用於測試）"""
-    global _jwt_config, _blacklist_manager
+    global _jwt_config, _blacklist_manager, _token_signer, _keyring, _verified_token_cache
     _jwt_config = config
+    if not _clock_injected:
+        _replace_clock(None)  # 依新配置重建時鐘
+    _token_signer = None  # 重置簽章器
+    _keyring = None  # 重置驗證金鑰集合
+    _verified_token_cache = None  # 重置已驗證 token 快取
+    if _blacklist_manager is not None:
+        _blacklist_manager.close()
     _blacklist_manager = None  # 重置黑名單管理器
 
+def _reset_after_fork() -> None:
+    """
+    fork 出的子程序捨棄繼承的黑名單管理器、已驗證 token 快取與時鐘（不呼叫 close）
+    
+    繼承的 write-behind 佇列內容由父程序寫出，子程序關閉它會重複寫入；
+    背景執行緒不存在於子程序，需要時依配置重新建立。
+    """
+    global _blacklist_manager, _verified_token_cache, _clock
+    _blacklist_manager = None
+    _verified_token_cache = None
+    if not _clock_injected:
+        _clock = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _replace_clock(clock) -> None:
+    """替換目前的時鐘並釋放舊時鐘的資源"""
+    global _clock
+    if _clock is not None:
+        _clock.close()
+    _clock = clock
+
+def _get_clock():
+    """獲取目前的時鐘（延遲初始化，依配置的 clock 模式建立）"""
+    global _clock
+    if _clock is None:
+        _clock = create_clock(_get_jwt_config().clock_mode)
+    return _clock
+
+def _now() -> int:
+    """目前時間（整數 epoch 秒）"""
+    return (_clock or _get_clock())()
+
+def set_clock(clock=None) -> None:
+    """
+    注入 token 熱路徑使用的時鐘（主要用於測試與基準測試）
+    
+    範例：
+        from utils.clock import FrozenClock
+        clock = FrozenClock(1700000000)
+        set_clock(clock)
+        clock.advance(3600)
+    
+    Args:
+        clock: 無參數、返回整數 epoch 秒的可呼叫物件；None 表示恢復依配置建立
+    """
+    global _clock_injected
+    _replace_clock(clock)
+    _clock_injected = clock is not None
+
+def _get_token_signer() -> TokenSigner:
+    """獲取預先準備好的簽章器（延遲初始化，配置變更時重建）"""
+    global _token_signer
+    if _token_signer is None:
+        _token_signer = TokenSigner(_get_jwt_config())
+    return _token_signer
+
+# 每個 token 各自產生的 claims，不屬於共用 claims
+_PER_TOKEN_CLAIMS = ("exp", "type", "iat", "jti", "fam")
+
+def _profile_claims(data: Dict[str, Any]) -> Dict[str, Any]:
+    """依配置的 claim profile 轉換呼叫端資料"""
+    if _get_jwt_config().claim_profile == "compact":
+        return compact_claims(data)
+    return data
+
+def _shared_prefix(signer: TokenSigner, data: Dict[str, Any]) -> str:
+    """預先序列化呼叫端資料（排除每個 token 各自產生的 claims）"""
+    return signer.prepare_claims(
+        {k: v for k, v in _profile_claims(data).items() if k not in _PER_TOKEN_CLAIMS}
+    )
+
+def _sign_with_prefix(signer: TokenSigner,
+                      prefix: str,
+                      now: int,
+                      ttl: int,
+                      token_type: str,
+                      family: Optional[str] = None) -> str:
+    """以預先序列化的共用 claims 簽發指定類型的 token（family 為 refresh 輪替的家族 ID）"""
+    # 個別 claims 只有整數與固定字元集的字串，直接組成 JSON 以省去序列化
+    fam = f',"fam":"{family}"' if family else ""
+    return signer.sign_json(
+        f'{prefix}"exp":{now + ttl},"type":"{token_type}","iat":{now},"jti":"{signer.new_jti()}"{fam}}}'
+    )
+
+def _new_family(signer: TokenSigner) -> Optional[str]:
+    """啟用 refresh 輪替時為新的登入 session 產生家族 ID"""
+    return signer.new_jti() if _get_jwt_config().refresh_rotation_enabled else None
+
+def _mint_access(signer: TokenSigner, data: Dict[str, Any], now: int, ttl: int) -> str:
+    """以指定的簽章器與時間點簽發 access token"""
+    return _sign_with_prefix(signer, _shared_prefix(signer, data), now, ttl, "access")
+
+def _access_ttl(expires_delta: Optional[timedelta]) -> int:
+    """取得 access token 的有效秒數"""
+    if expires_delta:
+        return int(expires_delta.total_seconds())
+    return _get_jwt_config().access_token_expires * 60
+
+def _get_keyring() -> KeyRing:
+    """獲取以 kid 索引的驗證金鑰集合（延遲初始化，配置變更時重建）"""
+    global _keyring
+    if _keyring is None:
+        _keyring = KeyRing(_get_jwt_config(), _get_token_signer())
+    return _keyring
+
+def get_public_key_set() -> Dict[str, Any]:
+    """
+    取得驗證 token 用的公鑰集合（JWK Set），供下游服務離線驗證
+    
+    包含目前簽章金鑰與輪替中的舊金鑰；HS* 共享密鑰不會公開。
+    
+    Returns:
+        {"keys": [...]} 格式的 JWK Set
+    """
+    return _get_keyring().jwks
+
+def get_jwks_document() -> Tuple[str, str, int]:
+    """
+    取得預先序列化的 JWK Set 與快取資訊（供 /.well-known/jwks.json 使用）
+    
+    Returns:
+        (JWK Set JSON 字串, ETag, Cache-Control max-age 秒數)
+    """
+    keyring = _get_keyring()
+    return keyring.jwks_json, keyring.jwks_etag, _get_jwt_config().jwks_max_age
+
+def verify_with_keyring(token: str, token_type: Optional[str] = None, **options: Any) -> Dict[str, Any]:
+    """
+    依 token header 的 kid 以對應金鑰驗證 token（支援輪替中的舊金鑰）
+    
+    Args:
+        token: JWT token 字串
+        token_type: 預期的 token 類型（access 或 refresh，None 表示不檢查）
+        **options: 傳給 jwt.decode 的其他參數（例如登出時以 options={"verify_exp": False} 接受已過期的 token）
+        
+    Returns:
+        已驗證的 payload
+        
+    Raises:
+        jwt.InvalidTokenError: kid 不存在、簽章無效、已過期或類型不符
+    """
+    payload = _get_keyring().verify(token, **options)
+    if token_type and payload.get("type") != token_type:
+        raise jwt.InvalidTokenError(f"token 類型不符: 預期 {token_type}")
+    return payload
+
+def _get_verified_token_cache() -> Optional[VerifiedTokenCache]:
+    """獲取已驗證 token 快取（延遲初始化，未啟用時返回 None）"""
+    global _verified_token_cache
+    if _verified_token_cache is None:
+        config = _get_jwt_config()
+        if config.verified_cache_enabled:
+            _verified_token_cache = VerifiedTokenCache(
+                max_size=config.verified_cache_max_size,
+                max_ttl=config.verified_cache_max_ttl,
+                clock=_now
+            )
+    return _verified_token_cache
+
+def _is_cached_token_revoked(token: str, payload: Dict[str, Any]) -> bool:
+    """快取命中時再次檢查黑名單與使用者撤銷水位（本地快取，通常不需呼叫 API）"""
+    blacklist_manager = _get_blacklist_manager()
+    return bool(blacklist_manager) and blacklist_manager.is_blacklisted(token, payload)
+
+def _invalidate_verified_token(token: str) -> None:
+    """從已驗證 token 快取移除指定 token（所有命名空間）"""
+    cache = _verified_token_cache
+    if cache is None:
+        return
+    cache.invalidate(token)
+    for namespace in _auth_cache_namespaces:
+        cache.invalidate((namespace, token))
+
+def verify_access_token_locally(token: str) -> Dict[str, Any]:
+    """
+    以金鑰集合驗證 access token 並檢查黑名單（verify_token_cached 與 cached_auth 的驗證函數）
+    
+    依 kid 選擇金鑰，輪替中的舊金鑰與非對稱演算法（ES256、EdDSA 等）簽發的 token 都能驗證。
+    
+    Args:
+        token: JWT token 字串
+        
+    Returns:
+        已驗證的 payload
+        
+    Raises:
+        jwt.InvalidTokenError: 簽章無效、已過期、類型不符或已被撤銷
+    """
+    payload = verify_with_keyring(token, "access")
+    if _is_cached_token_revoked(token, payload):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return payload
+
+def verify_token_cached(token: str,
+                        verifier: Optional[Callable[[str], Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    驗證 token 並快取結果（同一個 token 重複送達時不需重新驗證）
+    
+    快取項目在 token 的 exp 到期；命中時仍會檢查黑名單，撤銷立即生效。
+    
+    Args:
+        token: JWT token 字串
+        verifier: 未命中時的驗證函數，預設為 verify_access_token_locally
+                  （以金鑰集合驗證 access token 並檢查黑名單）
+        
+    Returns:
+        已驗證的 payload
+        
+    Raises:
+        jwt.InvalidTokenError: token 已被撤銷；其餘驗證失敗時拋出 verifier 的異常
+    """
+    verifier = verifier or verify_access_token_locally
+    cache = _get_verified_token_cache()
+    if cache is None:
+        return verifier(token)
+
+    payload = cache.get(token)
+    if payload is None:
+        return cache.verify_once(token, verifier)
+
+    if _is_cached_token_revoked(token, payload):
+        cache.invalidate(token)
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return payload
+
+def cached_auth(auth_decorator: Callable,
+                verifier: Optional[Callable[[str], Dict[str, Any]]] = None) -> Callable:
+    """
+    為 Flask 認證裝飾器（例如 token_required、admin_required）加上已驗證 token 快取
+    
+    第一次請求照常經過原裝飾器，並快取其傳給端點的 current_user；
+    之後同一個 token 的請求直接使用快取（命中時仍檢查黑名單）。
+    每個原裝飾器使用獨立的命名空間，不會讓一般 token 略過管理員檢查。
+    
+    提供 verifier 時，token 改由 verifier 驗證（例如 verify_access_token_locally，
+    依 kid 以金鑰集合驗證），其返回的 payload 即為 current_user；原裝飾器只用於
+    回應缺少 token 的請求。輪替簽章金鑰或使用非對稱演算法時，既有 token 仍可通過驗證。
+    
+    使用方式：
+        @app.route('/protected')
+        @cached_auth(token_required, verifier=verify_access_token_locally)
+        def protected(current_user): ...
+    
+    Args:
+        auth_decorator: 原認證裝飾器
+        verifier: 取代原裝飾器驗證 token 的函數（可選，驗證失敗時拋出 jwt.InvalidTokenError）
+        
+    Returns:
+        具快取的認證裝飾器
+    """
+    namespace = getattr(auth_decorator, "__qualname__", repr(auth_decorator))
+    if verifier is not None:
+        namespace = f"{namespace}:{getattr(verifier, '__qualname__', repr(verifier))}"
+    _auth_cache_namespaces.add(namespace)
+
+    def decorator(f):
+        protected_view = auth_decorator(f)
+
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            from flask import request, jsonify
+
+            auth_header = request.headers.get("Authorization", "")
+            token = auth_header[7:] if auth_header.startswith("Bearer ") else None
+            if not token:
+                return protected_view(*args, **kwargs)
+            cache = _get_verified_token_cache()
+            key: Hashable = (namespace, token)
+
+            def capture(current_user, *inner_args, **inner_kwargs):
+                if cache is not None:
+                    cache.put(key, current_user)
+                return f(current_user, *inner_args, **inner_kwargs)
+
+            def authenticate():
+                """未命中：經過 verifier 或原裝飾器驗證，並快取傳給端點的 current_user"""
+                if verifier is None:
+                    return auth_decorator(capture)(*args, **kwargs)
+                try:
+                    current_user = verifier(token)
+                except jwt.ExpiredSignatureError:
+                    return jsonify({"message": "Token has expired"}), 401
+                except jwt.InvalidTokenError as e:
+                    return jsonify({"message": str(e) or "Token is invalid"}), 401
+                return capture(current_user, *args, **kwargs)
+
+            if cache is None:
+                return authenticate()
+
+            current_user = cache.get(key)
+            leader = False
+            if current_user is None:
+                leader = cache.begin(key)
+                if not leader:
+                    current_user = cache.get(key)
+
+            if current_user is not None:
+                if _is_cached_token_revoked(token, current_user):
+                    cache.invalidate(key)
+                    return jsonify({"message": "Token has been revoked"}), 401
+                return f(current_user, *args, **kwargs)
+
+            try:
+                return authenticate()
+            finally:
+                if leader:
+                    cache.end(key)
+
+        return decorated
+
+    return decorator
+
+def get_verified_token_cache_stats() -> Dict[str, Any]:
+    """
+    取得已驗證 token 快取統計資訊
+    
+    Returns:
+        快取大小、命中率與 single-flight 統計，未啟用時返回空字典
+    """
+    cache = _get_verified_token_cache()
+    return cache.stats() if cache else {}
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     建立 JWT access token
@@ -60,23 +409,74 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     Returns:
         JWT token 字串
     """
-    to_encode = data.copy()
-    jwt_config = _get_jwt_config()
+    # 單次讀取時間，iat 與 exp 皆為整數時間戳
+    return _mint_access(_get_token_signer(), data, _now(), _access_ttl(expires_delta))
+
+def iter_access_tokens(claims_iter: Iterable[Dict[str, Any]],
+                       expires_delta: Optional[timedelta] = None) -> Iterator[str]:
+    """
+    以串流方式批次建立 access token（記憶體用量不隨輸入數量成長）
     
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=jwt_config.access_token_expires)
+    整批共用同一個簽章器與同一次時間讀取。
     
-    to_encode.update({
-        "exp": expire,
-        "type": "access",  # 標記為 Access Token
-        "iat": datetime.now(timezone.utc),  # 發行時間
-        "jti": str(uuid.uuid4())  # JWT ID，確保每個 token 唯一
-    })
-    encoded_jwt = jwt.encode(to_encode, jwt_config.secret_key, algorithm=jwt_config.algorithm)
+    Args:
+        claims_iter: 每個 token 要編碼的資料（可為任何可迭代物件）
+        expires_delta: 自定義過期時間
+        
+    Yields:
+        依輸入順序產生的 JWT token 字串
+    """
+    signer = _get_token_signer()
+    ttl = _access_ttl(expires_delta)
+    now = _now()
+    for data in claims_iter:
+        yield _mint_access(signer, data, now, ttl)
+
+def _init_mint_worker(config: JWTConfig) -> None:
+    """子程序初始化：設定與主程序相同的 JWT 配置（fork 時繼承的黑名單管理器已由 _reset_after_fork 捨棄）"""
+    set_jwt_config(config)
+
+def _mint_access_chunk(args: tuple) -> List[str]:
+    """子程序工作：以指定時間點簽發一段 access token"""
+    chunk, now, ttl = args
+    signer = _get_token_signer()
+    return [_mint_access(signer, data, now, ttl) for data in chunk]
+
+def create_access_tokens(list_of_claims: List[Dict[str, Any]],
+                         expires_delta: Optional[timedelta] = None,
+                         processes: Optional[int] = None,
+                         chunk_size: int = 1000) -> List[str]:
+    """
+    批次建立 access token（例如部署時為大量裝置或服務身分預先簽發）
     
-    return encoded_jwt
+    預設在目前程序內以同一個簽章器簽發；指定 processes 且數量超過
+    chunk_size 時，改以多個子程序分段簽發。
+    
+    Args:
+        list_of_claims: 每個 token 要編碼的資料
+        expires_delta: 自定義過期時間
+        processes: 子程序數量（None 或 1 表示不使用子程序）
+        chunk_size: 分派給子程序的每段數量
+        
+    Returns:
+        與 list_of_claims 順序一致的 JWT token 列表
+    """
+    if not processes or processes <= 1 or len(list_of_claims) <= chunk_size:
+        return list(iter_access_tokens(list_of_claims, expires_delta))
+
+    ttl = _access_ttl(expires_delta)
+    now = _now()
+    chunks = [
+        (list_of_claims[i:i + chunk_size], now, ttl)
+        for i in range(0, len(list_of_claims), chunk_size)
+    ]
+    tokens: List[str] = []
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=_init_mint_worker,
+                             initargs=(_get_jwt_config(),)) as executor:
+        for chunk_tokens in executor.map(_mint_access_chunk, chunks):
+            tokens.extend(chunk_tokens)
+    return tokens
 
 def create_refresh_token(data: Dict[str, Any]) -> str:
     """
@@ -88,52 +488,95 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
     Returns:
         JWT refresh token 字串
     """
-    to_encode = data.copy()
+    to_encode = dict(_profile_claims(data))
     jwt_config = _get_jwt_config()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=jwt_config.refresh_token_expires)
+    signer = _get_token_signer()
+    now = _now()
     
     to_encode.update({
-        "exp": expire,
+        "exp": now + jwt_config.refresh_token_expires * 60,
         "type": "refresh",  # 標記為 Refresh Token
-        "iat": datetime.now(timezone.utc),  # 發行時間
-        "jti": str(uuid.uuid4())  # JWT ID，確保每個 token 唯一
+        "iat": now,  # 發行時間
+        "jti": signer.new_jti()  # JWT ID，確保每個 token 唯一
     })
-    encoded_jwt = jwt.encode(to_encode, jwt_config.secret_key, algorithm=jwt_config.algorithm)
-    
-    return encoded_jwt
+    family = _new_family(signer)
+    if family:
+        to_encode["fam"] = family  # refresh 輪替的家族 ID
+    return signer.sign(to_encode)
+
+def _mint_pair(signer: TokenSigner,
+               data: Dict[str, Any],
+               now: int,
+               access_ttl: int,
+               refresh_ttl: int,
+               family: Optional[str] = None) -> Dict[str, str]:
+    """以同一份共用 claims 與同一個時間點簽發 access/refresh token 對"""
+    prefix = _shared_prefix(signer, data)
+    return {
+        "access_token": _sign_with_prefix(signer, prefix, now, access_ttl, "access"),
+        "refresh_token": _sign_with_prefix(signer, prefix, now, refresh_ttl, "refresh", family)
+    }
 
 def create_token_pair(data: Dict[str, Any]) -> Dict[str, str]:
     """
     建立 Access Token 和 Refresh Token 對
     
+    共用 claims 只序列化一次，兩個 token 的 iat/exp 取自同一次時間讀取。
+    
     Args:
         data: 要編碼到 token 中的資料
         
     Returns:
         包含 access_token 和 refresh_token 的字典
     """
-    access_token = create_access_token(data)
-    refresh_token = create_refresh_token(data)
+    jwt_config = _get_jwt_config()
+    signer = _get_token_signer()
+    return _mint_pair(signer, data, _now(),
+                      jwt_config.access_token_expires * 60,
+                      jwt_config.refresh_token_expires * 60,
+                      _new_family(signer))
+
+def create_token_pairs(data_list: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    批次為多個主體建立 token 對（例如大量佈建 session）
     
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token
-    }
+    整批共用同一個簽章器與同一次時間讀取。
+    
+    Args:
+        data_list: 每個主體要編碼到 token 中的資料
+        
+    Returns:
+        與 data_list 順序一致的 token 對列表
+    """
+    jwt_config = _get_jwt_config()
+    signer = _get_token_signer()
+    now = _now()
+    access_ttl = jwt_config.access_token_expires * 60
+    refresh_ttl = jwt_config.refresh_token_expires * 60
+    return [_mint_pair(signer, data, now, access_ttl, refresh_ttl, _new_family(signer)) for data in data_list]
 
 def refresh_access_token(refresh_token: str) -> Optional[str]:
     """
     使用 Refresh Token 取得新的 Access Token
     
+    啟用 jwt.refresh_rotation 時改走 rotate_refresh_token，refresh token 會被消耗；
+    需要取得新 refresh token 的呼叫端請使用 exchange_refresh_token 或 rotate_refresh_token。
+    
     Args:
         refresh_token: JWT refresh token 字串
         
     Returns:
         新的 JWT access token，如果無法重新整理則返回 None
     """
+    if _get_jwt_config().refresh_rotation_enabled:
+        tokens = rotate_refresh_token(refresh_token)
+        return tokens["access_token"] if tokens else None
+    
     try:
-        # 使用套件提供的驗證功能
-        from jwt_auth_middleware import verify_refresh_token
-        payload = verify_refresh_token(refresh_token)
+        # 以金鑰集合驗證（支援輪替中的舊金鑰與非對稱演算法），並檢查黑名單
+        payload = verify_with_keyring(refresh_token, "refresh")
+        if _is_cached_token_revoked(refresh_token, payload):
+            raise jwt.InvalidTokenError("Token has been revoked")
         
         # 建立新的 access token（不包含 type 和 jti）
         token_data = {k: v for k, v in payload.items() 
@@ -145,13 +588,89 @@ def refresh_access_token(refresh_token: str) -> Optional[str]:
         print(f"無法重新整理 token: {str(e)}")
         return None
 
-def revoke_token(token: str, reason: str = "revoked") -> bool:
+def rotate_refresh_token(refresh_token: str) -> Optional[Dict[str, str]]:
+    """
+    以 refresh token 換發新的 token 對，並消耗舊的 refresh token（需啟用 jwt.refresh_rotation）
+    
+    新的 refresh token 沿用舊 token 的家族 ID。已消耗的 refresh token 再次出現
+    代表 token 可能外洩，此時以一次寫入撤銷整個家族，合法使用者與攻擊者
+    手上的 refresh token 同時失效。
+    
+    換發路徑最多只有一次黑名單查詢往返，消耗紀錄由背景佇列批次寫入
+    （其他實例最多延遲一個 flush_interval 才能看到消耗紀錄）。
+    
+    Args:
+        refresh_token: JWT refresh token 字串
+        
+    Returns:
+        包含 access_token 和 refresh_token 的字典，無法換發時返回 None
+    """
+    try:
+        jwt_config = _get_jwt_config()
+        if not jwt_config.refresh_rotation_enabled:
+            print("警告：refresh token 輪替未啟用")
+            return None
+        
+        payload = verify_with_keyring(refresh_token, "refresh")
+        family = payload.get("fam")
+        if not family:
+            # 啟用輪替前簽發的 token：開始一個新家族
+            family = _new_family(_get_token_signer())
+        
+        blacklist_manager = _get_blacklist_manager()
+        if blacklist_manager:
+            status = blacklist_manager.check_refresh_token(refresh_token, payload)
+            if status == "ok" and not blacklist_manager.consume_refresh_token(refresh_token, payload):
+                status = "reused"  # 同一程序內的並行請求已先消耗
+            if status == "reused" and payload.get("fam"):
+                print(f"偵測到 refresh token 重複使用，撤銷家族: {family}")
+                blacklist_manager.revoke_refresh_family(family)
+            if status != "ok":
+                return None
+        else:
+            print("警告：黑名單功能未啟用，無法偵測 refresh token 重複使用")
+        
+        token_data = expand_claims({k: v for k, v in payload.items() if k not in _PER_TOKEN_CLAIMS})
+        signer = _get_token_signer()
+        return _mint_pair(signer, token_data, _now(),
+                          jwt_config.access_token_expires * 60,
+                          jwt_config.refresh_token_expires * 60,
+                          family)
+        
+    except Exception as e:
+        print(f"無法換發 refresh token: {str(e)}")
+        return None
+
+def exchange_refresh_token(refresh_token: str) -> Optional[Dict[str, str]]:
+    """
+    以 refresh token 換發 token（POST /refresh 使用）
+    
+    啟用 jwt.refresh_rotation 時以 rotate_refresh_token 換發新的 token 對並消耗舊 refresh token；
+    未啟用時只換發新的 access token。
+    
+    Args:
+        refresh_token: JWT refresh token 字串
+        
+    Returns:
+        包含 access_token（輪替時另含 refresh_token）的字典，無法換發時返回 None
+    """
+    if _get_jwt_config().refresh_rotation_enabled:
+        return rotate_refresh_token(refresh_token)
+    access_token = refresh_access_token(refresh_token)
+    return {"access_token": access_token} if access_token else None
+
+def revoke_token(token: str,
+                 reason: str = "revoked",
+                 all_sessions: bool = False,
+                 payload: Optional[Dict[str, Any]] = None) -> bool:
     """
     撤銷 JWT token（加入黑名單）
     
     Args:
         token: 要撤銷的 JWT token
         reason: 撤銷原因
+        all_sessions: 是否同時撤銷該使用者在此之前簽發的所有 token（寫入撤銷水位）
+        payload: 呼叫端已驗證的 payload（可選，避免重複解碼）
         
     Returns:
         是否成功撤銷
@@ -159,7 +678,14 @@ def revoke_token(token: str, reason: str = "revoked") -> bool:
     try:
         blacklist_manager = _get_blacklist_manager()
         if blacklist_manager:
-            return blacklist_manager.add_to_blacklist(token, reason)
+            if payload is None:
+                payload = blacklist_manager._get_unverified_payload(token)
+            revoked = blacklist_manager.add_to_blacklist(token, reason, payload=payload)
+            _invalidate_verified_token(token)
+            if all_sessions:
+                user_id = expand_claims(payload).get("user_id")
+                revoked = bool(user_id) and revoke_user_tokens(user_id) and revoked
+            return revoked
         else:
             print("警告：黑名單功能未啟用，無法撤銷 token")
             return False
@@ -167,6 +693,66 @@ def revoke_token(token: str, reason: str = "revoked") -> bool:
         print(f"撤銷 token 時發生錯誤: {str(e)}")
         return False
 
+def revoke_user_tokens(user_id: str, not_before: Optional[int] = None) -> bool:
+    """
+    撤銷使用者在指定時間之前簽發的所有 token（寫入使用者撤銷水位）
+    
+    Args:
+        user_id: 使用者 ID
+        not_before: 水位（epoch 秒），預設為目前時間
+        
+    Returns:
+        是否成功寫入水位
+    """
+    try:
+        blacklist_manager = _get_blacklist_manager()
+        if blacklist_manager and blacklist_manager.user_epochs is not None:
+            return blacklist_manager.user_epochs.set_not_before(user_id, not_before)
+        print("警告：使用者撤銷水位未啟用，無法撤銷使用者 token")
+    except Exception as e:
+        print(f"撤銷使用者 token 時發生錯誤: {str(e)}")
+    return False
+
+def record_user_revocation_epoch(user_id: str, not_before: int) -> bool:
+    """
+    寫入使用者撤銷水位（停用帳號、變更密碼等使用者更新後呼叫）
+    
+    水位經由黑名單使用的同一個 API 寫入，並立即在本程序生效；
+    使用者撤銷水位未啟用時不做任何事。
+    
+    Args:
+        user_id: 使用者 ID
+        not_before: 水位（epoch 秒）
+        
+    Returns:
+        是否成功寫入（未啟用時返回 False）
+    """
+    try:
+        blacklist_manager = _get_blacklist_manager()
+        if blacklist_manager and blacklist_manager.user_epochs is not None:
+            return blacklist_manager.user_epochs.set_not_before(user_id, not_before)
+    except Exception as e:
+        print(f"寫入使用者撤銷水位時發生錯誤: {str(e)}")
+    return False
+
+def is_token_revoked_for_user(payload: Dict[str, Any]) -> bool:
+    """
+    檢查已驗證的 token 是否早於其使用者的撤銷水位
+    
+    Args:
+        payload: 已解碼的 token payload
+        
+    Returns:
+        是否已被撤銷
+    """
+    try:
+        blacklist_manager = _get_blacklist_manager()
+        if blacklist_manager and blacklist_manager.user_epochs is not None:
+            return blacklist_manager.user_epochs.is_revoked(payload)
+    except Exception as e:
+        print(f"檢查使用者撤銷水位時發生錯誤: {str(e)}")
+    return False
+
 def revoke_token_pair(access_token: str, refresh_token: str, reason: str = "user_logout") -> bool:
     """
     撤銷 token 對（access token 和 refresh token）
@@ -182,12 +768,13 @@ def revoke_token_pair(access_token: str, refresh_token: str, reason: str = "user
     try:
         blacklist_manager = _get_blacklist_manager()
         if blacklist_manager:
-            # 撤銷 access token
-            access_revoked = blacklist_manager.add_to_blacklist(access_token, f"{reason}_access")
-            # 撤銷 refresh token
-            refresh_revoked = blacklist_manager.add_to_blacklist(refresh_token, f"{reason}_refresh")
-            
-            return access_revoked and refresh_revoked
+            # 以一次批次寫入同時撤銷 access token 與 refresh token
+            results = blacklist_manager.add_many(
+                [access_token, refresh_token],
+                [f"{reason}_access", f"{reason}_refresh"]
+            )
+            _invalidate_verified_token(access_token)
+            return all(item["success"] for item in results)
         else:
             print("警告：黑名單功能未啟用，無法撤銷 token")
             return False
@@ -195,6 +782,31 @@ def revoke_token_pair(access_token: str, refresh_token: str, reason: str = "user
         print(f"撤銷 token 對時發生錯誤: {str(e)}")
         return False
 
+def revoke_tokens(tokens: List[str], reason: str = "revoked") -> List[Dict[str, Any]]:
+    """
+    批次撤銷多個 JWT token（例如「登出所有裝置」或金鑰外洩事件）
+    
+    Args:
+        tokens: 要撤銷的 JWT token 列表
+        reason: 撤銷原因
+        
+    Returns:
+        與 tokens 順序一致的結果列表，每筆包含 index、key（黑名單鍵）、success 與 message
+    """
+    try:
+        blacklist_manager = _get_blacklist_manager()
+        if blacklist_manager:
+            results = blacklist_manager.add_many(tokens, reason)
+            for token in tokens:
+                _invalidate_verified_token(token)
+            return results
+        else:
+            print("警告：黑名單功能未啟用，無法撤銷 token")
+    except Exception as e:
+        print(f"批次撤銷 token 時發生錯誤: {str(e)}")
+    return [{"index": index, "key": None, "success": False, "message": "撤銷失敗"}
+            for index in range(len(tokens))]
+
 def get_token_expiration(token: str) -> Optional[datetime]:
     """
     取得 token 的過期時間
@@ -206,9 +818,8 @@ def get_token_expiration(token: str) -> Optional[datetime]:
         過期時間，如果無法解析則返回 None
     """
     try:
-        # 使用套件提供的驗證功能
-        from jwt_auth_middleware import verify_token
-        payload = verify_token(token)
+        # 以金鑰集合驗證（支援輪替中的舊金鑰與非對稱演算法）
+        payload = verify_with_keyring(token)
         exp_timestamp = payload.get("exp")
         if exp_timestamp:
             return datetime.fromtimestamp(exp_timestamp)
@@ -227,12 +838,11 @@ def is_token_expired(token: str) -> bool:
         是否已過期
     """
     try:
-        # 使用套件提供的驗證功能
-        from jwt_auth_middleware import verify_token
-        payload = verify_token(token)
+        # 以金鑰集合驗證（支援輪替中的舊金鑰與非對稱演算法）
+        payload = verify_with_keyring(token)
         exp_timestamp = payload.get("exp")
         if exp_timestamp:
-            return datetime.fromtimestamp(exp_timestamp) < datetime.now(timezone.utc)
+            return int(exp_timestamp) < _now()
     except Exception:
         pass
     return True
@@ -322,4 +932,18 @@ def initialize_blacklist_system(collection_name: str = None) -> bool:
             return False
     except Exception as e:
         print(f"初始化黑名單系統時發生錯誤: {str(e)}")
-        return False 
\ No newline at end of file
+        return False
+
+def shutdown_blacklist_system() -> None:
+    """
+    關閉黑名單系統：寫出 write-behind 佇列中待處理的撤銷紀錄並停止背景執行緒
+    
+    應在 worker 結束時呼叫（例如 gunicorn 的 worker_exit hook）。
+    """
+    global _blacklist_manager
+    try:
+        if _blacklist_manager is not None:
+            _blacklist_manager.close()
+            _blacklist_manager = None
+    except Exception as e:
+        print(f"關閉黑名單系統時發生錯誤: {str(e)}")
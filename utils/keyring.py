@@ -0,0 +1,121 @@
+"""
+Verification Key Ring
+
+以 kid 索引的驗證金鑰集合：目前簽章金鑰加上 jwt.verification_keys 中
+僅驗證用的舊金鑰。金鑰在建立時解析一次，驗證時以 header 的 kid 做 O(1) 查詢，
+輪替簽章金鑰時既有 token 在過期前仍可驗證。
+
+未帶 kid 的 token（啟用 kid 前簽發）以 jwt.legacy_kid 指定的舊金鑰驗證；
+未設定 legacy_kid 時依序嘗試目前簽章金鑰與所有驗證金鑰。
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+from .jwt_config import JWTConfig
+from .token_signer import TokenSigner
+
+
+class KeyRing:
+    """以 kid 查詢的驗證金鑰集合與公開的 JWK Set"""
+
+    def __init__(self, jwt_config: JWTConfig, signer: TokenSigner):
+        """
+        初始化金鑰集合
+
+        Args:
+            jwt_config: JWT 配置實例
+            signer: 目前的簽章器（提供簽章金鑰對應的驗證金鑰）
+
+        Raises:
+            ValueError: 驗證金鑰的演算法不受支援或金鑰無法解析
+        """
+        algorithms = get_default_algorithms()
+
+        self.active_kid = signer.kid
+        active_key = signer.verification_key if signer.verification_key is not None else jwt_config.secret_key
+        self._keys: Dict[Optional[str], Tuple[str, Any]] = {
+            self.active_kid: (signer.algorithm, active_key)
+        }
+        active_jwk = signer.public_jwk()
+        jwks = [active_jwk] if active_jwk else []
+
+        for entry in jwt_config.verification_keys:
+            algorithm_impl = algorithms.get(entry["algorithm"])
+            if algorithm_impl is None:
+                raise ValueError(f"不支援的 JWT 演算法: {entry['algorithm']}（非對稱演算法需要安裝 cryptography 套件）")
+            try:
+                key = algorithm_impl.prepare_key(entry["key"])
+            except Exception as e:
+                raise ValueError(f"無法解析驗證金鑰 {entry['kid']}: {e}")
+            self._keys[entry["kid"]] = (entry["algorithm"], key)
+
+            # HS* 共享密鑰不公開
+            if not entry["algorithm"].startswith("HS"):
+                jwk = json.loads(algorithm_impl.to_jwk(key))
+                jwk.update({"kid": entry["kid"], "alg": entry["algorithm"], "use": "sig"})
+                jwks.append(jwk)
+
+        # 未帶 kid 的 token 可使用的金鑰（依序嘗試）
+        legacy_kid = getattr(jwt_config, "legacy_kid", None)
+        if legacy_kid is not None:
+            if legacy_kid not in self._keys:
+                raise ValueError(f"jwt.legacy_kid 不在驗證金鑰中: {legacy_kid}")
+            self._kidless: List[Tuple[str, Any]] = [self._keys[legacy_kid]]
+        else:
+            self._kidless = list(self._keys.values())
+
+        self.jwks = {"keys": jwks}
+        # 預先序列化，JWKS 端點直接回傳
+        self.jwks_json = json.dumps(self.jwks, separators=(",", ":"), sort_keys=True)
+        self.jwks_etag = '"' + hashlib.sha256(self.jwks_json.encode()).hexdigest()[:32] + '"'
+
+    def get(self, kid: Optional[str]) -> Optional[Tuple[str, Any]]:
+        """
+        以 kid 查詢驗證金鑰
+
+        Args:
+            kid: token header 中的 kid（None 表示未帶 kid，返回第一個候選金鑰）
+
+        Returns:
+            (演算法, 金鑰物件)，找不到時返回 None
+        """
+        if kid is None:
+            return self._kidless[0]
+        return self._keys.get(kid)
+
+    def verify(self, token: str, **options: Any) -> Dict[str, Any]:
+        """
+        依 token header 的 kid 選擇金鑰並驗證 token
+
+        只接受該金鑰設定的演算法，避免演算法混用攻擊。未帶 kid 時依序嘗試候選金鑰，
+        只有簽章或演算法不符才會改用下一把金鑰（過期等錯誤直接拋出）。
+
+        Args:
+            token: JWT token 字串
+            **options: 傳給 jwt.decode 的其他參數
+
+        Returns:
+            已驗證的 payload
+
+        Raises:
+            jwt.InvalidTokenError: kid 不存在、簽章無效或 token 已過期
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            error: Optional[jwt.InvalidTokenError] = None
+            for algorithm, key in self._kidless:
+                try:
+                    return jwt.decode(token, key, algorithms=[algorithm], **options)
+                except (jwt.InvalidSignatureError, jwt.InvalidAlgorithmError) as e:
+                    error = e
+            raise error
+        entry = self._keys.get(kid)
+        if entry is None:
+            raise jwt.InvalidTokenError(f"未知的金鑰 ID: {kid}")
+        algorithm, key = entry
+        return jwt.decode(token, key, algorithms=[algorithm], **options)
@@ -0,0 +1,120 @@
+"""
+Per-user Revocation Epoch
+
+每位使用者保存一個 not_before 水位（users 集合的 tokens_not_before 欄位），
+iat 早於水位的 token 一律視為已撤銷。一次寫入即可撤銷該使用者的所有 session，
+不需逐一將 token 加入黑名單。
+
+水位的讀寫由呼叫端提供（BlacklistManager 經由黑名單使用的同一個 session 與 API），
+撤銷寫入的位置與驗證時讀取的位置一致。
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .cache import LRUTTLCache, MISSING
+
+# users 集合中保存水位的欄位名稱
+EPOCH_FIELD = "tokens_not_before"
+# 保存水位的集合
+USERS_COLLECTION = "users"
+
+
+class UserRevocationEpochs:
+    """以程序內快取加速的使用者撤銷水位查詢"""
+
+    def __init__(self,
+                 loader: Callable[[str], Optional[int]],
+                 writer: Callable[[str, int], bool],
+                 cache_ttl: float = 60,
+                 max_size: int = 10000,
+                 clock: Callable[[], float] = time.time):
+        """
+        初始化撤銷水位儲存
+
+        Args:
+            loader: 讀取使用者水位的函數（返回 epoch 秒，查詢失敗時返回 None）
+            writer: 寫入使用者水位的函數（返回是否成功）
+            cache_ttl: 水位在本地快取的秒數（其他實例的撤銷最多延遲此時間生效）
+            max_size: 最多快取的使用者數量
+            clock: 取得目前時間（epoch 秒）的函數
+        """
+        self._loader = loader
+        self._writer = writer
+        self._clock = clock
+        self._cache = LRUTTLCache(max_size=max_size, default_ttl=cache_ttl, clock=clock)
+
+    def get_not_before(self, user_id: str) -> int:
+        """
+        取得使用者的撤銷水位
+
+        Args:
+            user_id: 使用者 ID
+
+        Returns:
+            水位（epoch 秒），未設定或查詢失敗時返回 0
+        """
+        cached = self._cache.get(user_id)
+        if cached is not MISSING:
+            return cached
+
+        try:
+            not_before = self._loader(user_id)
+        except Exception as e:
+            print(f"查詢使用者撤銷水位時發生錯誤: {str(e)}")
+            not_before = None
+        if not_before is None:
+            # 查詢失敗不寫入快取，下次再試
+            return 0
+
+        self._cache.set(user_id, not_before)
+        return not_before
+
+    def remember(self, user_id: str, not_before: int) -> None:
+        """
+        更新本地快取中的水位（水位已由呼叫端寫入資料庫時使用）
+
+        Args:
+            user_id: 使用者 ID
+            not_before: 水位（epoch 秒）
+        """
+        self._cache.set(user_id, int(not_before))
+
+    def set_not_before(self, user_id: str, not_before: Optional[int] = None) -> bool:
+        """
+        寫入使用者的撤銷水位
+
+        Args:
+            user_id: 使用者 ID
+            not_before: 水位（epoch 秒），預設為目前時間
+
+        Returns:
+            是否寫入成功
+        """
+        not_before = int(self._clock()) if not_before is None else int(not_before)
+        if not self._writer(user_id, not_before):
+            return False
+        self.remember(user_id, not_before)
+        return True
+
+    def is_revoked(self, payload: Dict[str, Any], fetch: bool = True) -> bool:
+        """
+        檢查 token 是否早於其使用者的撤銷水位
+
+        Args:
+            payload: 已解碼的 token payload（需包含 user_id 或 compact 的 uid，以及 iat）
+            fetch: 快取未命中時是否查詢水位（False 時只使用本地快取，不產生往返）
+
+        Returns:
+            是否已被撤銷
+        """
+        user_id = payload.get("user_id") or payload.get("uid")
+        iat = payload.get("iat")
+        if not user_id or iat is None:
+            return False
+        not_before = self.get_not_before(user_id) if fetch else self._cache.get(user_id, 0)
+        return int(iat) < not_before
+
+    def stats(self) -> Dict[str, Any]:
+        """取得水位快取統計資訊"""
+        return self._cache.stats()
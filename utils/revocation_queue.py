@@ -0,0 +1,236 @@
+"""
+Write-behind Revocation Queue
+
+有界的程序內撤銷佇列：撤銷請求先進入佇列後立即返回，
+由背景執行緒將多筆黑名單文件合併為一次批次寫入。
+
+批次寫入失敗時以指數退避重試；重試用盡後，背景寫入會將文件放回佇列等待下一輪，
+只有佇列已滿或正在關閉時才會遺失，遺失的撤銷紀錄會計數並以 ERROR 記錄。
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationQueue:
+    """以背景執行緒批次寫入黑名單文件的 write-behind 佇列"""
+
+    def __init__(self,
+                 writer: Callable[[List[Dict[str, Any]]], bool],
+                 max_queue_size: int = 10000,
+                 batch_size: int = 100,
+                 flush_interval: float = 0.5,
+                 max_retries: int = 2,
+                 backoff_base: float = 0.1,
+                 backoff_max: float = 2.0):
+        """
+        初始化撤銷佇列
+
+        Args:
+            writer: 批次寫入函數，接收文件列表並返回是否成功
+            max_queue_size: 佇列最大長度，滿時 enqueue 返回 False 由呼叫端改走同步路徑
+            batch_size: 單次批次寫入的最大文件數
+            flush_interval: 等待湊滿批次的最長秒數
+            max_retries: 批次寫入失敗時的重試次數
+            backoff_base: 重試退避基準秒數（第 n 次重試前等待 backoff_base * 2^(n-1) 秒）
+            backoff_max: 單次退避的最長秒數（背景寫入放回佇列後也等待此時間再重試）
+        """
+        self._writer = writer
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        # fork 出的子程序會複製佇列內容，但只有建立佇列的程序負責寫出
+        self._owner_pid = os.getpid()
+
+        # 統計計數器
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.requeued = 0
+        self.rejected = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.max_wait_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="blacklist-write-behind", daemon=True)
+        self._thread.start()
+
+    @property
+    def max_write_delay(self) -> float:
+        """
+        文件從進入佇列到寫入成功的最長延遲秒數（不含寫入本身的逾時）
+
+        等待湊滿批次，加上每次重試與放回佇列後的退避。
+        """
+        return self.flush_interval + (self.max_retries + 1) * self.backoff_max
+
+    def enqueue(self, document: Dict[str, Any]) -> bool:
+        """
+        將黑名單文件放入佇列
+
+        Args:
+            document: 黑名單文件
+
+        Returns:
+            是否成功放入（佇列已滿或已關閉時返回 False）
+        """
+        if self._stop.is_set():
+            return False
+        try:
+            self._queue.put_nowait((time.monotonic(), document))
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _take_batch(self, timeout: float) -> List[tuple]:
+        """從佇列取出一個批次（最多等待 timeout 秒取得第一筆）"""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _requeue(self, batch: List[tuple]) -> int:
+        """將寫入失敗的項目放回佇列（保留原本的排入時間），返回放不下的筆數"""
+        lost = 0
+        for item in batch:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                lost += 1
+        self.requeued += len(batch) - lost
+        return lost
+
+    def _write_batch(self, batch: List[tuple], requeue: bool = False) -> bool:
+        """
+        寫入一個批次並更新統計
+
+        Args:
+            batch: (排入時間, 文件) 列表
+            requeue: 重試用盡時是否將文件放回佇列（背景寫入使用；關閉時的 flush 不放回）
+
+        Returns:
+            是否寫入成功
+        """
+        documents = [document for _, document in batch]
+        started = time.monotonic()
+
+        success = False
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+            try:
+                success = self._writer(documents)
+            except Exception as e:
+                print(f"批次寫入黑名單時發生錯誤: {str(e)}")
+                success = False
+            if success:
+                break
+
+        finished = time.monotonic()
+        self.batches += 1
+        self.last_flush_ms = (finished - started) * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self.max_wait_ms = max(self.max_wait_ms, (finished - batch[0][0]) * 1000)
+
+        if success:
+            self.written += len(documents)
+            return True
+
+        self.failed_batches += 1
+        lost = self._requeue(batch) if requeue and not self._stop.is_set() else len(batch)
+        if lost:
+            self.dropped += lost
+            logger.error("批次寫入黑名單失敗，遺失 %d 筆撤銷紀錄（累計 %d 筆）", lost, self.dropped)
+        else:
+            print(f"批次寫入黑名單失敗，{len(documents)} 筆撤銷紀錄已放回佇列")
+        return False
+
+    def _run(self) -> None:
+        """背景執行緒主迴圈"""
+        while not self._stop.is_set():
+            batch = self._take_batch(self.flush_interval)
+            if batch:
+                with self._flush_lock:
+                    written = self._write_batch(batch, requeue=True)
+                if not written:
+                    # 後端暫時無法寫入，等待後再處理放回佇列的文件
+                    self._stop.wait(self.backoff_max)
+
+    def flush(self) -> int:
+        """
+        同步寫出佇列中所有待處理的文件
+
+        Returns:
+            本次寫出的批次數
+        """
+        flushed = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch(0)
+                if not batch:
+                    break
+                self._write_batch(batch)
+                flushed += 1
+        return flushed
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        停止背景執行緒並寫出剩餘文件
+
+        在 fork 出的子程序中呼叫時只停止佇列、不寫出：複製來的文件由父程序寫出，
+        子程序再寫一次會重複寫入（背景執行緒也不存在於子程序，寫入鎖可能停留在被持有的狀態）。
+
+        Args:
+            timeout: 等待背景執行緒結束的秒數
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if os.getpid() != self._owner_pid:
+            return
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得佇列統計資訊
+
+        Returns:
+            佇列深度、寫入數量與刷新延遲等資訊
+        """
+        return {
+            "depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "requeued": self.requeued,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "max_wait_ms": round(self.max_wait_ms, 2)
+        }
@@ -0,0 +1,185 @@
+"""
+Precomputed Token Signer
+
+由 JWTConfig 建立一次、可重複使用的簽章器：預先準備 HMAC 金鑰狀態與
+JSON header 區段，熱路徑上只需一次 payload 序列化與一次 HMAC。
+非對稱演算法（RS*/ES*/EdDSA）的 PEM 金鑰也只在建立時解析一次。
+產生的 token 與 PyJWT 的 jwt.encode 完全相容。
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+from .jwt_config import JWTConfig
+from .jti_generator import JTIGenerator
+
+# HMAC 演算法對應的雜湊函數
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+# 時間類 claim：datetime 需轉為整數時間戳（與 PyJWT 行為一致）
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+def _numeric_time_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """將 datetime 型別的時間類 claim 轉為整數時間戳（與 jwt.encode 相同，naive 時間視為 UTC）"""
+    for claim in _TIME_CLAIMS:
+        value = claims.get(claim)
+        if isinstance(value, datetime):
+            claims[claim] = int(value.replace(tzinfo=value.tzinfo or timezone.utc).timestamp())
+    return claims
+
+
+def b64url_encode(data: bytes) -> str:
+    """base64url 編碼（去除補位）"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class TokenSigner:
+    """預先準備金鑰與 header 的 JWT 簽章器"""
+
+    def __init__(self, jwt_config: JWTConfig):
+        """
+        初始化簽章器
+
+        Args:
+            jwt_config: JWT 配置實例
+
+        Raises:
+            ValueError: 演算法不受支援（例如未安裝 cryptography）或金鑰無法解析
+        """
+        self.algorithm = jwt_config.algorithm
+        self._secret_key = jwt_config.secret_key
+
+        self.kid = jwt_config.kid
+        header = {"alg": self.algorithm, "typ": "JWT"}
+        if self.kid:
+            header["kid"] = self.kid
+        self._header_segment = b64url_encode(
+            json.dumps(header, separators=(",", ":"), sort_keys=True).encode()
+        ) + "."
+
+        # HMAC 演算法：預先以金鑰初始化，每次簽章只需 copy() 已準備好的狀態
+        digest = _HMAC_DIGESTS.get(self.algorithm)
+        self._mac = hmac.new(self._secret_key.encode(), digestmod=digest) if digest else None
+
+        # 非對稱演算法：預先解析 PEM 為金鑰物件
+        self._algorithm_impl = None
+        self._signing_key = None
+        self.verification_key = None
+        if self._mac is None:
+            self._algorithm_impl = get_default_algorithms().get(self.algorithm)
+            if self._algorithm_impl is None:
+                raise ValueError(f"不支援的 JWT 演算法: {self.algorithm}（非對稱演算法需要安裝 cryptography 套件）")
+            try:
+                self._signing_key = self._algorithm_impl.prepare_key(jwt_config.signing_key)
+                if jwt_config.public_key:
+                    self.verification_key = self._algorithm_impl.prepare_key(jwt_config.public_key)
+                else:
+                    self.verification_key = self._signing_key.public_key()
+            except Exception as e:
+                raise ValueError(f"無法解析 {self.algorithm} 金鑰: {e}")
+
+        # 依配置產生 jti（compact 模式批次取得隨機 bytes）
+        self.new_jti = JTIGenerator(jwt_config.jti_mode)
+
+    def sign_json(self, payload_json: str) -> str:
+        """
+        以已序列化的 payload JSON 簽發 token
+
+        Args:
+            payload_json: compact JSON 格式的 payload
+
+        Returns:
+            JWT token 字串
+        """
+        signing_input = self._header_segment + b64url_encode(payload_json.encode())
+        if self._mac is None:
+            signature = self._algorithm_impl.sign(signing_input.encode("ascii"), self._signing_key)
+        else:
+            mac = self._mac.copy()
+            mac.update(signing_input.encode("ascii"))
+            signature = mac.digest()
+        return signing_input + "." + b64url_encode(signature)
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        """
+        簽發 token
+
+        Args:
+            claims: token claims（時間類 claim 應為整數時間戳）
+
+        Returns:
+            JWT token 字串
+        """
+        return self.sign_json(json.dumps(_numeric_time_claims(claims), separators=(",", ":")))
+
+    def prepare_claims(self, shared_claims: Dict[str, Any]) -> str:
+        """
+        預先序列化多個 token 共用的 claims
+
+        Args:
+            shared_claims: 共用 claims（不可包含之後 sign_prepared 傳入的鍵；datetime 的 nbf 等會轉為時間戳）
+
+        Returns:
+            不含結尾大括號的 JSON 前綴，供 sign_prepared 使用
+        """
+        if any(isinstance(shared_claims.get(claim), datetime) for claim in _TIME_CLAIMS):
+            shared_claims = _numeric_time_claims(dict(shared_claims))
+        prefix = json.dumps(shared_claims, separators=(",", ":"))[:-1]
+        return prefix if len(prefix) == 1 else prefix + ","
+
+    def sign_prepared(self, prefix: str, claims: Dict[str, Any]) -> str:
+        """
+        以預先序列化的共用 claims 加上個別 claims 簽發 token
+
+        Args:
+            prefix: prepare_claims 的回傳值
+            claims: 此 token 專屬的 claims（時間類 claim 應為整數時間戳）
+
+        Returns:
+            JWT token 字串
+        """
+        return self.sign_json(prefix + json.dumps(claims, separators=(",", ":"))[1:])
+
+    def verify(self, token: str, **options: Any) -> Dict[str, Any]:
+        """
+        以本地金鑰驗證 token（非對稱演算法只需公鑰）
+
+        Args:
+            token: JWT token 字串
+            **options: 傳給 jwt.decode 的其他參數（例如 options、leeway）
+
+        Returns:
+            已驗證的 payload
+
+        Raises:
+            jwt.InvalidTokenError: 簽章無效或 token 已過期
+        """
+        key = self.verification_key if self._mac is None else self._secret_key
+        return jwt.decode(token, key, algorithms=[self.algorithm], **options)
+
+    def public_jwk(self) -> Optional[Dict[str, Any]]:
+        """
+        取得驗證用公鑰的 JWK（HS* 共享密鑰不公開，返回 None）
+
+        Returns:
+            JWK 字典
+        """
+        if self._mac is not None:
+            return None
+        jwk = json.loads(self._algorithm_impl.to_jwk(self.verification_key))
+        jwk.update({"alg": self.algorithm, "use": "sig"})
+        if self.kid:
+            jwk["kid"] = self.kid
+        return jwk
@@ -0,0 +1,201 @@
+"""
+Verified Token Cache
+
+token -> 已驗證 payload 的有界快取：同一個 token 在有效期間內重複送達時
+不需再做 base64 解碼、JSON 解析與簽章驗證。
+
+- 項目在 token 的 exp（或 max_ttl，取較早者）到期
+- single-flight：同一個 token 的並行請求只驗證一次，其餘等待結果
+- 撤銷時由呼叫端 invalidate，命中時呼叫端仍應檢查黑名單（跨實例撤銷）
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .cache import LRUTTLCache, MISSING
+
+
+class VerifiedTokenCache:
+    """具 single-flight 保護的已驗證 token 快取"""
+
+    def __init__(self,
+                 max_size: int = 10000,
+                 max_ttl: Optional[float] = 300,
+                 wait_timeout: float = 5.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        初始化已驗證 token 快取
+
+        Args:
+            max_size: 最多快取的 token 數量
+            max_ttl: 項目最長存活秒數（限制附加資料如角色的過時時間，None 表示只依 exp）
+            wait_timeout: 並行請求等待第一個驗證結果的最長秒數
+            clock: 取得目前時間（epoch 秒）的函數
+        """
+        self.max_ttl = max_ttl
+        self.wait_timeout = wait_timeout
+        self._clock = clock
+        self._cache = LRUTTLCache(max_size=max_size, clock=clock)
+
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+
+        # 統計計數器
+        self.verifications = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        取得已驗證的 payload
+
+        Args:
+            key: 快取鍵（token，或 (命名空間, token)）
+
+        Returns:
+            payload 的淺拷貝，未命中時返回 None
+        """
+        payload = self._cache.get(key)
+        if payload is MISSING:
+            return None
+        return dict(payload)
+
+    def put(self, key: Hashable, payload: Dict[str, Any]) -> None:
+        """
+        寫入已驗證的 payload，並喚醒等待中的並行請求
+
+        Args:
+            key: 快取鍵
+            payload: 已驗證的 payload（需包含 exp，否則只依 max_ttl）
+        """
+        expires_at = payload.get("exp")
+        if self.max_ttl is not None:
+            ttl_deadline = self._clock() + self.max_ttl
+            expires_at = ttl_deadline if expires_at is None else min(expires_at, ttl_deadline)
+        if expires_at is not None:
+            self._cache.set(key, dict(payload), expires_at=expires_at)
+        self._release(key)
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        移除快取項目（token 被撤銷時呼叫）
+
+        Args:
+            key: 快取鍵
+
+        Returns:
+            項目是否存在
+        """
+        return self._cache.delete(key)
+
+    def clear(self) -> None:
+        """清空快取"""
+        self._cache.clear()
+
+    def begin(self, key: Hashable) -> bool:
+        """
+        開始驗證：第一個請求成為 leader，其餘請求等待 leader 完成
+
+        Args:
+            key: 快取鍵
+
+        Returns:
+            True 表示呼叫端為 leader，需自行驗證並在完成後呼叫 put 或 end；
+            False 表示已等待 leader 完成，呼叫端應重新查詢快取
+        """
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            if event is None:
+                self._inflight[key] = threading.Event()
+                self.verifications += 1
+                return True
+            self.coalesced += 1
+        event.wait(self.wait_timeout)
+        return False
+
+    def end(self, key: Hashable) -> None:
+        """
+        結束驗證（驗證失敗或未寫入快取時由 leader 呼叫）
+
+        Args:
+            key: 快取鍵
+        """
+        self._release(key)
+
+    def _release(self, key: Hashable) -> None:
+        """喚醒等待同一個鍵的並行請求"""
+        with self._inflight_lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def get_or_verify(self,
+                      token: str,
+                      verifier: Callable[[str], Dict[str, Any]],
+                      key: Optional[Hashable] = None) -> Dict[str, Any]:
+        """
+        取得快取的 payload，未命中時以 verifier 驗證（並行請求只驗證一次）
+
+        Args:
+            token: JWT token 字串
+            verifier: 驗證函數，返回 payload，驗證失敗時拋出異常
+            key: 快取鍵（預設為 token）
+
+        Returns:
+            已驗證的 payload
+
+        Raises:
+            verifier 拋出的異常（失敗結果不快取）
+        """
+        payload = self.get(token if key is None else key)
+        if payload is not None:
+            return payload
+        return self.verify_once(token, verifier, key)
+
+    def verify_once(self,
+                    token: str,
+                    verifier: Callable[[str], Dict[str, Any]],
+                    key: Optional[Hashable] = None) -> Dict[str, Any]:
+        """
+        以 single-flight 驗證 token 並寫入快取（呼叫端已確認未命中）
+
+        Args:
+            token: JWT token 字串
+            verifier: 驗證函數，返回 payload，驗證失敗時拋出異常
+            key: 快取鍵（預設為 token）
+
+        Returns:
+            已驗證的 payload
+
+        Raises:
+            verifier 拋出的異常（失敗結果不快取）
+        """
+        key = token if key is None else key
+        if not self.begin(key):
+            payload = self.get(key)
+            if payload is not None:
+                return payload
+            # leader 驗證失敗或逾時：自行驗證，不再合併
+            return verifier(token)
+
+        try:
+            payload = verifier(token)
+            self.put(key, payload)
+            return dict(payload)
+        finally:
+            self.end(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得快取統計資訊
+
+        Returns:
+            快取大小、命中率、驗證次數與被合併的並行請求數
+        """
+        stats = self._cache.stats()
+        stats.update({
+            "verifications": self.verifications,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight)
+        })
+        return stats